@@ -6,7 +6,7 @@ gdpr-delete-user-memories.py が出力した監査ログ（JSON）を集約し
 GDPR コンプライアンス向けの削除監査レポートを生成する。
 
 機能:
-- audit-reports/ 内の全削除ログを集約
+- audit-reports/ 内の全削除ログ（JSON ファイルと --jsonl の JSONL ファイル）を集約
 - 削除サマリー（actor 別、日付別）の生成
 - CloudTrail ログとの照合確認
 - Markdown 形式の監査レポート出力
@@ -26,6 +26,11 @@ import datetime
 import glob
 from botocore.exceptions import ClientError
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # リージョン
 REGION = "us-east-1"
 
@@ -35,6 +40,9 @@ CONFIG_FILE = "phase12-config.json"
 # 監査レポートディレクトリ
 AUDIT_REPORT_DIR = "./audit-reports"
 
+# gdpr-delete-user-memories.py --jsonl が追記する監査ログ（1 行 1 ユーザー）
+AUDIT_JSONL_FILE = os.path.join(AUDIT_REPORT_DIR, "gdpr-deletion.jsonl")
+
 
 def load_config():
     """設定ファイルを読み込み"""
@@ -46,8 +54,37 @@ def load_config():
         return json.load(f)
 
 
+def _load_jsonl_audit_logs(actor_id=None):
+    """AUDIT_JSONL_FILE（--jsonl で削除した場合の監査ログ）を 1 行 1 エントリとして読み込み"""
+    logs = []
+    try:
+        f = open(AUDIT_JSONL_FILE, "rb")
+    except FileNotFoundError:
+        return logs
+
+    with f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            location = f"{AUDIT_JSONL_FILE}:{line_no}"
+            try:
+                log = orjson.loads(line) if orjson is not None else json.loads(line)
+            except ValueError as e:
+                print(f"[WARN] Failed to load {location}: {e}")
+                continue
+
+            # actor_id フィルタ
+            if actor_id and log.get("actorId") != actor_id:
+                continue
+
+            log["_filepath"] = location
+            logs.append(log)
+
+    return logs
+
+
 def load_audit_logs(actor_id=None):
-    """監査ログファイルを読み込み"""
+    """監査ログ（ユーザーごとの JSON ファイルと JSONL ファイル）を読み込み"""
     if not os.path.exists(AUDIT_REPORT_DIR):
         print(f"[WARN] Audit report directory not found: {AUDIT_REPORT_DIR}")
         return []
@@ -55,15 +92,15 @@ def load_audit_logs(actor_id=None):
     pattern = os.path.join(AUDIT_REPORT_DIR, "gdpr-deletion-*.json")
     log_files = sorted(glob.glob(pattern))
 
-    if not log_files:
-        print("[INFO] No audit log files found")
-        return []
-
     logs = []
     for filepath in log_files:
         try:
-            with open(filepath, "r") as f:
-                log = json.load(f)
+            if orjson is not None:
+                with open(filepath, "rb") as f:
+                    log = orjson.loads(f.read())
+            else:
+                with open(filepath, "r") as f:
+                    log = json.load(f)
 
             # actor_id フィルタ
             if actor_id and log.get("actorId") != actor_id:
@@ -74,6 +111,12 @@ def load_audit_logs(actor_id=None):
         except (json.JSONDecodeError, IOError) as e:
             print(f"[WARN] Failed to load {filepath}: {e}")
 
+    logs.extend(_load_jsonl_audit_logs(actor_id))
+
+    if not logs and not log_files and not os.path.exists(AUDIT_JSONL_FILE):
+        print("[INFO] No audit log files found")
+        return []
+
     print(f"[OK] Loaded {len(logs)} audit log(s)")
     return logs
 
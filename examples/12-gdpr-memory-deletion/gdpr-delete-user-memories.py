@@ -15,6 +15,8 @@ GDPR Right to Erasure（忘れられる権利）に基づき、
 使用例:
   python3 gdpr-delete-user-memories.py --actor-id tenant-a:user-001
   python3 gdpr-delete-user-memories.py --actor-id tenant-a:user-001 --dry-run
+  python3 gdpr-delete-user-memories.py --actor-id tenant-a:user-001,tenant-a:user-002
+  python3 gdpr-delete-user-memories.py --actor-id-file actor-ids.txt --max-workers 4
 """
 
 import boto3
@@ -22,9 +24,19 @@ import json
 import os
 import sys
 import argparse
+import concurrent.futures
 import datetime
+import functools
+import logging
+import threading
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # リージョン
 REGION = "us-east-1"
 
@@ -37,6 +49,18 @@ MAX_BATCH_SIZE = 100
 # 監査レポートディレクトリ
 AUDIT_REPORT_DIR = "./audit-reports"
 
+# --jsonl 指定時に追記する監査ログ（1 行 1 ユーザー）
+AUDIT_JSONL_FILE = os.path.join(AUDIT_REPORT_DIR, "gdpr-deletion.jsonl")
+
+# 並列処理時に JSONL への追記が混ざらないようにするロック
+_audit_jsonl_lock = threading.Lock()
+
+# 複数ユーザー処理時に共有する HTTP コネクションプール
+CLIENT_CONFIG = Config(max_pool_connections=50)
+
+# バッチ単位の進捗ログ（% 形式のためレベル未満のメッセージは組み立てない）
+logger = logging.getLogger("gdpr-delete")
+
 
 def load_config():
     """設定ファイルを読み込み"""
@@ -49,6 +73,12 @@ def load_config():
         return json.load(f)
 
 
+@functools.lru_cache(maxsize=1)
+def _sts_client():
+    """STS クライアントを遅延生成して再利用（サービスモデルの読み込みは初回のみ）"""
+    return boto3.client("sts", region_name=REGION)
+
+
 def assume_gdpr_processor_role(config):
     """GDPR Processor ロールに AssumeRole"""
     gdpr_processor = config.get("gdprProcessor", {})
@@ -61,7 +91,7 @@ def assume_gdpr_processor_role(config):
 
     print(f"[INFO] Assuming GDPR Processor role: {role_arn}")
 
-    sts = boto3.client("sts", region_name=REGION)
+    sts = _sts_client()
     try:
         response = sts.assume_role(
             RoleArn=role_arn,
@@ -131,7 +161,17 @@ def batch_delete_memories(client, memory_id, strategy_id, records, dry_run=False
         print("[INFO] No records to delete")
         return {"deleted": 0, "failed": 0, "batches": []}
 
-    total_records = len(records)
+    # レコード ID は事前に 1 回だけ抽出し、バッチごとに ID リストをスライスする
+    all_record_ids = [
+        rid for rid in (r.get("memoryRecordId") or r.get("id") or "" for r in records)
+        if rid
+    ]
+    skipped_count = len(records) - len(all_record_ids)
+    if skipped_count:
+        print(f"[WARN] {skipped_count} records have no valid record ID and were skipped")
+
+    total_records = len(all_record_ids)
+    total_batches = (total_records + MAX_BATCH_SIZE - 1) // MAX_BATCH_SIZE
     total_deleted = 0
     total_failed = 0
     batch_results = []
@@ -139,24 +179,16 @@ def batch_delete_memories(client, memory_id, strategy_id, records, dry_run=False
     # MAX_BATCH_SIZE 件ずつバッチ処理
     for batch_start in range(0, total_records, MAX_BATCH_SIZE):
         batch_end = min(batch_start + MAX_BATCH_SIZE, total_records)
-        batch = records[batch_start:batch_end]
+        record_ids = all_record_ids[batch_start:batch_end]
         batch_num = (batch_start // MAX_BATCH_SIZE) + 1
-        total_batches = (total_records + MAX_BATCH_SIZE - 1) // MAX_BATCH_SIZE
 
-        print(f"\n[BATCH {batch_num}/{total_batches}] "
-              f"Deleting records {batch_start + 1}-{batch_end} of {total_records}")
-
-        record_ids = [r.get("memoryRecordId", r.get("id", "")) for r in batch]
-        record_ids = [rid for rid in record_ids if rid]
-
-        if not record_ids:
-            print(f"  [WARN] No valid record IDs in batch")
-            continue
+        logger.info("\n[BATCH %d/%d] Deleting records %d-%d of %d",
+                    batch_num, total_batches, batch_start + 1, batch_end, total_records)
 
         if dry_run:
-            print(f"  [DRY-RUN] Would delete {len(record_ids)} records")
-            for rid in record_ids:
-                print(f"    - {rid}")
+            logger.info("  [DRY-RUN] Would delete %d records", len(record_ids))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("\n".join(f"    - {rid}" for rid in record_ids))
             batch_results.append({
                 "batchNumber": batch_num,
                 "recordCount": len(record_ids),
@@ -193,16 +225,19 @@ def batch_delete_memories(client, memory_id, strategy_id, records, dry_run=False
 
             if failed_records:
                 batch_result["failedRecords"] = failed_records
-                print(f"  [WARN] {failed_count} records failed to delete")
-                for fr in failed_records:
-                    print(f"    - {fr.get('memoryRecordId', 'unknown')}: "
-                          f"{fr.get('errorMessage', 'unknown error')}")
+                logger.warning("  [WARN] %d records failed to delete", failed_count)
+                if logger.isEnabledFor(logging.WARNING):
+                    logger.warning("\n".join(
+                        f"    - {fr.get('memoryRecordId', 'unknown')}: "
+                        f"{fr.get('errorMessage', 'unknown error')}"
+                        for fr in failed_records
+                    ))
 
             batch_results.append(batch_result)
-            print(f"  [OK] Deleted {success_count}/{deleted_count} records")
+            logger.info("  [OK] Deleted %d/%d records", success_count, deleted_count)
 
         except ClientError as e:
-            print(f"  [ERROR] Batch delete failed: {e}")
+            logger.error("  [ERROR] Batch delete failed: %s", e)
             batch_results.append({
                 "batchNumber": batch_num,
                 "recordCount": len(record_ids),
@@ -275,15 +310,23 @@ def verify_deletion(client, memory_id, strategy_id, actor_id):
         }
 
 
+def _record_preview(record):
+    """監査ログ用のレコードプレビューを作成（content は 1 回だけ参照）"""
+    text = (record.get("content") or {}).get("text") or ""
+    return {
+        "memoryRecordId": record.get("memoryRecordId") or record.get("id") or "",
+        "content": (text[:50] + "...") if text else "[no content]"
+    }
+
+
 def save_audit_log(actor_id, records, delete_result, dry_run=False,
-                   verification_result=None):
-    """削除監査ログを JSON ファイルとして保存"""
-    os.makedirs(AUDIT_REPORT_DIR, exist_ok=True)
+                   verification_result=None, jsonl=False):
+    """削除監査ログを保存
 
-    timestamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-    safe_actor_id = actor_id.replace(":", "_").replace("/", "_")
-    filename = f"gdpr-deletion-{safe_actor_id}-{timestamp}.json"
-    filepath = os.path.join(AUDIT_REPORT_DIR, filename)
+    通常はユーザーごとに JSON ファイルを作成する。jsonl=True の場合は
+    AUDIT_JSONL_FILE に 1 行追記するだけで、既存エントリの再シリアライズは行わない。
+    """
+    os.makedirs(AUDIT_REPORT_DIR, exist_ok=True)
 
     audit_log = {
         "gdprAction": "right-to-erasure",
@@ -301,17 +344,25 @@ def save_audit_log(actor_id, records, delete_result, dry_run=False,
             "note": "Verification skipped (dry-run or no records)"
         },
         "batches": delete_result["batches"],
-        "records": [
-            {
-                "memoryRecordId": r.get("memoryRecordId", r.get("id", "")),
-                "content": r.get("content", {}).get("text", "")[:50] + "..."
-                if r.get("content", {}).get("text", "")
-                else "[no content]"
-            }
-            for r in records
-        ]
+        "records": [_record_preview(r) for r in records]
     }
 
+    if jsonl:
+        if orjson is not None:
+            line = orjson.dumps(audit_log) + b"\n"
+        else:
+            line = (json.dumps(audit_log, ensure_ascii=False) + "\n").encode("utf-8")
+        with _audit_jsonl_lock, open(AUDIT_JSONL_FILE, "ab") as f:
+            f.write(line)
+
+        print(f"[OK] Audit log appended: {os.path.abspath(AUDIT_JSONL_FILE)}")
+        return AUDIT_JSONL_FILE
+
+    timestamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    safe_actor_id = actor_id.replace(":", "_").replace("/", "_")
+    filename = f"gdpr-deletion-{safe_actor_id}-{timestamp}.json"
+    filepath = os.path.join(AUDIT_REPORT_DIR, filename)
+
     with open(filepath, "w") as f:
         json.dump(audit_log, f, indent=2, ensure_ascii=False)
 
@@ -319,20 +370,139 @@ def save_audit_log(actor_id, records, delete_result, dry_run=False,
     return filepath
 
 
+def resolve_actor_ids(args):
+    """--actor-id / --actor-id-file から処理対象の actor_id 一覧を作成（重複は除外）"""
+    actor_ids = list(args.actor_id or [])
+
+    if args.actor_id_file:
+        if not os.path.exists(args.actor_id_file):
+            print(f"[ERROR] Actor ID file not found: {args.actor_id_file}")
+            sys.exit(1)
+        with open(args.actor_id_file, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    actor_ids.append(line)
+
+    # カンマ区切り指定（--actor-id a,b）も許容し、指定順を保ったまま重複除去
+    # （dict は挿入順を保つため、dict.fromkeys で O(n) に重複除去できる）
+    resolved = list(dict.fromkeys(
+        actor_id
+        for value in actor_ids
+        for actor_id in (part.strip() for part in value.split(","))
+        if actor_id
+    ))
+
+    if not resolved:
+        print("[ERROR] No actor IDs specified. Use --actor-id or --actor-id-file.")
+        sys.exit(1)
+
+    return resolved
+
+
+def process_actor(client, memory_id, strategy_id, actor_id, dry_run=False,
+                  jsonl=False):
+    """1 ユーザー分の削除処理（取得 -> 削除 -> 検証 -> 監査ログ）を実行"""
+    # Step 1: 対象ユーザーの記憶を取得
+    print(f"\n[STEP 1] Retrieving memories for: {actor_id}")
+    records = retrieve_user_memories(client, memory_id, strategy_id, actor_id)
+
+    if not records:
+        print("[INFO] No memory records found for this actor.")
+        print("[OK] Nothing to delete. GDPR erasure request fulfilled (no data).")
+
+        # 空の場合でも監査ログを残す
+        delete_result = {"deleted": 0, "failed": 0, "batches": []}
+        audit_filepath = save_audit_log(
+            actor_id, records, delete_result, dry_run, jsonl=jsonl
+        )
+        return {
+            "actorId": actor_id,
+            "recordsFound": 0,
+            "deleteResult": delete_result,
+            "verificationResult": None,
+            "auditLogPath": audit_filepath
+        }
+
+    # 対象レコードの概要を表示
+    print(f"\n[INFO] Found {len(records)} memory records:")
+    for i, record in enumerate(records[:5]):
+        rid = record.get("memoryRecordId", record.get("id", "N/A"))
+        content = record.get("content", {}).get("text", "")
+        preview = content[:80] + "..." if len(content) > 80 else content
+        print(f"  [{i + 1}] {rid}: {preview}")
+    if len(records) > 5:
+        print(f"  ... and {len(records) - 5} more records")
+
+    # Step 2: バッチ削除実行
+    print(f"\n[STEP 2] {'[DRY-RUN] ' if dry_run else ''}Deleting memory records...")
+    delete_result = batch_delete_memories(
+        client, memory_id, strategy_id, records, dry_run=dry_run
+    )
+
+    # Step 3: 削除後検証
+    verification_result = None
+    if not dry_run and delete_result["deleted"] > 0:
+        print(f"\n[STEP 3] Verifying deletion completeness...")
+        verification_result = verify_deletion(
+            client, memory_id, strategy_id, actor_id
+        )
+    elif dry_run:
+        print(f"\n[STEP 3] Skipping verification (dry-run mode)")
+    else:
+        print(f"\n[STEP 3] Skipping verification (no records deleted)")
+
+    # Step 4: 監査ログ保存
+    print(f"\n[STEP 4] Saving audit log...")
+    audit_filepath = save_audit_log(
+        actor_id, records, delete_result, dry_run,
+        verification_result=verification_result, jsonl=jsonl
+    )
+
+    return {
+        "actorId": actor_id,
+        "recordsFound": len(records),
+        "deleteResult": delete_result,
+        "verificationResult": verification_result,
+        "auditLogPath": audit_filepath
+    }
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Phase 12: GDPR ユーザー記憶バッチ削除"
     )
     parser.add_argument(
         "--actor-id",
-        required=True,
-        help="削除対象のユーザー ID（例: tenant-a:user-001）"
+        action="append",
+        help="削除対象のユーザー ID（例: tenant-a:user-001）。"
+             "複数回指定またはカンマ区切りで複数ユーザーを一括処理"
+    )
+    parser.add_argument(
+        "--actor-id-file",
+        help="削除対象のユーザー ID を 1 行 1 件で記載したファイル"
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=1,
+        help="並列に処理するユーザー数（デフォルト: 1 = 逐次処理）"
     )
     parser.add_argument(
         "--dry-run",
         action="store_true",
         help="削除せずに対象レコードの確認のみ"
     )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help=f"監査ログを {AUDIT_JSONL_FILE} に 1 行 1 ユーザーで追記（大量ユーザー処理向け）"
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="バッチ単位の進捗ログを抑制（警告・エラーのみ出力）"
+    )
     parser.add_argument(
         "--skip-assume-role",
         action="store_true",
@@ -340,6 +510,13 @@ def main():
     )
     args = parser.parse_args()
 
+    # バッチ進捗ログは stdout にバッファ付きで出力（print と同じ出力先）
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.WARNING if args.quiet else logging.INFO)
+    logger.propagate = False
+
     print("=" * 60)
     print("Phase 12: GDPR User Memory Deletion")
     print("=" * 60)
@@ -347,6 +524,8 @@ def main():
     if args.dry_run:
         print("[INFO] DRY-RUN MODE - No records will be deleted")
 
+    actor_ids = resolve_actor_ids(args)
+
     # Config 読み込み
     config = load_config()
     memory_id = config.get("memory", {}).get("memoryId")
@@ -358,64 +537,41 @@ def main():
 
     print(f"[INFO] Memory ID: {memory_id}")
     print(f"[INFO] Strategy ID: {strategy_id}")
-    print(f"[INFO] Target Actor: {args.actor_id}")
+    if len(actor_ids) == 1:
+        print(f"[INFO] Target Actor: {actor_ids[0]}")
+    else:
+        print(f"[INFO] Target Actors: {len(actor_ids)}")
+        for actor_id in actor_ids:
+            print(f"  - {actor_id}")
 
-    # GDPR Processor ロールに AssumeRole
+    # GDPR Processor ロールに AssumeRole（全ユーザーで 1 回のみ）
     if args.skip_assume_role:
         print("[INFO] Skipping AssumeRole (using current credentials)")
         session = boto3.Session(region_name=REGION)
     else:
         session = assume_gdpr_processor_role(config)
 
-    # Memory API クライアント作成
-    client = session.client("bedrock-agentcore", region_name=REGION)
-
-    # Step 1: 対象ユーザーの記憶を取得
-    print(f"\n[STEP 1] Retrieving memories for: {args.actor_id}")
-    records = retrieve_user_memories(client, memory_id, strategy_id, args.actor_id)
-
-    if not records:
-        print("[INFO] No memory records found for this actor.")
-        print("[OK] Nothing to delete. GDPR erasure request fulfilled (no data).")
-
-        # 空の場合でも監査ログを残す
-        save_audit_log(args.actor_id, records, {"deleted": 0, "failed": 0, "batches": []}, args.dry_run)
-        return
-
-    # 対象レコードの概要を表示
-    print(f"\n[INFO] Found {len(records)} memory records:")
-    for i, record in enumerate(records[:5]):
-        rid = record.get("memoryRecordId", record.get("id", "N/A"))
-        content = record.get("content", {}).get("text", "")
-        preview = content[:80] + "..." if len(content) > 80 else content
-        print(f"  [{i + 1}] {rid}: {preview}")
-    if len(records) > 5:
-        print(f"  ... and {len(records) - 5} more records")
-
-    # Step 2: バッチ削除実行
-    print(f"\n[STEP 2] {'[DRY-RUN] ' if args.dry_run else ''}Deleting memory records...")
-    delete_result = batch_delete_memories(
-        client, memory_id, strategy_id, records, dry_run=args.dry_run
-    )
-
-    # Step 3: 削除後検証
-    verification_result = None
-    if not args.dry_run and delete_result["deleted"] > 0:
-        print(f"\n[STEP 3] Verifying deletion completeness...")
-        verification_result = verify_deletion(
-            client, memory_id, strategy_id, args.actor_id
-        )
-    elif args.dry_run:
-        print(f"\n[STEP 3] Skipping verification (dry-run mode)")
+    # Memory API クライアント作成（全ユーザーで共有）
+    client = session.client("bedrock-agentcore", region_name=REGION, config=CLIENT_CONFIG)
+
+    if args.max_workers > 1 and len(actor_ids) > 1:
+        # boto3 クライアントはスレッドセーフのため共有し、ユーザー単位で並列実行
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=args.max_workers
+        ) as executor:
+            results = list(executor.map(
+                lambda actor_id: process_actor(
+                    client, memory_id, strategy_id, actor_id,
+                    dry_run=args.dry_run, jsonl=args.jsonl
+                ),
+                actor_ids
+            ))
     else:
-        print(f"\n[STEP 3] Skipping verification (no records deleted)")
-
-    # Step 4: 監査ログ保存
-    print(f"\n[STEP 4] Saving audit log...")
-    audit_filepath = save_audit_log(
-        args.actor_id, records, delete_result, args.dry_run,
-        verification_result=verification_result
-    )
+        results = [
+            process_actor(client, memory_id, strategy_id, actor_id,
+                          dry_run=args.dry_run, jsonl=args.jsonl)
+            for actor_id in actor_ids
+        ]
 
     # 結果サマリー
     print("\n" + "=" * 60)
@@ -424,32 +580,47 @@ def main():
     else:
         print("[OK] GDPR Erasure Complete")
     print("=" * 60)
-    print(f"\n  Actor ID:        {args.actor_id}")
-    print(f"  Records found:   {len(records)}")
-    print(f"  Records deleted: {delete_result['deleted']}")
-    print(f"  Records failed:  {delete_result['failed']}")
-    if verification_result:
-        verified_status = "PASS" if verification_result["verified"] else "FAIL"
-        print(f"  Verification:    {verified_status} "
-              f"(remaining: {verification_result['remainingCount']})")
-    print(f"  Audit log:       {audit_filepath}")
-
-    if delete_result["failed"] > 0:
-        print(f"\n[WARNING] {delete_result['failed']} records failed to delete.")
-        print("  Review the audit log and retry if necessary.")
-        sys.exit(1)
 
-    if verification_result and not verification_result["verified"]:
-        print(f"\n[WARNING] Deletion verification failed: "
-              f"{verification_result['remainingCount']} records still remaining.")
-        print("  Retry the deletion or investigate the remaining records.")
+    has_failure = False
+    for result in results:
+        delete_result = result["deleteResult"]
+        verification_result = result["verificationResult"]
+        print(f"\n  Actor ID:        {result['actorId']}")
+        print(f"  Records found:   {result['recordsFound']}")
+        print(f"  Records deleted: {delete_result['deleted']}")
+        print(f"  Records failed:  {delete_result['failed']}")
+        if verification_result:
+            verified_status = "PASS" if verification_result["verified"] else "FAIL"
+            print(f"  Verification:    {verified_status} "
+                  f"(remaining: {verification_result['remainingCount']})")
+        print(f"  Audit log:       {result['auditLogPath']}")
+
+        if delete_result["failed"] > 0:
+            print(f"\n[WARNING] {delete_result['failed']} records failed to delete.")
+            print("  Review the audit log and retry if necessary.")
+            has_failure = True
+
+        if verification_result and not verification_result["verified"]:
+            print(f"\n[WARNING] Deletion verification failed: "
+                  f"{verification_result['remainingCount']} records still remaining.")
+            print("  Retry the deletion or investigate the remaining records.")
+            has_failure = True
+
+    if has_failure:
         sys.exit(1)
 
     print(f"\nNext steps:")
-    print(f"  1. Run: python3 gdpr-generate-deletion-certificate.py "
-          f"--audit-log {audit_filepath}")
-    print(f"  2. Run: python3 gdpr-audit-report.py")
-    print(f"  3. Verify CloudTrail logs for deletion events")
+    for result in results:
+        if result["recordsFound"] == 0:
+            continue
+        if args.jsonl:
+            print(f"  - Run: python3 gdpr-generate-deletion-certificate.py "
+                  f"--actor-id {result['actorId']} --from-jsonl {result['auditLogPath']}")
+        else:
+            print(f"  - Run: python3 gdpr-generate-deletion-certificate.py "
+                  f"--audit-log {result['auditLogPath']}")
+    print(f"  - Run: python3 gdpr-audit-report.py")
+    print(f"  - Verify CloudTrail logs for deletion events")
 
 
 if __name__ == "__main__":
@@ -15,6 +15,7 @@ JSON 形式で生成する。
 使用例:
   python3 gdpr-generate-deletion-certificate.py --audit-log audit-reports/gdpr-deletion-tenant_a_user-001-20260227T120000Z.json
   python3 gdpr-generate-deletion-certificate.py --actor-id tenant-a:user-001
+  python3 gdpr-generate-deletion-certificate.py --actor-id tenant-a:user-001 --from-jsonl
 """
 
 import json
@@ -23,14 +24,25 @@ import sys
 import argparse
 import datetime
 import hashlib
-import glob
+import mmap
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 監査レポートディレクトリ
 AUDIT_REPORT_DIR = "./audit-reports"
 
+# gdpr-delete-user-memories.py --jsonl で追記される監査ログ
+AUDIT_JSONL_FILE = os.path.join(AUDIT_REPORT_DIR, "gdpr-deletion.jsonl")
+
 # 証明書ディレクトリ
 CERTIFICATE_DIR = "./audit-reports/certificates"
 
+# このサイズ（バイト）を超える監査ログは mmap でハッシュ計算
+MMAP_HASH_THRESHOLD = 8 * 1024 * 1024
+
 
 def load_audit_log(filepath):
     """監査ログファイルを読み込み"""
@@ -38,6 +50,11 @@ def load_audit_log(filepath):
         print(f"[ERROR] Audit log not found: {filepath}")
         sys.exit(1)
 
+    # orjson が利用可能ならバイト列のまま高速にパース
+    if orjson is not None:
+        with open(filepath, "rb") as f:
+            return orjson.loads(f.read())
+
     with open(filepath, "r") as f:
         return json.load(f)
 
@@ -45,21 +62,73 @@ def load_audit_log(filepath):
 def find_latest_audit_log(actor_id):
     """指定 actor_id の最新監査ログを検索"""
     safe_actor_id = actor_id.replace(":", "_").replace("/", "_")
-    pattern = os.path.join(AUDIT_REPORT_DIR, f"gdpr-deletion-{safe_actor_id}-*.json")
-    log_files = sorted(glob.glob(pattern))
-
-    if not log_files:
+    prefix = f"gdpr-deletion-{safe_actor_id}-"
+
+    # ファイル名末尾のタイムスタンプは辞書順 = 時系列順のため、
+    # 全件ソートせず 1 パスで最大値のみを保持する
+    latest_name = None
+    try:
+        with os.scandir(AUDIT_REPORT_DIR) as entries:
+            for entry in entries:
+                name = entry.name
+                if (name.startswith(prefix) and name.endswith(".json")
+                        and (latest_name is None or name > latest_name)):
+                    latest_name = name
+    except FileNotFoundError:
+        pass
+
+    if latest_name is None:
         print(f"[ERROR] No audit logs found for actor: {actor_id}")
-        print(f"  Pattern: {pattern}")
+        print(f"  Pattern: {os.path.join(AUDIT_REPORT_DIR, prefix + '*.json')}")
         sys.exit(1)
 
-    latest = log_files[-1]
+    latest = os.path.join(AUDIT_REPORT_DIR, latest_name)
     print(f"[INFO] Using latest audit log: {latest}")
     return latest
 
 
+def find_latest_audit_log_in_jsonl(actor_id, jsonl_path):
+    """JSONL 監査ログから指定 actor_id の最新エントリを検索
+
+    追記順 = 時系列順のため、最後に一致した行を最新とする。
+    戻り値は (監査ログ, 行の SHA-256 ハッシュ)。
+    """
+    if not os.path.exists(jsonl_path):
+        print(f"[ERROR] Audit log not found: {jsonl_path}")
+        sys.exit(1)
+
+    latest_line = None
+    latest_log = None
+    with open(jsonl_path, "rb") as f:
+        for line in f:
+            line = line.rstrip(b"\n")
+            if not line:
+                continue
+            log = orjson.loads(line) if orjson is not None else json.loads(line)
+            if log.get("actorId") == actor_id:
+                latest_line = line
+                latest_log = log
+
+    if latest_log is None:
+        print(f"[ERROR] No audit logs found for actor: {actor_id}")
+        print(f"  File: {jsonl_path}")
+        sys.exit(1)
+
+    print(f"[INFO] Using latest audit log entry in: {jsonl_path}")
+    return latest_log, hashlib.sha256(latest_line).hexdigest()
+
+
 def compute_audit_log_hash(filepath):
-    """監査ログファイルの SHA-256 ハッシュを計算"""
+    """監査ログファイルの SHA-256 ハッシュを計算
+
+    大きな監査ログは mmap でページキャッシュから直接ハッシュに渡し、
+    Python レベルの読み込みループを省略する。
+    """
+    if os.path.getsize(filepath) > MMAP_HASH_THRESHOLD:
+        with open(filepath, "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.sha256(mm).hexdigest()
+
     sha256 = hashlib.sha256()
     with open(filepath, "rb") as f:
         for chunk in iter(lambda: f.read(8192), b""):
@@ -67,8 +136,11 @@ def compute_audit_log_hash(filepath):
     return sha256.hexdigest()
 
 
-def generate_certificate(audit_log, audit_log_path):
-    """削除証明書を生成"""
+def generate_certificate(audit_log, audit_log_path, audit_log_hash=None):
+    """削除証明書を生成
+
+    JSONL 監査ログの場合はファイル全体ではなく該当行のハッシュを audit_log_hash で渡す。
+    """
     summary = audit_log.get("summary", {})
     verification = audit_log.get("verification", {})
 
@@ -108,7 +180,8 @@ def generate_certificate(audit_log, audit_log_path):
         )
 
     # 監査ログのハッシュ
-    audit_log_hash = compute_audit_log_hash(audit_log_path)
+    if audit_log_hash is None:
+        audit_log_hash = compute_audit_log_hash(audit_log_path)
 
     certificate = {
         "certificateType": "gdpr-erasure-completion",
@@ -192,27 +265,43 @@ def main():
         "--actor-id",
         help="対象ユーザー ID（最新の監査ログを自動検索）"
     )
+    parser.add_argument(
+        "--from-jsonl",
+        nargs="?",
+        const=AUDIT_JSONL_FILE,
+        help=f"--actor-id と併用し JSONL 監査ログから検索（デフォルト: {AUDIT_JSONL_FILE}）"
+    )
     args = parser.parse_args()
 
+    if args.from_jsonl and not args.actor_id:
+        parser.error("--from-jsonl requires --actor-id")
+
     print("=" * 60)
     print("Phase 12: GDPR Deletion Certificate Generator")
     print("=" * 60)
 
-    # 監査ログの特定
-    if args.audit_log:
-        audit_log_path = args.audit_log
+    # 監査ログの特定と読み込み
+    audit_log_hash = None
+    if args.from_jsonl:
+        audit_log_path = args.from_jsonl
+        print(f"\n[STEP 1] Loading audit log: {audit_log_path}")
+        audit_log, audit_log_hash = find_latest_audit_log_in_jsonl(
+            args.actor_id, audit_log_path
+        )
     else:
-        audit_log_path = find_latest_audit_log(args.actor_id)
+        if args.audit_log:
+            audit_log_path = args.audit_log
+        else:
+            audit_log_path = find_latest_audit_log(args.actor_id)
 
-    # 監査ログ読み込み
-    print(f"\n[STEP 1] Loading audit log: {audit_log_path}")
-    audit_log = load_audit_log(audit_log_path)
+        print(f"\n[STEP 1] Loading audit log: {audit_log_path}")
+        audit_log = load_audit_log(audit_log_path)
     actor_id = audit_log.get("actorId", "unknown")
     print(f"[OK] Audit log loaded for actor: {actor_id}")
 
     # 証明書生成
     print(f"\n[STEP 2] Generating deletion certificate...")
-    certificate = generate_certificate(audit_log, audit_log_path)
+    certificate = generate_certificate(audit_log, audit_log_path, audit_log_hash)
     print(f"[OK] Certificate generated (status: {certificate['erasureResult']['status']})")
 
     # 証明書保存
@@ -23,6 +23,8 @@ import json
 import os
 import sys
 import argparse
+import functools
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 # リージョン
@@ -34,6 +36,37 @@ GDPR_PROCESSOR_ROLE_NAME = "gdpr-memory-processor-role"
 # Config ファイル
 CONFIG_FILE = "phase12-config.json"
 
+# Trust Policy テンプレート（空白なしの JSON。%s に Principal ARN の JSON 文字列が入る）
+_TRUST_POLICY_TEMPLATE = (
+    '{"Version":"2012-10-17","Statement":[{"Effect":"Allow",'
+    '"Principal":{"AWS":%s},"Action":"sts:AssumeRole",'
+    '"Condition":{"StringEquals":{"sts:ExternalId":"gdpr-processor"}}}]}'
+)
+
+# GDPR 削除専用ポリシーテンプレート（%s に Memory ARN の JSON 文字列が入る）
+_DELETE_POLICY_TEMPLATE = (
+    '{"Version":"2012-10-17","Statement":['
+    '{"Sid":"AllowMemoryRecordDeletionAndRetrieval","Effect":"Allow","Action":['
+    '"bedrock-agentcore:BatchDeleteMemoryRecords",'
+    '"bedrock-agentcore:DeleteMemoryRecord",'
+    '"bedrock-agentcore:RetrieveMemoryRecords",'
+    '"bedrock-agentcore:ListMemoryRecords",'
+    '"bedrock-agentcore:GetMemoryRecord"],"Resource":%s},'
+    '{"Sid":"DenyMemoryRecordAndResourceModification","Effect":"Deny","Action":['
+    '"bedrock-agentcore:BatchCreateMemoryRecords",'
+    '"bedrock-agentcore:BatchUpdateMemoryRecords",'
+    '"bedrock-agentcore:CreateMemory",'
+    '"bedrock-agentcore:DeleteMemory",'
+    '"bedrock-agentcore:UpdateMemory"],"Resource":"*"}]}'
+)
+
+# STS / IAM クライアント共通の設定
+CLIENT_CONFIG = Config(
+    retries={"mode": "adaptive", "max_attempts": 10},
+    max_pool_connections=32,
+    tcp_keepalive=True,
+)
+
 
 def load_config():
     """設定ファイルを読み込み"""
@@ -47,97 +80,88 @@ def load_config():
         return json.load(f)
 
 
+@functools.lru_cache(maxsize=1)
+def _session():
+    """STS / IAM クライアントで共有する boto3 Session"""
+    return boto3.Session(region_name=REGION)
+
+
+@functools.lru_cache(maxsize=None)
+def _client(service_name):
+    """共有 Session からクライアントを遅延生成して再利用"""
+    return _session().client(service_name, config=CLIENT_CONFIG)
+
+
 def get_account_id():
     """AWS アカウント ID を取得"""
-    sts = boto3.client("sts", region_name=REGION)
+    sts = _client("sts")
     return sts.get_caller_identity()["Account"]
 
 
 def create_trust_policy(account_id):
-    """Trust Policy を作成
+    """Trust Policy を作成（シリアライズ済み JSON 文字列）
 
     GDPR Processor ロールは管理者のみが AssumeRole できるよう制限する。
     本番環境では Principal を特定の管理者ロール/ユーザーに限定すること。
     """
-    return {
-        "Version": "2012-10-17",
-        "Statement": [
-            {
-                "Effect": "Allow",
-                "Principal": {
-                    "AWS": f"arn:aws:iam::{account_id}:root"
-                },
-                "Action": "sts:AssumeRole",
-                "Condition": {
-                    "StringEquals": {
-                        "sts:ExternalId": "gdpr-processor"
-                    }
-                }
-            }
-        ]
-    }
+    return _TRUST_POLICY_TEMPLATE % json.dumps(f"arn:aws:iam::{account_id}:root")
 
 
 def create_gdpr_delete_policy(memory_arn):
-    """GDPR 削除専用ポリシーを作成
+    """GDPR 削除専用ポリシーを作成（シリアライズ済み JSON 文字列）
 
     最小権限の原則に従い、削除と検索操作のみを許可する。
     作成・更新・Memory リソース自体の削除は明示的に拒否する。
+    Allow / Deny はそれぞれ 1 ステートメントにまとめ、ポリシーサイズと評価コストを抑える。
     """
-    return {
-        "Version": "2012-10-17",
-        "Statement": [
-            {
-                "Sid": "AllowMemoryRecordDeletion",
-                "Effect": "Allow",
-                "Action": [
-                    "bedrock-agentcore:BatchDeleteMemoryRecords",
-                    "bedrock-agentcore:DeleteMemoryRecord"
-                ],
-                "Resource": memory_arn
-            },
-            {
-                "Sid": "AllowMemoryRecordRetrieval",
-                "Effect": "Allow",
-                "Action": [
-                    "bedrock-agentcore:RetrieveMemoryRecords",
-                    "bedrock-agentcore:ListMemoryRecords",
-                    "bedrock-agentcore:GetMemoryRecord"
-                ],
-                "Resource": memory_arn
-            },
-            {
-                "Sid": "DenyMemoryRecordCreationAndUpdate",
-                "Effect": "Deny",
-                "Action": [
-                    "bedrock-agentcore:BatchCreateMemoryRecords",
-                    "bedrock-agentcore:BatchUpdateMemoryRecords"
-                ],
-                "Resource": "*"
-            },
-            {
-                "Sid": "DenyMemoryResourceModification",
-                "Effect": "Deny",
-                "Action": [
-                    "bedrock-agentcore:CreateMemory",
-                    "bedrock-agentcore:DeleteMemory",
-                    "bedrock-agentcore:UpdateMemory"
-                ],
-                "Resource": "*"
-            }
-        ]
-    }
+    return _DELETE_POLICY_TEMPLATE % json.dumps(memory_arn)
+
+
+def validate_policy_document(policy_json, resource_type=None):
+    """IAM Access Analyzer でポリシーを事前検証
+
+    ERROR の検出結果がある場合は例外を送出し、IAM への書き込み前に中断する。
+    resource_type を指定した場合はリソースポリシー（Trust Policy など）として検証する。
+    Access Analyzer の呼び出し自体が失敗した場合（権限不足など）は警告のみ表示する。
+    """
+    if resource_type:
+        kwargs = {"policyType": "RESOURCE_POLICY", "validatePolicyResourceType": resource_type}
+    else:
+        kwargs = {"policyType": "IDENTITY_POLICY"}
+    try:
+        response = _client("accessanalyzer").validate_policy(
+            policyDocument=policy_json,
+            **kwargs
+        )
+    except ClientError as e:
+        print(f"[WARN] Policy validation skipped: {e}")
+        return
+
+    errors = [
+        f for f in response.get("findings", [])
+        if f.get("findingType") == "ERROR"
+    ]
+    for finding in response.get("findings", []):
+        print(f"  [{finding.get('findingType')}] {finding.get('issueCode')}: "
+              f"{finding.get('findingDetails')}")
+    if errors:
+        raise ValueError(f"Policy validation failed with {len(errors)} error(s)")
 
 
 def create_gdpr_processor_role(iam_client, account_id, memory_arn):
     """GDPR Processor IAM ロールを作成"""
-    trust_policy = create_trust_policy(account_id)
-    delete_policy = create_gdpr_delete_policy(memory_arn)
+    # ポリシー JSON は 1 回だけ生成し、全 IAM 呼び出しで共有する
+    trust_json = create_trust_policy(account_id)
+    delete_json = create_gdpr_delete_policy(memory_arn)
+
+    # ロール作成前に両方のポリシーを検証し、途中まで作成された状態を残さない
+    validate_policy_document(trust_json, "AWS::IAM::AssumeRolePolicyDocument")
+    validate_policy_document(delete_json)
 
     try:
         response = iam_client.create_role(
             RoleName=GDPR_PROCESSOR_ROLE_NAME,
-            AssumeRolePolicyDocument=json.dumps(trust_policy),
+            AssumeRolePolicyDocument=trust_json,
             Description="GDPR Processor: Memory record deletion only (Right to Erasure)",
             Tags=[
                 {"Key": "project", "Value": "bedrock-agentcore-cookbook"},
@@ -158,17 +182,17 @@ def create_gdpr_processor_role(iam_client, account_id, memory_arn):
             # Trust Policy を更新
             iam_client.update_assume_role_policy(
                 RoleName=GDPR_PROCESSOR_ROLE_NAME,
-                PolicyDocument=json.dumps(trust_policy)
+                PolicyDocument=trust_json
             )
             print(f"[OK] Trust policy updated")
         else:
             raise
 
-    # Inline Policy を作成/更新
+    # Inline Policy を作成/更新（検証はロール作成前に実施済み）
     iam_client.put_role_policy(
         RoleName=GDPR_PROCESSOR_ROLE_NAME,
         PolicyName="GDPRMemoryDeletePolicy",
-        PolicyDocument=json.dumps(delete_policy)
+        PolicyDocument=delete_json
     )
     print(f"[OK] Inline policy attached: GDPRMemoryDeletePolicy")
 
@@ -204,6 +228,9 @@ def main():
     if not account_id:
         account_id = get_account_id()
         config["accountId"] = account_id
+        # 次回以降の実行で STS 呼び出しを省略できるよう保存
+        if not args.dry_run:
+            save_config(config)
 
     if not memory_arn:
         print("[ERROR] Memory ARN not found in config.")
@@ -232,7 +259,7 @@ def main():
         return
 
     # IAM クライアント作成
-    iam_client = boto3.client("iam", region_name=REGION)
+    iam_client = _client("iam")
 
     # GDPR Processor ロール作成
     print("\n[STEP 1] Creating GDPR Processor IAM Role...")
@@ -0,0 +1,118 @@
+"""
+AuthPolicyTable スクリプト共通の boto3 クライアント生成と JSON 入出力
+
+setup-dynamodb-table.py / seed-test-users.py / query-user-policy.py で共有する。
+リージョンごとに Session とクライアントを 1 回だけ生成し、
+adaptive リトライ・コネクションプール・TCP keep-alive を設定した Config を適用する。
+JSON は orjson が利用可能であれば orjson、なければ標準の json を使用する。
+"""
+
+import functools
+import json
+import sys
+
+import boto3
+from botocore.config import Config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 全クライアント共通の設定
+CLIENT_CONFIG = Config(
+    retries={"mode": "adaptive", "max_attempts": 10},
+    max_pool_connections=32,
+    tcp_keepalive=True,
+)
+
+
+@functools.lru_cache(maxsize=None)
+def get_session(region: str) -> boto3.Session:
+    """リージョンごとの boto3 Session を取得する"""
+    return boto3.Session(region_name=region)
+
+
+@functools.lru_cache(maxsize=None)
+def get_ddb_client(region: str):
+    """DynamoDB client を取得する"""
+    return get_session(region).client("dynamodb", config=CLIENT_CONFIG)
+
+
+@functools.lru_cache(maxsize=None)
+def get_ddb_resource(region: str):
+    """DynamoDB resource を取得する"""
+    return get_session(region).resource("dynamodb", config=CLIENT_CONFIG)
+
+
+def load_json_file(path: str):
+    """JSON ファイルを読み込む"""
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def dumps_pretty(obj) -> str:
+    """
+    インデント付き JSON 文字列に変換する
+
+    json.dumps(obj, indent=2, ensure_ascii=False, default=str) と同じ出力になる。
+    DynamoDB の Decimal など JSON 非対応の型は str() で変換する。
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            obj,
+            default=str,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+        ).decode("utf-8")
+
+    return json.dumps(obj, indent=2, ensure_ascii=False, default=str)
+
+
+def write_json_array(items, stream=None) -> int:
+    """
+    アイテムを JSON 配列として 1 件ずつストリームに書き出す
+
+    全件を 1 つの文字列に組み立てないため、メモリ使用量はアイテム 1 件分に収まる。
+    1 件もない場合は何も書き出さない。
+
+    Args:
+        items: アイテムのイテラブル
+        stream: 出力先（デフォルト: sys.stdout）
+
+    Returns:
+        書き出したアイテム数
+    """
+    stream = stream or sys.stdout
+    count = 0
+    for item in items:
+        if orjson is not None:
+            encoded = orjson.dumps(item, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        else:
+            encoded = json.dumps(item, ensure_ascii=False, default=str)
+        stream.write(("[\n" if count == 0 else ",\n") + encoded)
+        count += 1
+
+    if count:
+        stream.write("\n]\n")
+    return count
+
+
+def exit_if_table_not_found(error, table_name: str) -> None:
+    """
+    ResourceNotFoundException の場合はセットアップ手順を表示して終了する
+
+    テーブルの存在確認（DescribeTable）を事前に行わず、最初の API 呼び出しで
+    発生したエラーをこの関数で判定する。
+
+    Args:
+        error: 発生した ClientError
+        table_name: テーブル名
+    """
+    if error.response["Error"]["Code"] == "ResourceNotFoundException":
+        print(f"[NG] テーブル '{table_name}' が見つかりません。")
+        print("先に setup-dynamodb-table.py を実行してください。")
+        sys.exit(1)
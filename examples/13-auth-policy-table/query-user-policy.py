@@ -9,21 +9,53 @@ Pre Token Generation Lambda と同等のクエリロジックを検証できる
     python3 query-user-policy.py --email admin@tenant-a.example.com
     python3 query-user-policy.py --tenant tenant-a
     python3 query-user-policy.py --list-all
+    python3 query-user-policy.py --tenant tenant-a --cache-ttl 300  # 全件スキャン結果をキャッシュ
 """
 
 import argparse
 import json
+import os
+import pickle
 import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
 
-import boto3
 from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 
+from common import (
+    dumps_pretty,
+    exit_if_table_not_found,
+    get_ddb_resource,
+    load_json_file,
+    write_json_array,
+)
+
+# 並列スキャンのセグメント数
+SCAN_TOTAL_SEGMENTS = min(8, (os.cpu_count() or 1) * 2)
+
+# 一覧表示（format_user_list）に必要な属性
+LIST_ATTRIBUTES = ("email", "tenant_id", "role", "status", "groups")
+
+# --cache-ttl 指定時に使用する tenant / email インデックスのキャッシュファイル
+# （共有の一時ディレクトリではなく、ユーザーごとのキャッシュディレクトリに置く）
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "authpolicy",
+)
+CACHE_FILE = os.path.join(CACHE_DIR, "index.pkl")
+
+# ユーザー一覧のヘッダー / 区切り線
+USER_LIST_HEADER = f"{'email':<40} {'tenant_id':<12} {'role':<10} {'status':<8} {'groups'}"
+USER_LIST_SEPARATOR = "-" * 95
+
 
 def load_config(config_path: str) -> dict:
     """設定ファイルを読み込む"""
-    with open(config_path, "r") as f:
-        return json.load(f)
+    return load_json_file(config_path)
 
 
 def query_by_email(table, email: str) -> dict | None:
@@ -53,46 +85,126 @@ def query_by_email(table, email: str) -> dict | None:
             return None
 
     except ClientError as e:
+        exit_if_table_not_found(e, table.name)
         print(f"[NG] クエリエラー: {e}")
         return None
 
 
-def query_by_tenant(table, tenant_id: str) -> list:
+def query_by_tenant(
+    table,
+    tenant_id: str,
+    attributes: tuple | None = LIST_ATTRIBUTES,
+    count_only: bool = False,
+) -> list | int:
     """
     TenantId GSI でテナントのユーザー一覧を取得する (Query)
 
+    1 MB を超えるテナントでも欠落しないよう LastEvaluatedKey でページネーションする。
+
     Args:
         table: DynamoDB Table リソース
         tenant_id: テナント ID
+        attributes: 取得する属性名（None の場合は全属性）
+        count_only: True の場合は Select="COUNT" で件数のみ取得する
 
     Returns:
-        テナントに属するユーザーのリスト
+        テナントに属するユーザーのリスト（count_only=True の場合は件数）
     """
     print(f"[START] テナントのユーザー一覧を取得: {tenant_id}")
 
+    query_kwargs = {
+        "IndexName": "TenantIdIndex",
+        "KeyConditionExpression": Key("tenant_id").eq(tenant_id),
+    }
+    if count_only:
+        query_kwargs["Select"] = "COUNT"
+    elif attributes:
+        # role / status は予約語のため ExpressionAttributeNames で参照する
+        names = {f"#a{i}": name for i, name in enumerate(attributes)}
+        query_kwargs["Select"] = "SPECIFIC_ATTRIBUTES"
+        query_kwargs["ProjectionExpression"] = ", ".join(names)
+        query_kwargs["ExpressionAttributeNames"] = names
+
     try:
-        response = table.query(
-            IndexName="TenantIdIndex",
-            KeyConditionExpression=Key("tenant_id").eq(tenant_id),
-        )
+        items = []
+        count = 0
+        response = table.query(**query_kwargs)
+        items.extend(response.get("Items", []))
+        count += response.get("Count", 0)
+
+        # ページネーション対応
+        while "LastEvaluatedKey" in response:
+            response = table.query(
+                ExclusiveStartKey=response["LastEvaluatedKey"], **query_kwargs
+            )
+            items.extend(response.get("Items", []))
+            count += response.get("Count", 0)
+
+        if count_only:
+            print(f"[OK] {count} 件のユーザーが見つかりました")
+            return count
 
-        items = response.get("Items", [])
         print(f"[OK] {len(items)} 件のユーザーが見つかりました")
         return items
 
     except ClientError as e:
+        exit_if_table_not_found(e, table.name)
         print(f"[NG] クエリエラー: {e}")
-        return []
+        return 0 if count_only else []
+
 
+def _scan_segment(table, segment: int, total_segments: int, scan_kwargs: dict) -> list:
+    """並列スキャンの 1 セグメント分をページネーションしながら取得する"""
+    items = []
+    kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+    response = table.scan(**kwargs)
+    items.extend(response.get("Items", []))
+
+    # ページネーション対応
+    while "LastEvaluatedKey" in response:
+        response = table.scan(ExclusiveStartKey=response["LastEvaluatedKey"], **kwargs)
+        items.extend(response.get("Items", []))
 
-def scan_all_users(table) -> list:
+    return items
+
+
+def iter_scan_segments(table, attributes: tuple | None = None):
+    """
+    並列スキャンの結果をセグメント単位で、完了した順に返すジェネレータ
+
+    TotalSegments / Segment でテーブルを分割し、セグメントごとにスレッドで並列スキャンする。
+
+    Args:
+        table: DynamoDB Table リソース
+        attributes: 取得する属性名（None の場合は全属性）
+
+    Yields:
+        1 セグメント分のアイテムのリスト
+    """
+    scan_kwargs = {}
+    if attributes:
+        names = {f"#a{i}": name for i, name in enumerate(attributes)}
+        scan_kwargs["ProjectionExpression"] = ", ".join(names)
+        scan_kwargs["ExpressionAttributeNames"] = names
+
+    with ThreadPoolExecutor(max_workers=SCAN_TOTAL_SEGMENTS) as executor:
+        futures = [
+            executor.submit(_scan_segment, table, segment, SCAN_TOTAL_SEGMENTS, scan_kwargs)
+            for segment in range(SCAN_TOTAL_SEGMENTS)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def scan_all_users(table, attributes: tuple | None = None) -> list:
     """
-    テーブル内のすべてのユーザーを取得する (Scan)
+    テーブル内のすべてのユーザーを取得する (Parallel Scan)
 
     注意: 本番環境では Scan は推奨されません。検証用途のみ。
 
     Args:
         table: DynamoDB Table リソース
+        attributes: 取得する属性名（None の場合は全属性）
 
     Returns:
         すべてのユーザーのリスト
@@ -100,23 +212,84 @@ def scan_all_users(table) -> list:
     print("[START] すべてのユーザーを取得中...")
 
     try:
-        items = []
-        response = table.scan()
-        items.extend(response.get("Items", []))
-
-        # ページネーション対応
-        while "LastEvaluatedKey" in response:
-            response = table.scan(ExclusiveStartKey=response["LastEvaluatedKey"])
-            items.extend(response.get("Items", []))
+        items = list(chain.from_iterable(iter_scan_segments(table, attributes)))
 
         print(f"[OK] {len(items)} 件のユーザーが見つかりました")
         return items
 
     except ClientError as e:
+        exit_if_table_not_found(e, table.name)
         print(f"[NG] スキャンエラー: {e}")
         return []
 
 
+def load_policy_index(table, region: str, ttl: int) -> dict:
+    """
+    email / tenant_id をキーとしたユーザーインデックスを取得する
+
+    CACHE_FILE が ttl 秒以内に作成されていれば、それを読み込んで返す。
+    期限切れ・未作成の場合は並列スキャンでインデックスを作成し、キャッシュに保存する。
+    pickle の改ざんを避けるため、自分が所有するキャッシュファイルのみ読み込む。
+    キャッシュの読み書きに失敗しても、キャッシュなしとして処理を続ける。
+
+    Args:
+        table: DynamoDB Table リソース
+        region: AWS リージョン
+        ttl: キャッシュの有効期間（秒）
+
+    Returns:
+        {"by_email": {email: item}, "by_tenant": {tenant_id: [item, ...]}}
+    """
+    cache_key = (region, table.name)
+
+    try:
+        stat = os.stat(CACHE_FILE)
+        if stat.st_uid == os.getuid() and time.time() - stat.st_mtime < ttl:
+            with open(CACHE_FILE, "rb") as f:
+                index = pickle.load(f)
+            if isinstance(index, dict) and index.get("key") == cache_key:
+                print(f"[OK] キャッシュを使用します: {CACHE_FILE}")
+                return index
+    except Exception:
+        # 未作成・壊れた pickle・別バージョンで作成されたものなどはすべてキャッシュミスとして扱う
+        pass
+
+    items = scan_all_users(table)
+
+    by_tenant = defaultdict(list)
+    for item in items:
+        by_tenant[item.get("tenant_id")].append(item)
+
+    index = {
+        "key": cache_key,
+        "by_email": {item["email"]: item for item in items},
+        "by_tenant": dict(by_tenant),
+    }
+
+    # スキャン失敗時や空テーブルの結果はキャッシュしない
+    if not items:
+        return index
+
+    # 同じディレクトリの一時ファイル（mkstemp により 0o600）に書いてから置き換える
+    tmp_path = None
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=".index-", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, CACHE_FILE)
+        print(f"[OK] キャッシュを作成しました: {CACHE_FILE}")
+    except Exception as e:
+        print(f"[WARNING] キャッシュを保存できませんでした: {e}")
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    return index
+
+
 def format_user_policy(item: dict) -> str:
     """
     ユーザーポリシーを見やすくフォーマットする
@@ -166,25 +339,22 @@ def format_user_list(items: list) -> str:
     if not items:
         return "(ユーザーなし)"
 
-    lines = [
-        f"{'email':<40} {'tenant_id':<12} {'role':<10} {'status':<8} {'groups'}",
-        "-" * 95,
-    ]
-
-    for item in items:
-        groups_str = ", ".join(item.get("groups", []))
-        lines.append(
-            f"{item.get('email', 'N/A'):<40} "
-            f"{item.get('tenant_id', 'N/A'):<12} "
-            f"{item.get('role', 'N/A'):<10} "
-            f"{item.get('status', 'N/A'):<8} "
-            f"{groups_str}"
-        )
-
-    lines.append("-" * 95)
-    lines.append(f"合計: {len(items)} ユーザー")
+    rows = (
+        f"{item.get('email', 'N/A'):<40} "
+        f"{item.get('tenant_id', 'N/A'):<12} "
+        f"{item.get('role', 'N/A'):<10} "
+        f"{item.get('status', 'N/A'):<8} "
+        f"{', '.join(item.get('groups', ()))}"
+        for item in items
+    )
 
-    return "\n".join(lines)
+    return "\n".join([
+        USER_LIST_HEADER,
+        USER_LIST_SEPARATOR,
+        *rows,
+        USER_LIST_SEPARATOR,
+        f"合計: {len(items)} ユーザー",
+    ])
 
 
 def simulate_pre_token_claims(item: dict) -> dict:
@@ -258,6 +428,15 @@ def main():
         action="store_true",
         help="Pre Token Generation Lambda のクレーム生成をシミュレートする",
     )
+    parser.add_argument(
+        "--cache-ttl",
+        type=int,
+        default=0,
+        help=(
+            "--email / --tenant の結果を全件スキャンのキャッシュから返す。"
+            f"キャッシュ ({CACHE_FILE}) の有効期間を秒で指定 (default: 0 = 無効)"
+        ),
+    )
     args = parser.parse_args()
 
     # 設定の読み込み
@@ -271,61 +450,78 @@ def main():
     region = args.region or config.get("region", "us-east-1")
 
     # DynamoDB リソース作成
-    dynamodb = boto3.resource("dynamodb", region_name=region)
+    dynamodb = get_ddb_resource(region)
     table = dynamodb.Table(table_name)
 
-    # テーブル存在確認
-    try:
-        table.load()
-    except ClientError as e:
-        if e.response["Error"]["Code"] == "ResourceNotFoundException":
-            print(f"[NG] テーブル '{table_name}' が見つかりません。")
-            print("先に setup-dynamodb-table.py を実行してください。")
-            sys.exit(1)
-        raise
-
     print(f"テーブル: {table_name} (region: {region})\n")
 
+    index = None
+    if args.cache_ttl > 0 and (args.email or args.tenant):
+        index = load_policy_index(table, region, args.cache_ttl)
+
     # Email クエリ
     if args.email:
-        item = query_by_email(table, args.email)
+        if index is not None:
+            item = index["by_email"].get(args.email)
+            if item is None:
+                print(f"[WARNING] ユーザーが見つかりません: {args.email}")
+        else:
+            item = query_by_email(table, args.email)
         if item is None:
             sys.exit(1)
 
         if args.output_json:
-            print(json.dumps(item, indent=2, ensure_ascii=False, default=str))
+            print(dumps_pretty(item))
         else:
             print(format_user_policy(item))
 
         if args.simulate_claims:
             claims = simulate_pre_token_claims(item)
             print("\n--- Pre Token Generation クレーム (シミュレート) ---")
-            print(json.dumps(claims, indent=2, ensure_ascii=False))
+            print(dumps_pretty(claims))
             print("---")
 
     # テナント ID クエリ（GSI）
     elif args.tenant:
-        items = query_by_tenant(table, args.tenant)
+        if index is not None:
+            items = index["by_tenant"].get(args.tenant, [])
+        else:
+            # JSON 出力時は全属性、表形式では表示する属性のみ取得
+            items = query_by_tenant(
+                table, args.tenant, None if args.output_json else LIST_ATTRIBUTES
+            )
         if not items:
             print(f"[WARNING] テナント '{args.tenant}' にユーザーが存在しません")
             sys.exit(1)
 
         if args.output_json:
-            print(json.dumps(items, indent=2, ensure_ascii=False, default=str))
+            print(dumps_pretty(items))
         else:
-            print(format_user_list(items))
+            sys.stdout.write(format_user_list(items) + "\n")
 
     # 全ユーザー一覧
     elif args.list_all:
-        items = scan_all_users(table)
+        if args.output_json:
+            # 全件を 1 つの文字列にせず、スキャン完了したセグメントから順に書き出す
+            print("[START] すべてのユーザーを取得中...")
+            try:
+                count = write_json_array(chain.from_iterable(iter_scan_segments(table)))
+            except ClientError as e:
+                exit_if_table_not_found(e, table_name)
+                print(f"[NG] スキャンエラー: {e}")
+                sys.exit(1)
+            if count == 0:
+                print("[WARNING] テーブルにデータがありません")
+                sys.exit(1)
+            return
+
+        # 表形式では表示する属性のみ取得
+        items = scan_all_users(table, LIST_ATTRIBUTES)
         if not items:
             print("[WARNING] テーブルにデータがありません")
             sys.exit(1)
 
-        if args.output_json:
-            print(json.dumps(items, indent=2, ensure_ascii=False, default=str))
-        else:
-            print(format_user_list(items))
+        sys.stdout.write(format_user_list(items) + "\n")
 
 
 if __name__ == "__main__":
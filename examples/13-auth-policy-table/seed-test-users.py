@@ -18,17 +18,41 @@ Pre Token Generation Lambda がユーザー認証ポリシーを取得できる
 """
 
 import argparse
-import json
+import random
 import sys
+import time
 
-import boto3
+from boto3.dynamodb.types import TypeSerializer
 from botocore.exceptions import ClientError
 
+from common import (
+    dumps_pretty,
+    exit_if_table_not_found,
+    get_ddb_client,
+    get_ddb_resource,
+    load_json_file,
+)
+
+# BatchWriteItem の 1 リクエストあたりの最大アイテム数（API 制限）
+BATCH_WRITE_MAX_ITEMS = 25
+
+# BatchGetItem の 1 リクエストあたりの最大キー数（API 制限）
+BATCH_GET_MAX_KEYS = 100
+
+# UnprocessedKeys / UnprocessedItems の最大リトライ回数
+BATCH_MAX_RETRIES = 5
+
+# 大量投入時に進捗を表示する間隔（件数）
+PROGRESS_INTERVAL = 1000
+
+# サマリー表示のヘッダー / 区切り線
+SUMMARY_HEADER = f"{'email':<40} {'tenant_id':<12} {'role':<10} {'groups'}"
+SUMMARY_SEPARATOR = "-" * 90
+
 
 def load_config(config_path: str) -> dict:
     """設定ファイルを読み込む"""
-    with open(config_path, "r") as f:
-        return json.load(f)
+    return load_json_file(config_path)
 
 
 def get_test_users() -> list:
@@ -99,39 +123,131 @@ def clear_existing_data(table, users: list) -> None:
     print("[START] 既存テストデータを削除中...")
 
     deleted_count = 0
+    warnings = []
     with table.batch_writer() as batch:
         for user in users:
             try:
                 batch.delete_item(Key={"email": user["email"]})
                 deleted_count += 1
             except ClientError as e:
-                print(f"[WARNING] 削除エラー ({user['email']}): {e}")
+                warnings.append(f"[WARNING] 削除エラー ({user['email']}): {e}")
 
+    # ログはループ外でまとめて 1 回だけ書き出す
+    if warnings:
+        sys.stdout.write("\n".join(warnings) + "\n")
     print(f"[OK] {deleted_count} 件のアイテムを削除しました")
 
 
-def seed_test_users(table, users: list) -> None:
+def seed_test_users(dynamodb_client, table_name: str, users: list) -> None:
     """
     テストユーザーデータを投入する
 
+    TypeSerializer でアイテムを 1 回だけシリアライズし、低レベルクライアントの
+    BatchWriteItem で 25 件ずつ書き込む。UnprocessedItems はジッター付きバックオフで再送する。
+
     Args:
-        table: DynamoDB Table リソース
+        dynamodb_client: boto3 DynamoDB client
+        table_name: テーブル名
         users: 投入するユーザーデータのリスト
+
+    Raises:
+        RuntimeError: リトライ上限を超えても未処理アイテムが残った場合
+            （メッセージに投入済み / 未投入の件数を含む）
     """
     print(f"[START] {len(users)} 件のテストユーザーを投入中...")
 
-    with table.batch_writer() as batch:
-        for user in users:
-            batch.put_item(Item=user)
-            print(f"  [OK] {user['email']} (tenant: {user['tenant_id']}, role: {user['role']})")
+    serializer = TypeSerializer()
+    dynamo_items = [
+        {key: serializer.serialize(value) for key, value in user.items()}
+        for user in users
+    ]
+
+    # 大量投入時はユーザーごとではなく PROGRESS_INTERVAL 件ごとに進捗を表示
+    show_progress = len(users) > PROGRESS_INTERVAL
+
+    for start in range(0, len(dynamo_items), BATCH_WRITE_MAX_ITEMS):
+        chunk = dynamo_items[start:start + BATCH_WRITE_MAX_ITEMS]
+        request_items = {
+            table_name: [{"PutRequest": {"Item": item}} for item in chunk]
+        }
+
+        attempt = 0
+        while request_items:
+            response = dynamodb_client.batch_write_item(RequestItems=request_items)
+            request_items = response.get("UnprocessedItems") or {}
+            if request_items:
+                attempt += 1
+                if attempt > BATCH_MAX_RETRIES:
+                    written = start + len(chunk) - len(request_items.get(table_name, []))
+                    raise RuntimeError(
+                        f"未処理アイテムが残っています (リトライ上限 {BATCH_MAX_RETRIES} 回): "
+                        f"{written}/{len(users)} 件投入済み、{len(users) - written} 件未投入"
+                    )
+                time.sleep(random.uniform(0, min(0.05 * (2 ** attempt), 2.0)))
+
+        written = start + len(chunk)
+        if show_progress and (written % PROGRESS_INTERVAL == 0 or written == len(users)):
+            print(f"  [OK] {written}/{len(users)} 件投入済み")
+
+    if not show_progress:
+        sys.stdout.write("".join(
+            f"  [OK] {user['email']} (tenant: {user['tenant_id']}, role: {user['role']})\n"
+            for user in users
+        ))
 
     print(f"[OK] {len(users)} 件のテストユーザーを投入しました")
 
 
+def batch_get_users(table, emails: list) -> dict:
+    """
+    BatchGetItem でユーザーを一括取得する
+
+    100 キーずつ分割してリクエストし、UnprocessedKeys は指数バックオフで再送する。
+    検証に必要な属性のみを ProjectionExpression で取得する。
+
+    Args:
+        table: DynamoDB Table リソース
+        emails: 取得対象のメールアドレスのリスト
+
+    Returns:
+        email をキーとしたアイテムの辞書
+    """
+    client = table.meta.client
+    items_by_email = {}
+
+    for start in range(0, len(emails), BATCH_GET_MAX_KEYS):
+        request_items = {
+            table.name: {
+                "Keys": [{"email": email} for email in emails[start:start + BATCH_GET_MAX_KEYS]],
+                "ProjectionExpression": "email, tenant_id, #r",
+                "ExpressionAttributeNames": {"#r": "role"},
+            }
+        }
+
+        attempt = 0
+        while request_items:
+            response = client.batch_get_item(RequestItems=request_items)
+            for item in response.get("Responses", {}).get(table.name, []):
+                items_by_email[item["email"]] = item
+
+            request_items = response.get("UnprocessedKeys") or {}
+            if request_items:
+                attempt += 1
+                if attempt > BATCH_MAX_RETRIES:
+                    print(f"[WARNING] 未処理キーが残っています (リトライ上限 {BATCH_MAX_RETRIES} 回)")
+                    break
+                time.sleep(min(0.05 * (2 ** attempt), 2.0))
+
+    return items_by_email
+
+
 def verify_data(table, users: list) -> bool:
     """
     投入したデータを検証する
 
+    BatchGetItem で全ユーザーを 1 リクエスト（100 件単位）で取得し、
+    ローカルで tenant_id / role を比較する。
+
     Args:
         table: DynamoDB Table リソース
         users: 検証対象ユーザーデータのリスト
@@ -142,23 +258,24 @@ def verify_data(table, users: list) -> bool:
     """
     print("\n[START] データ検証中...")
 
+    try:
+        items_by_email = batch_get_users(table, [user["email"] for user in users])
+    except ClientError as e:
+        print(f"  [NG] データ取得エラー: {e}")
+        print("[NG] データに問題があります")
+        return False
+
     all_ok = True
     for user in users:
-        try:
-            response = table.get_item(Key={"email": user["email"]})
-            if "Item" in response:
-                item = response["Item"]
-                # 主要フィールドの検証
-                if item["tenant_id"] == user["tenant_id"] and item["role"] == user["role"]:
-                    print(f"  [OK] {user['email']}")
-                else:
-                    print(f"  [NG] {user['email']} - データ不一致")
-                    all_ok = False
-            else:
-                print(f"  [NG] {user['email']} - アイテムが見つかりません")
-                all_ok = False
-        except ClientError as e:
-            print(f"  [NG] {user['email']} - エラー: {e}")
+        item = items_by_email.get(user["email"])
+        if item is None:
+            print(f"  [NG] {user['email']} - アイテムが見つかりません")
+            all_ok = False
+        # 主要フィールドの検証
+        elif item["tenant_id"] == user["tenant_id"] and item["role"] == user["role"]:
+            print(f"  [OK] {user['email']}")
+        else:
+            print(f"  [NG] {user['email']} - データ不一致")
             all_ok = False
 
     if all_ok:
@@ -171,14 +288,19 @@ def verify_data(table, users: list) -> bool:
 
 def print_summary(users: list) -> None:
     """投入データのサマリーを表示する"""
-    print("\n--- テストユーザー一覧 ---")
-    print(f"{'email':<40} {'tenant_id':<12} {'role':<10} {'groups'}")
-    print("-" * 90)
-    for user in users:
-        groups_str = ", ".join(user["groups"])
-        print(f"{user['email']:<40} {user['tenant_id']:<12} {user['role']:<10} {groups_str}")
-    print("-" * 90)
-    print(f"合計: {len(users)} ユーザー")
+    rows = (
+        f"{user['email']:<40} {user['tenant_id']:<12} {user['role']:<10} "
+        f"{', '.join(user['groups'])}"
+        for user in users
+    )
+    sys.stdout.write("\n".join([
+        "\n--- テストユーザー一覧 ---",
+        SUMMARY_HEADER,
+        SUMMARY_SEPARATOR,
+        *rows,
+        SUMMARY_SEPARATOR,
+        f"合計: {len(users)} ユーザー",
+    ]) + "\n")
 
 
 def main():
@@ -230,31 +352,31 @@ def main():
         print("[NOTE] dry-run モード: データは投入されません")
         print_summary(users)
         print("\n投入されるデータ (JSON):")
-        print(json.dumps(users, indent=2, ensure_ascii=False))
+        print(dumps_pretty(users))
         return
 
-    # DynamoDB リソース作成
-    dynamodb = boto3.resource("dynamodb", region_name=region)
+    # DynamoDB リソース / クライアント作成（投入は低レベルクライアントで実行）
+    dynamodb = get_ddb_resource(region)
     table = dynamodb.Table(table_name)
-
-    # テーブル存在確認
-    try:
-        table.load()
-    except ClientError as e:
-        if e.response["Error"]["Code"] == "ResourceNotFoundException":
-            print(f"[NG] テーブル '{table_name}' が見つかりません。")
-            print("先に setup-dynamodb-table.py を実行してください。")
-            sys.exit(1)
-        raise
+    dynamodb_client = get_ddb_client(region)
 
     print(f"テーブル: {table_name} (region: {region})")
 
-    # 既存データの削除
-    if args.clear:
-        clear_existing_data(table, users)
+    # テーブルの存在確認は行わず、最初の書き込みで ResourceNotFoundException を判定する
+    try:
+        # 既存データの削除
+        if args.clear:
+            clear_existing_data(table, users)
 
-    # テストユーザー投入
-    seed_test_users(table, users)
+        # テストユーザー投入
+        seed_test_users(dynamodb_client, table_name, users)
+    except ClientError as e:
+        exit_if_table_not_found(e, table_name)
+        raise
+    except RuntimeError as e:
+        print(f"[ERROR] テストユーザーの投入に失敗しました: {e}")
+        print("[INFO] 時間をおいて再実行してください（投入済みのアイテムは上書きされます）")
+        sys.exit(1)
 
     # 検証
     verify_data(table, users)
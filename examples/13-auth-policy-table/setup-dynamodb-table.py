@@ -16,18 +16,16 @@ Pre Token Generation Lambda が参照する認証ポリシーテーブルを作
 """
 
 import argparse
-import json
 import sys
-import time
 
-import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, WaiterError
+
+from common import get_ddb_client, load_json_file
 
 
 def load_config(config_path: str) -> dict:
     """設定ファイルを読み込む"""
-    with open(config_path, "r") as f:
-        return json.load(f)
+    return load_json_file(config_path)
 
 
 def create_auth_policy_table(
@@ -99,42 +97,62 @@ def create_auth_policy_table(
         raise
 
 
-def wait_for_table_active(dynamodb_client, table_name: str, timeout: int = 60) -> bool:
+def wait_for_table_active(
+    dynamodb_client, table_name: str, timeout: int = 60
+) -> tuple[bool, dict | None]:
     """
     テーブルが ACTIVE になるまで待機する
 
+    waiter が内部で呼び出す DescribeTable の最終レスポンスを保持して返すため、
+    呼び出し側はテーブル情報の表示で DescribeTable を再度呼ぶ必要がない。
+
     Args:
         dynamodb_client: boto3 DynamoDB client
         table_name: テーブル名
         timeout: タイムアウト秒数
 
     Returns:
-        True: テーブルが ACTIVE
-        False: タイムアウト
+        (True, DescribeTable レスポンス): テーブルが ACTIVE
+        (False, None): タイムアウト
     """
     print(f"テーブル '{table_name}' が ACTIVE になるまで待機中...")
 
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        try:
-            response = dynamodb_client.describe_table(TableName=table_name)
-            status = response["Table"]["TableStatus"]
-            if status == "ACTIVE":
-                print(f"[OK] テーブル '{table_name}' は ACTIVE です")
-                return True
-            print(f"  現在のステータス: {status}")
-            time.sleep(2)
-        except ClientError:
-            time.sleep(2)
+    captured = {}
+
+    def _capture_describe_table(parsed, **kwargs):
+        captured["response"] = parsed
+
+    event_name = "after-call.dynamodb.DescribeTable"
+    dynamodb_client.meta.events.register(event_name, _capture_describe_table)
+    waiter = dynamodb_client.get_waiter("table_exists")
+    try:
+        waiter.wait(
+            TableName=table_name,
+            WaiterConfig={"Delay": 2, "MaxAttempts": max(1, timeout // 2)},
+        )
+    except WaiterError:
+        print(f"[NG] タイムアウト: テーブルが {timeout} 秒以内に ACTIVE になりませんでした")
+        return False, None
+    finally:
+        dynamodb_client.meta.events.unregister(event_name, _capture_describe_table)
 
-    print(f"[NG] タイムアウト: テーブルが {timeout} 秒以内に ACTIVE になりませんでした")
-    return False
+    print(f"[OK] テーブル '{table_name}' は ACTIVE です")
+    return True, captured.get("response")
 
 
-def describe_table(dynamodb_client, table_name: str) -> None:
-    """テーブル情報を表示する"""
+def describe_table(dynamodb_client, table_name: str, cached: dict | None = None) -> None:
+    """
+    テーブル情報を表示する
+
+    Args:
+        dynamodb_client: boto3 DynamoDB client
+        table_name: テーブル名
+        cached: 取得済みの DescribeTable レスポンス（None の場合のみ API を呼び出す）
+    """
     try:
-        response = dynamodb_client.describe_table(TableName=table_name)
+        response = cached
+        if response is None:
+            response = dynamodb_client.describe_table(TableName=table_name)
         table = response["Table"]
 
         print("\n--- テーブル情報 ---")
@@ -195,19 +213,21 @@ def main():
     region = args.region or config.get("region", "us-east-1")
 
     # DynamoDB クライアント作成
-    dynamodb_client = boto3.client("dynamodb", region_name=region)
+    dynamodb_client = get_ddb_client(region)
 
     # テーブル作成
     result = create_auth_policy_table(dynamodb_client, table_name, region)
 
+    description = None
     if result is not None:
         # テーブルが ACTIVE になるまで待機
-        if not wait_for_table_active(dynamodb_client, table_name):
+        active, description = wait_for_table_active(dynamodb_client, table_name)
+        if not active:
             print("[NG] テーブル作成に失敗しました")
             sys.exit(1)
 
-    # テーブル情報を表示
-    describe_table(dynamodb_client, table_name)
+    # テーブル情報を表示（待機時の DescribeTable レスポンスを再利用）
+    describe_table(dynamodb_client, table_name, cached=description)
 
     print(f"\n[OK] AuthPolicyTable セットアップ完了: {table_name}")
 
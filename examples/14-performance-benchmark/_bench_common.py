@@ -0,0 +1,488 @@
+"""
+ベンチマークスクリプト共通の設定読み込み・統計計算・クライアント生成
+
+benchmark-cedar-latency.py / benchmark-dynamodb-throughput.py /
+benchmark-memory-api.py / benchmark-interceptor-lambda.py で共有する。
+非同期クライアントは aioboto3 がインストールされていれば aioboto3 を、なければ boto3 +
+asyncio.to_thread を使って並行にリクエストを発行する。
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import cProfile
+import functools
+import json
+import logging
+import math
+import pstats
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any
+
+try:
+    import boto3
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except ImportError:
+    print("[ERROR] boto3 が必要です。pip install boto3 を実行してください。")
+    sys.exit(1)
+
+try:
+    import numpy as np
+except ImportError:
+    print("[ERROR] numpy が必要です。pip install numpy を実行してください。")
+    sys.exit(1)
+
+try:
+    import aioboto3
+except ImportError:
+    aioboto3 = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = Path(__file__).resolve().parent / "phase14-config.json"
+
+# 並行リクエストの実装（結果 JSON に記録する）
+ASYNC_BACKEND = "aioboto3" if aioboto3 is not None else "threads"
+
+# 計測用の時計: NTP の周波数補正（slew）を受けない CLOCK_MONOTONIC_RAW を優先し、
+# 利用できない環境では perf_counter_ns を使う。計測ループでは clock_ns(CLOCK_ID) と呼び出す
+if hasattr(time, "CLOCK_MONOTONIC_RAW"):
+    clock_ns = time.clock_gettime_ns
+    CLOCK_ID = time.CLOCK_MONOTONIC_RAW
+else:
+
+    def clock_ns(_clock_id: int) -> int:
+        """CLOCK_MONOTONIC_RAW が使えない環境向けの計測用時計"""
+        return time.perf_counter_ns()
+
+    CLOCK_ID = 0
+
+# ナノ秒 → ミリ秒の変換係数
+MS_PER_NS = 1e-6
+
+# --profile 指定時の追加実行の測定回数の上限
+PROFILE_ITERATIONS = 100
+
+# 常に出力するパーセンタイル（中央値・P95・P99）
+DEFAULT_PERCENTILES = (50.0, 95.0, 99.0)
+
+
+@functools.lru_cache(maxsize=1)
+def load_config(required_fields: tuple[str, ...]) -> dict:
+    """
+    phase14-config.json を読み込み、必須フィールドの有無を確認する
+
+    結果はキャッシュするため、同じプロセス内で何度呼び出してもファイルは 1 回だけ読む。
+    lru_cache のキーにするため required_fields はタプルで渡す。
+    """
+    try:
+        config = json.loads(CONFIG_PATH.read_text())
+    except FileNotFoundError:
+        logger.error(f"設定ファイルが見つかりません: {CONFIG_PATH}")
+        logger.info("Hint: phase14-config.json.example をコピーして設定してください")
+        sys.exit(1)
+
+    missing = [f for f in required_fields if f not in config]
+    if missing:
+        logger.error(f"設定ファイルに必須フィールドがありません: {missing}")
+        sys.exit(1)
+
+    return config
+
+
+def write_results(results: dict, output: str | None, pretty: bool = False) -> None:
+    """
+    ベンチマーク結果を JSON で書き出す
+
+    文字列全体を組み立てずにファイル（または標準出力）へ直接書き込む。
+    orjson が利用可能であれば orjson でシリアライズする。
+    デフォルトはインデントなしの 1 行で、pretty=True のときだけ 2 スペースで整形する。
+
+    Args:
+        results: ベンチマーク結果
+        output: 出力先ファイル（None の場合は標準出力）
+        pretty: インデント付きで出力するかどうか
+    """
+    if orjson is not None:
+        data = orjson.dumps(results, option=orjson.OPT_INDENT_2 if pretty else 0)
+        if output:
+            with open(output, "wb") as f:
+                f.write(data)
+        else:
+            sys.stdout.buffer.write(data + b"\n")
+            sys.stdout.flush()
+        return
+
+    indent = 2 if pretty else None
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=indent)
+    else:
+        json.dump(results, sys.stdout, ensure_ascii=False, indent=indent)
+        sys.stdout.write("\n")
+
+
+def _reduce_stats(arr: np.ndarray) -> tuple[float, float, float, float]:
+    """平均・標準偏差・最小・最大を返す（numba がない場合の実装）"""
+    mean = arr.mean()
+    stdev = 0.0
+    if arr.size > 1:
+        # arr.std() は内部で平均を計算し直すため、求めた平均からの偏差を再利用する
+        deviation = arr - mean
+        stdev = math.sqrt(float(deviation @ deviation) / (arr.size - 1))
+    return float(mean), stdev, float(arr.min()), float(arr.max())
+
+
+if njit is not None:
+
+    @njit(cache=True, fastmath=True)
+    def _stats_kernel(arr):
+        """
+        平均・標準偏差（Welford 法）・最小・最大を 1 パスで求める
+
+        ナノ秒の整数配列をそのまま走査し、単位の変換は呼び出し側で行う。
+        """
+        n = 0
+        mean = 0.0
+        m2 = 0.0
+        lo = arr[0]
+        hi = arr[0]
+        for x in arr:
+            n += 1
+            delta = x - mean
+            mean += delta / n
+            m2 += delta * (x - mean)
+            if x < lo:
+                lo = x
+            if x > hi:
+                hi = x
+        stdev = (m2 / (n - 1)) ** 0.5 if n > 1 else 0.0
+        return mean, stdev, lo, hi
+
+    # JIT コンパイル（またはキャッシュの読み込み）を計測より前に済ませる
+    _stats_kernel(np.zeros(1, dtype=np.int64))
+else:
+    _stats_kernel = _reduce_stats
+
+
+def percentile_key(p: float) -> str:
+    """パーセンタイル値から統計値のキー名を返す（50 → median, 99.9 → p99.9）"""
+    return "median" if p == 50 else f"p{p:g}"
+
+
+def parse_percentiles(value: str) -> tuple[float, ...]:
+    """--percentiles の値（例: 50,95,99,99.9）をパーセンタイルのタプルに変換する"""
+    try:
+        extra = {float(v) for v in value.split(",") if v.strip()}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"数値のカンマ区切りで指定してください: {value}")
+    if any(not 0 <= p <= 100 for p in extra):
+        raise argparse.ArgumentTypeError(f"0〜100 の範囲で指定してください: {value}")
+    # 中央値・P95・P99 は常に出力する
+    return tuple(sorted(extra | set(DEFAULT_PERCENTILES)))
+
+
+def compute_stats(latencies_ns, percentiles=DEFAULT_PERCENTILES) -> dict[str, float]:
+    """
+    レイテンシー（ナノ秒の整数）から統計値をミリ秒で計算する
+
+    clock_ns(CLOCK_ID) の差分を int64 配列のまま集計し、ミリ秒への変換は
+    得られた統計値に対して最後に行う。
+    パーセンタイルは np.quantile(method="linear") と同じ線形補間で求める。補間に必要な
+    前後の順序統計量は全体をソートせず、1 回の np.partition でまとめて O(n) で確定させる。
+    平均・標準偏差・最小・最大は numba があれば JIT コンパイルした 1 パスの
+    カーネルで計算する。
+    """
+    if len(latencies_ns) == 0:
+        return {
+            "count": 0,
+            "mean": 0,
+            **{percentile_key(p): 0 for p in percentiles},
+            "min": 0,
+            "max": 0,
+        }
+
+    arr = np.asarray(latencies_ns, dtype=np.int64)
+    count = arr.size
+    positions = np.asarray(percentiles, dtype=np.float64) / 100 * (count - 1)
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, count - 1)
+    partitioned = np.partition(arr, np.unique(np.concatenate((lower, upper))))
+    below = partitioned[lower].astype(np.float64)
+    quantiles = below + (positions - lower) * (partitioned[upper] - below)
+    mean, stdev, lo, hi = _stats_kernel(arr)
+
+    return {
+        "count": count,
+        "mean": round(float(mean) * MS_PER_NS, 3),
+        **{percentile_key(p): round(float(q) * MS_PER_NS, 3) for p, q in zip(percentiles, quantiles)},
+        "min": round(float(lo) * MS_PER_NS, 3),
+        "max": round(float(hi) * MS_PER_NS, 3),
+        "stdev": round(float(stdev) * MS_PER_NS, 3) if count > 1 else 0,
+    }
+
+
+def dry_run_stats(
+    iterations: int, base_ms: float, step_ms: float, percentiles=DEFAULT_PERCENTILES
+) -> dict[str, float]:
+    """
+    --dry-run 用のダミーデータ（base_ms + i * step_ms の等差数列）の統計値を返す
+
+    ダミーデータの分布は既知なので、配列を生成せずに閉じた式で計算する。
+    compute_stats に同じ数列を渡した場合と、浮動小数点の丸めによる最終桁（0.001 ms）の
+    違いを除いて同じ結果になる。
+    """
+    n = iterations
+    if n <= 0:
+        return compute_stats([], percentiles)
+
+    last = n - 1
+
+    return {
+        "count": n,
+        "mean": round(base_ms + step_ms * last / 2, 3),
+        # 等差数列では線形補間したパーセンタイルも同じ直線上にある
+        **{percentile_key(p): round(base_ms + step_ms * last * p / 100, 3) for p in percentiles},
+        "min": round(base_ms, 3),
+        "max": round(base_ms + step_ms * last, 3),
+        # 0..n-1 の標本分散は n(n+1)/12
+        "stdev": round(step_ms * math.sqrt(n * (n + 1) / 12), 3) if n > 1 else 0,
+    }
+
+
+def make_boto_config(concurrency: int) -> Config:
+    """
+    並行数に合わせたコネクションプールを持つクライアント設定を作成する
+
+    リトライは最小限にして、再送による遅延が統計に混ざりにくくする。
+    """
+    return Config(
+        max_pool_connections=max(64, concurrency * 2),
+        retries={"max_attempts": 2, "mode": "standard"},
+        tcp_keepalive=True,
+    )
+
+
+def build_lambda_client(region: str, concurrency: int):
+    """並行数に合わせたコネクションプールを持つ Lambda クライアントを作成する"""
+    return boto3.client("lambda", region_name=region, config=make_boto_config(concurrency))
+
+
+@functools.lru_cache(maxsize=16)
+def create_mock_jwt(role="user", tenant_id="tenant-a", user_id="user-1"):
+    """
+    テスト用の JWT トークンを生成する
+
+    内容は引数だけで決まるため、同じ引数の呼び出しはキャッシュした文字列を返す。
+    """
+    header = base64.urlsafe_b64encode(
+        json.dumps({"alg": "none", "typ": "JWT"}).encode()
+    ).rstrip(b"=").decode()
+
+    payload = base64.urlsafe_b64encode(
+        json.dumps({
+            "sub": user_id,
+            "role": role,
+            "tenant_id": tenant_id,
+            "client_id": "test-client-id",
+            "token_use": "access",
+        }).encode()
+    ).rstrip(b"=").decode()
+
+    signature = base64.urlsafe_b64encode(b"test-signature").rstrip(b"=").decode()
+    return f"Bearer {header}.{payload}.{signature}"
+
+
+class ThreadedClient:
+    """
+    boto3 クライアント / Table のメソッド呼び出しを asyncio.to_thread で実行するラッパー
+
+    aioboto3 が利用できない場合に、aioboto3 と同じく
+    `await client.is_authorized(...)` の形で呼び出せるようにする。
+    """
+
+    def __init__(self, client: Any):
+        self._client = client
+
+    def __getattr__(self, name: str):
+        method = getattr(self._client, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
+@contextlib.contextmanager
+def thread_executor(concurrency: int):
+    """asyncio.to_thread が使うスレッドプールを concurrency に合わせて差し替える"""
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    asyncio.get_running_loop().set_default_executor(executor)
+    try:
+        yield
+    finally:
+        executor.shutdown(wait=False)
+
+
+@contextlib.asynccontextmanager
+async def open_async_client(service_name: str, region: str, concurrency: int):
+    """
+    非同期呼び出し用のクライアントを開く
+
+    aioboto3 があればそのクライアントを、なければ boto3 クライアントを
+    ThreadedClient で包んで返す。
+    """
+    config = make_boto_config(concurrency)
+    if aioboto3 is not None:
+        session = aioboto3.Session(region_name=region)
+        async with session.client(service_name, config=config) as client:
+            yield client
+        return
+
+    with thread_executor(concurrency):
+        session = boto3.Session(region_name=region)
+        yield ThreadedClient(session.client(service_name, config=config))
+
+
+@contextlib.asynccontextmanager
+async def open_warm_client(
+    service_name: str, region: str, concurrency: int, operation: str, **params
+):
+    """
+    クライアントを開き、計測前に無害な API を 1 回呼び出して初期化を済ませる
+
+    最初の呼び出しで発生するサービスモデルの読み込み・認証情報の解決・
+    TLS ハンドシェイクを計測から切り離す（WARMUP_COUNT とは別）。
+    権限不足などの ClientError は無視する。
+
+    Args:
+        operation: 初期化に使う API（例: "list_tables"）
+        **params: operation に渡すパラメータ
+
+    Yields:
+        (client, setup_ms): クライアントと、生成から初期化完了までの時間（ミリ秒）
+    """
+    start = clock_ns(CLOCK_ID)
+    async with open_async_client(service_name, region, concurrency) as client:
+        try:
+            await getattr(client, operation)(**params)
+        except ClientError:
+            pass
+        setup_ms = round((clock_ns(CLOCK_ID) - start) * MS_PER_NS, 3)
+        logger.info(f"[OK] クライアント初期化: {setup_ms:.1f}ms（統計には含めない）")
+        yield client, setup_ms
+
+
+async def run_concurrently(call, total_iterations: int, concurrency: int) -> list:
+    """
+    call(i) を total_iterations 回、最大 concurrency 件ずつ並行に実行する
+
+    Returns:
+        call(i) の戻り値のリスト（i の順）
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def task(i: int):
+        async with semaphore:
+            return await call(i)
+
+    return await asyncio.gather(*(task(i) for i in range(total_iterations)))
+
+
+async def run_with_warmup(call, warmup_count: int, iterations: int, concurrency: int) -> list:
+    """
+    ウォームアップを独立したフェーズとして実行してから計測する
+
+    ウォームアップの結果は捨て、計測フェーズの結果だけを返すため、
+    呼び出し側でインデックスによる除外判定をする必要がない。
+
+    Returns:
+        計測フェーズの call(i) の戻り値のリスト（i の順）
+    """
+    await run_concurrently(call, warmup_count, concurrency)
+    return await run_concurrently(call, iterations, concurrency)
+
+
+def run_in_processes(worker, jobs: dict[str, tuple]) -> dict[str, Any]:
+    """
+    シナリオごとに worker(*args) を別プロセスで並行に実行する
+
+    boto3 の Session はプロセス間で共有できないため、worker はプロセス内で
+    クライアントを生成すること。
+
+    Args:
+        worker: モジュールトップレベルの関数（pickle 可能であること）
+        jobs: シナリオ名 → worker に渡す引数のタプル
+
+    Returns:
+        シナリオ名 → worker の戻り値（jobs と同じ順序）
+    """
+    with ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = {executor.submit(worker, *args): name for name, args in jobs.items()}
+        done = {futures[future]: future.result() for future in as_completed(futures)}
+    return {name: done[name] for name in jobs}
+
+
+def profile_run(func, mode: str, output: str | None) -> None:
+    """
+    func() をプロファイラー下で実行し、結果を出力する
+
+    レイテンシーの統計とは別の追加実行として呼び出すこと（プロファイラーの
+    オーバーヘッドが計測値に混ざらないようにするため）。
+
+    Args:
+        func: プロファイル対象の処理（引数なし）
+        mode: "cprofile" または "pyinstrument"
+        output: 結果 JSON の出力先。指定時は <output>.prof / <output>.html に保存し、
+            未指定時は標準エラー出力に表示する
+    """
+    if mode == "pyinstrument":
+        if Profiler is None:
+            logger.error("pyinstrument が必要です。pip install pyinstrument を実行してください。")
+            sys.exit(1)
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        try:
+            func()
+        finally:
+            profiler.stop()
+        if output:
+            path = f"{output}.html"
+            Path(path).write_text(profiler.output_html())
+            logger.info(f"[OK] プロファイルを保存しました: {path}")
+        else:
+            sys.stderr.write(profiler.output_text())
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        func()
+    finally:
+        profiler.disable()
+    if output:
+        path = f"{output}.prof"
+        profiler.dump_stats(path)
+        logger.info(f"[OK] プロファイルを保存しました: {path}")
+    else:
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(40)
@@ -17,58 +17,122 @@ Usage:
   python3 benchmark-cedar-latency.py
   python3 benchmark-cedar-latency.py --iterations 500
   python3 benchmark-cedar-latency.py --dry-run
+  python3 benchmark-cedar-latency.py --concurrency 64
 
 環境変数:
   AWS_DEFAULT_REGION: AWS リージョン（デフォルト: us-east-1）
+
+aioboto3 がインストールされていれば非同期クライアントで、なければ boto3 +
+asyncio.to_thread で --concurrency 件のリクエストを並行に発行する。
 """
 
 import argparse
-import json
+import asyncio
 import logging
 import os
-import statistics
 import sys
 import time
-from typing import Any
 
 try:
-    import boto3
     from botocore.exceptions import ClientError
 except ImportError:
     print("[ERROR] boto3 が必要です。pip install boto3 を実行してください。")
     sys.exit(1)
 
+try:
+    import numpy as np
+except ImportError:
+    print("[ERROR] numpy が必要です。pip install numpy を実行してください。")
+    sys.exit(1)
+
+from _bench_common import (
+    ASYNC_BACKEND,
+    CLOCK_ID,
+    PROFILE_ITERATIONS,
+    clock_ns,
+    compute_stats,
+    dry_run_stats,
+    load_config,
+    open_warm_client,
+    profile_run,
+    run_in_processes,
+    run_with_warmup,
+    write_results,
+)
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
 )
 logger = logging.getLogger(__name__)
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-CONFIG_FILE = os.path.join(SCRIPT_DIR, "phase14-config.json")
 REGION = os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
 
 # ウォームアップ回数（統計から除外）
 WARMUP_COUNT = 10
 
+# 同時に発行するリクエスト数のデフォルト
+DEFAULT_CONCURRENCY = 32
 
-def load_config() -> dict:
-    """phase14-config.json を読み込む"""
-    if not os.path.exists(CONFIG_FILE):
-        logger.error(f"設定ファイルが見つかりません: {CONFIG_FILE}")
-        logger.info("Hint: phase14-config.json.example をコピーして設定してください")
-        sys.exit(1)
-
-    with open(CONFIG_FILE) as f:
-        config = json.load(f)
-
-    required_fields = ["region", "gatewayId", "policyEngineId"]
-    missing = [f for f in required_fields if f not in config]
-    if missing:
-        logger.error(f"設定ファイルに必須フィールドがありません: {missing}")
-        sys.exit(1)
-
-    return config
+# テストシナリオの定義
+SCENARIOS = {
+    "admin_allow": {
+        "principal": {
+            "entityType": "AgentCore::User",
+            "entityId": "admin@tenant-a.example.com",
+        },
+        "action": {
+            "actionType": "AgentCore::Action",
+            "actionId": "InvokeTool",
+        },
+        "resource": {
+            "entityType": "AgentCore::Tool",
+            "entityId": "financial-data",
+        },
+    },
+    "user_allow": {
+        "principal": {
+            "entityType": "AgentCore::User",
+            "entityId": "user@tenant-a.example.com",
+        },
+        "action": {
+            "actionType": "AgentCore::Action",
+            "actionId": "InvokeTool",
+        },
+        "resource": {
+            "entityType": "AgentCore::Tool",
+            "entityId": "read-only-data",
+        },
+    },
+    "user_deny": {
+        "principal": {
+            "entityType": "AgentCore::User",
+            "entityId": "user@tenant-a.example.com",
+        },
+        "action": {
+            "actionType": "AgentCore::Action",
+            "actionId": "InvokeTool",
+        },
+        "resource": {
+            "entityType": "AgentCore::Tool",
+            "entityId": "admin-only-tool",
+        },
+    },
+    "unknown_principal": {
+        "principal": {
+            "entityType": "AgentCore::User",
+            "entityId": "unknown@unknown.example.com",
+        },
+        "action": {
+            "actionType": "AgentCore::Action",
+            "actionId": "InvokeTool",
+        },
+        "resource": {
+            "entityType": "AgentCore::Tool",
+            "entityId": "some-tool",
+        },
+    },
+}
 
 
 def get_jwt_token(cognito_client, config: dict, username: str, password: str) -> str:
@@ -88,70 +152,19 @@ def get_jwt_token(cognito_client, config: dict, username: str, password: str) ->
         raise
 
 
-def compute_stats(latencies: list[float]) -> dict[str, float]:
-    """レイテンシーリストから統計値を計算する"""
-    if not latencies:
-        return {"count": 0, "mean": 0, "median": 0, "p95": 0, "p99": 0, "min": 0, "max": 0}
-
-    sorted_latencies = sorted(latencies)
-    count = len(sorted_latencies)
-    p95_idx = int(count * 0.95)
-    p99_idx = int(count * 0.99)
-
-    return {
-        "count": count,
-        "mean": round(statistics.mean(sorted_latencies), 3),
-        "median": round(statistics.median(sorted_latencies), 3),
-        "p95": round(sorted_latencies[min(p95_idx, count - 1)], 3),
-        "p99": round(sorted_latencies[min(p99_idx, count - 1)], 3),
-        "min": round(min(sorted_latencies), 3),
-        "max": round(max(sorted_latencies), 3),
-        "stdev": round(statistics.stdev(sorted_latencies), 3) if count > 1 else 0,
-    }
-
-
-def measure_is_authorized(
-    client: Any,
-    policy_store_id: str,
-    principal: dict,
-    action: dict,
-    resource: dict,
-    context: dict | None = None,
-) -> tuple[float, bool, str]:
-    """
-    IsAuthorized API を1回呼び出してレイテンシーを測定する
-
-    Returns:
-        (latency_ms, success, decision)
-    """
-    start = time.perf_counter()
-    try:
-        params = {
-            "policyStoreId": policy_store_id,
-            "principal": principal,
-            "action": action,
-            "resource": resource,
-        }
-        if context:
-            params["context"] = context
-
-        response = client.is_authorized(**params)
-        elapsed = (time.perf_counter() - start) * 1000
-        decision = response.get("decision", "UNKNOWN")
-        return elapsed, True, decision
-    except ClientError as e:
-        elapsed = (time.perf_counter() - start) * 1000
-        return elapsed, False, str(e)
-
-
 def benchmark_cedar_latency(
-    config: dict, iterations: int, dry_run: bool = False
+    config: dict,
+    iterations: int,
+    dry_run: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    parallel_scenarios: bool = False,
 ) -> dict:
     """Cedar Policy Engine のレイテンシーベンチマークを実行する"""
     results = {
         "benchmark": "cedar-latency",
         "iterations": iterations,
         "warmup_count": WARMUP_COUNT,
+        "concurrency": concurrency,
         "region": config.get("region", REGION),
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
         "scenarios": {},
@@ -159,119 +172,123 @@ def benchmark_cedar_latency(
 
     if dry_run:
         logger.info("[DRY-RUN] Cedar レイテンシーベンチマーク（実際の API 呼び出しはスキップ）")
-        for scenario in ["admin_allow", "user_allow", "user_deny", "unknown_principal"]:
+        for scenario in SCENARIOS:
             results["scenarios"][scenario] = {
-                "stats": compute_stats([1.0 + i * 0.1 for i in range(iterations)]),
+                "stats": dry_run_stats(iterations, 1.0, 0.1),
                 "errors": 0,
                 "dry_run": True,
             }
         return results
 
-    client = boto3.client(
-        "verifiedpermissions", region_name=config.get("region", REGION)
-    )
+    region = config.get("region", REGION)
     policy_store_id = config["policyEngineId"]
 
-    # テストシナリオの定義
-    scenarios = {
-        "admin_allow": {
-            "principal": {
-                "entityType": "AgentCore::User",
-                "entityId": "admin@tenant-a.example.com",
-            },
-            "action": {
-                "actionType": "AgentCore::Action",
-                "actionId": "InvokeTool",
-            },
-            "resource": {
-                "entityType": "AgentCore::Tool",
-                "entityId": "financial-data",
-            },
-        },
-        "user_allow": {
-            "principal": {
-                "entityType": "AgentCore::User",
-                "entityId": "user@tenant-a.example.com",
-            },
-            "action": {
-                "actionType": "AgentCore::Action",
-                "actionId": "InvokeTool",
-            },
-            "resource": {
-                "entityType": "AgentCore::Tool",
-                "entityId": "read-only-data",
-            },
-        },
-        "user_deny": {
-            "principal": {
-                "entityType": "AgentCore::User",
-                "entityId": "user@tenant-a.example.com",
-            },
-            "action": {
-                "actionType": "AgentCore::Action",
-                "actionId": "InvokeTool",
-            },
-            "resource": {
-                "entityType": "AgentCore::Tool",
-                "entityId": "admin-only-tool",
-            },
-        },
-        "unknown_principal": {
-            "principal": {
-                "entityType": "AgentCore::User",
-                "entityId": "unknown@unknown.example.com",
-            },
-            "action": {
-                "actionType": "AgentCore::Action",
-                "actionId": "InvokeTool",
-            },
-            "resource": {
-                "entityType": "AgentCore::Tool",
-                "entityId": "some-tool",
-            },
-        },
+    # リクエストパラメータはシナリオごとに 1 回だけ組み立て、計測区間では生成しない
+    scenario_params = {
+        name: {"policyStoreId": policy_store_id, **scenario}
+        for name, scenario in SCENARIOS.items()
     }
 
+    results["async_backend"] = ASYNC_BACKEND
+    results["parallel_scenarios"] = parallel_scenarios
+    if parallel_scenarios:
+        results["scenarios"] = run_in_processes(
+            run_scenario,
+            {
+                name: (region, name, params, iterations, concurrency)
+                for name, params in scenario_params.items()
+            },
+        )
+    else:
+        results["scenarios"], results["setup_ms"] = asyncio.run(
+            _run_scenarios(region, scenario_params, iterations, concurrency)
+        )
+    return results
+
+
+async def _measure_scenario(
+    client, scenario_name: str, params: dict, iterations: int, concurrency: int
+) -> dict:
+    """1 シナリオを並行リクエストで測定する"""
     total_iterations = WARMUP_COUNT + iterations
-    for scenario_name, params in scenarios.items():
-        logger.info(f"[START] シナリオ: {scenario_name} ({total_iterations} 回)")
-        latencies = []
-        errors = 0
-
-        for i in range(total_iterations):
-            latency, success, decision = measure_is_authorized(
-                client,
-                policy_store_id,
-                params["principal"],
-                params["action"],
-                params["resource"],
-            )
-
-            # ウォームアップ期間はスキップ
-            if i < WARMUP_COUNT:
-                continue
-
-            if success:
-                latencies.append(latency)
-            else:
-                errors += 1
-                if errors <= 3:
-                    logger.warning(f"  エラー #{errors}: {decision}")
-
-        stats = compute_stats(latencies)
-        results["scenarios"][scenario_name] = {
-            "stats": stats,
-            "errors": errors,
+    logger.info(
+        f"[START] シナリオ: {scenario_name} ({total_iterations} 回, 並行数: {concurrency})"
+    )
+    # 成功した呼び出しのレイテンシーを先頭から詰めて格納する
+    latencies = np.empty(iterations, dtype=np.int64)
+    idx = 0
+    errors = 0
+
+    async def call(_i: int) -> tuple[int, bool, str]:
+        start = clock_ns(CLOCK_ID)
+        try:
+            response = await client.is_authorized(**params)
+        except ClientError as e:
+            return clock_ns(CLOCK_ID) - start, False, str(e)
+        elapsed = clock_ns(CLOCK_ID) - start
+        return elapsed, True, response.get("decision", "UNKNOWN")
+
+    measurements = await run_with_warmup(call, WARMUP_COUNT, iterations, concurrency)
+
+    for latency, success, decision in measurements:
+        if success:
+            latencies[idx] = latency
+            idx += 1
+        else:
+            errors += 1
+            if errors <= 3:
+                logger.warning(f"  エラー #{errors}: {decision}")
+
+    stats = compute_stats(latencies[:idx])
+    logger.info(
+        f"  [OK] {scenario_name} 平均: {stats['mean']:.1f}ms, "
+        f"中央値: {stats['median']:.1f}ms, "
+        f"P95: {stats['p95']:.1f}ms, "
+        f"P99: {stats['p99']:.1f}ms, "
+        f"エラー: {errors}"
+    )
+    return {"stats": stats, "errors": errors}
+
+
+async def _run_scenarios(
+    region: str, scenario_params: dict, iterations: int, concurrency: int
+) -> tuple[dict, float]:
+    """
+    全シナリオを順に測定する
+
+    Returns:
+        (シナリオ名 → 結果, クライアント初期化時間 ms)
+    """
+    # 全シナリオで 1 つのクライアント（= 1 つのコネクションプール）を共有する
+    async with open_warm_client(
+        "verifiedpermissions", region, concurrency, "list_policy_stores", maxResults=1
+    ) as (client, setup_ms):
+        scenarios = {
+            name: await _measure_scenario(client, name, params, iterations, concurrency)
+            for name, params in scenario_params.items()
         }
-        logger.info(
-            f"  [OK] 平均: {stats['mean']:.1f}ms, "
-            f"中央値: {stats['median']:.1f}ms, "
-            f"P95: {stats['p95']:.1f}ms, "
-            f"P99: {stats['p99']:.1f}ms, "
-            f"エラー: {errors}"
-        )
+    return scenarios, setup_ms
 
-    return results
+
+def run_scenario(
+    region: str, scenario_name: str, params: dict, iterations: int, concurrency: int
+) -> dict:
+    """
+    1 シナリオを専用のクライアントで測定する（--parallel-scenarios のワーカー）
+
+    Session とクライアントはワーカープロセス内で生成し、初期化時間は
+    シナリオの結果に setup_ms として含める。
+    """
+
+    async def run() -> dict:
+        async with open_warm_client(
+            "verifiedpermissions", region, concurrency, "list_policy_stores", maxResults=1
+        ) as (client, setup_ms):
+            result = await _measure_scenario(client, scenario_name, params, iterations, concurrency)
+        result["setup_ms"] = setup_ms
+        return result
+
+    return asyncio.run(run())
 
 
 def main():
@@ -295,6 +312,31 @@ def main():
         default=None,
         help="結果の出力先ファイル（デフォルト: 標準出力）",
     )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="JSON をインデント付きで出力する（デフォルト: 1 行）",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"同時に発行するリクエスト数（デフォルト: {DEFAULT_CONCURRENCY}）",
+    )
+    parser.add_argument(
+        "--parallel-scenarios",
+        action="store_true",
+        help="シナリオごとに別プロセスで並行に実行する（シナリオ間で負荷が干渉する）",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["cprofile", "pyinstrument"],
+        default=None,
+        help=(
+            "計測後にプロファイル用の追加実行を行う"
+            f"（最大 {PROFILE_ITERATIONS} 回、統計には含めない）"
+        ),
+    )
     args = parser.parse_args()
 
     logger.info("=" * 60)
@@ -302,19 +344,32 @@ def main():
     logger.info("=" * 60)
     logger.info(f"  測定回数: {args.iterations}")
     logger.info(f"  ウォームアップ: {WARMUP_COUNT}")
+    logger.info(f"  並行数: {args.concurrency}")
+    logger.info(f"  シナリオ並行実行: {args.parallel_scenarios}")
     logger.info(f"  Dry-run: {args.dry_run}")
 
-    config = load_config()
-    results = benchmark_cedar_latency(config, args.iterations, args.dry_run)
-
-    output_json = json.dumps(results, indent=2, ensure_ascii=False)
+    config = load_config(("region", "gatewayId", "policyEngineId"))
+    results = benchmark_cedar_latency(
+        config, args.iterations, args.dry_run, args.concurrency, args.parallel_scenarios
+    )
 
+    write_results(results, args.output, args.pretty)
     if args.output:
-        with open(args.output, "w") as f:
-            f.write(output_json)
         logger.info(f"[OK] 結果を保存しました: {args.output}")
-    else:
-        print(output_json)
+
+    if args.profile:
+        # 統計に使った計測とは別に、プロファイラー下で短く再実行する
+        logger.info(f"[PROFILE] {args.profile} でプロファイル用の追加実行を開始します")
+        profile_run(
+            lambda: benchmark_cedar_latency(
+                config,
+                min(args.iterations, PROFILE_ITERATIONS),
+                args.dry_run,
+                args.concurrency,
+            ),
+            args.profile,
+            args.output,
+        )
 
 
 if __name__ == "__main__":
@@ -15,127 +15,151 @@ Usage:
   python3 benchmark-dynamodb-throughput.py
   python3 benchmark-dynamodb-throughput.py --iterations 200
   python3 benchmark-dynamodb-throughput.py --dry-run
+  python3 benchmark-dynamodb-throughput.py --concurrency 64
 
 環境変数:
   AWS_DEFAULT_REGION: AWS リージョン（デフォルト: us-east-1）
+
+aioboto3 がインストールされていれば非同期クライアントで、なければ boto3 +
+asyncio.to_thread で --concurrency 件のリクエストを並行に発行する。
 """
 
 import argparse
-import json
+import asyncio
 import logging
 import os
-import statistics
 import sys
 import time
 from typing import Any
 
 try:
-    import boto3
-    from boto3.dynamodb.conditions import Key
     from botocore.exceptions import ClientError
 except ImportError:
     print("[ERROR] boto3 が必要です。pip install boto3 を実行してください。")
     sys.exit(1)
 
+try:
+    import numpy as np
+except ImportError:
+    print("[ERROR] numpy が必要です。pip install numpy を実行してください。")
+    sys.exit(1)
+
+from _bench_common import (
+    ASYNC_BACKEND,
+    CLOCK_ID,
+    PROFILE_ITERATIONS,
+    clock_ns,
+    compute_stats,
+    dry_run_stats,
+    load_config,
+    open_warm_client,
+    profile_run,
+    run_in_processes,
+    run_with_warmup,
+    write_results,
+)
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
 )
 logger = logging.getLogger(__name__)
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-CONFIG_FILE = os.path.join(SCRIPT_DIR, "phase14-config.json")
 REGION = os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
 
 WARMUP_COUNT = 10
 
+# 同時に発行するリクエスト数のデフォルト
+DEFAULT_CONCURRENCY = 32
+
+# TenantIdIndex の Query 条件（値は ExpressionAttributeValues で渡す）
+TENANT_KEY_CONDITION = "tenant_id = :t"
+
+# BatchGetItem の UnprocessedKeys の最大リトライ回数
+BATCH_MAX_RETRIES = 5
+
+# BatchGetItem シナリオのバッチサイズ
+BATCH_SIZES = [10, 50, 100]
 
-def load_config() -> dict:
-    """phase14-config.json を読み込む"""
-    if not os.path.exists(CONFIG_FILE):
-        logger.error(f"設定ファイルが見つかりません: {CONFIG_FILE}")
-        logger.info("Hint: phase14-config.json.example をコピーして設定してください")
-        sys.exit(1)
-
-    with open(CONFIG_FILE) as f:
-        config = json.load(f)
-
-    required_fields = ["region", "tableName"]
-    missing = [f for f in required_fields if f not in config]
-    if missing:
-        logger.error(f"設定ファイルに必須フィールドがありません: {missing}")
-        sys.exit(1)
-
-    return config
-
-
-def compute_stats(latencies: list[float]) -> dict[str, float]:
-    """レイテンシーリストから統計値を計算する"""
-    if not latencies:
-        return {"count": 0, "mean": 0, "median": 0, "p95": 0, "p99": 0, "min": 0, "max": 0}
-
-    sorted_latencies = sorted(latencies)
-    count = len(sorted_latencies)
-    p95_idx = int(count * 0.95)
-    p99_idx = int(count * 0.99)
-
-    return {
-        "count": count,
-        "mean": round(statistics.mean(sorted_latencies), 3),
-        "median": round(statistics.median(sorted_latencies), 3),
-        "p95": round(sorted_latencies[min(p95_idx, count - 1)], 3),
-        "p99": round(sorted_latencies[min(p99_idx, count - 1)], 3),
-        "min": round(min(sorted_latencies), 3),
-        "max": round(max(sorted_latencies), 3),
-        "stdev": round(statistics.stdev(sorted_latencies), 3) if count > 1 else 0,
-    }
 
+async def measure_get_item(client: Any, table_name: str, key: dict) -> tuple[int, bool]:
+    """
+    GetItem (Email PK) のレイテンシーを測定する
 
-def measure_get_item(table: Any, email: str) -> tuple[float, bool]:
-    """GetItem (Email PK) のレイテンシーを測定する"""
-    start = time.perf_counter()
+    Args:
+        key: マーシャリング済みのキー（例: {"email": {"S": "..."}}）
+    """
+    start = clock_ns(CLOCK_ID)
     try:
-        response = table.get_item(Key={"email": email})
-        elapsed = (time.perf_counter() - start) * 1000
+        response = await client.get_item(TableName=table_name, Key=key)
+        elapsed = clock_ns(CLOCK_ID) - start
         return elapsed, "Item" in response
     except ClientError:
-        elapsed = (time.perf_counter() - start) * 1000
+        elapsed = clock_ns(CLOCK_ID) - start
         return elapsed, False
 
 
-def measure_query_by_tenant(table: Any, tenant_id: str) -> tuple[float, bool, int]:
-    """Query (TenantId GSI) のレイテンシーを測定する"""
-    start = time.perf_counter()
+async def measure_query_by_tenant(
+    client: Any, table_name: str, expression_values: dict
+) -> tuple[int, bool, int]:
+    """
+    Query (TenantId GSI) のレイテンシーを測定する
+
+    Args:
+        expression_values: マーシャリング済みの ExpressionAttributeValues
+            （例: {":t": {"S": "tenant-a"}}）
+    """
+    start = clock_ns(CLOCK_ID)
     try:
-        response = table.query(
+        response = await client.query(
+            TableName=table_name,
             IndexName="TenantIdIndex",
-            KeyConditionExpression=Key("tenant_id").eq(tenant_id),
+            KeyConditionExpression=TENANT_KEY_CONDITION,
+            ExpressionAttributeValues=expression_values,
         )
-        elapsed = (time.perf_counter() - start) * 1000
+        elapsed = clock_ns(CLOCK_ID) - start
         return elapsed, True, response.get("Count", 0)
     except ClientError:
-        elapsed = (time.perf_counter() - start) * 1000
+        elapsed = clock_ns(CLOCK_ID) - start
         return elapsed, False, 0
 
 
-def measure_batch_get(dynamodb_resource: Any, table_name: str, emails: list[str]) -> tuple[float, bool, int]:
-    """BatchGetItem のレイテンシーを測定する"""
-    keys = [{"email": email} for email in emails]
-    start = time.perf_counter()
+async def measure_batch_get(
+    client: Any, table_name: str, request_items: dict
+) -> tuple[int, bool, int, int]:
+    """
+    BatchGetItem のレイテンシーを測定する
+
+    計測するのは最初の BatchGetItem 呼び出しだけで、UnprocessedKeys の再送は
+    計測区間の外で指数バックオフしながら行う。
+
+    Args:
+        request_items: 事前に組み立てた RequestItems（全呼び出しで使い回す）
+
+    Returns:
+        (latency_ns, success, item_count, retry_count)
+    """
+    start = clock_ns(CLOCK_ID)
     try:
-        response = dynamodb_resource.batch_get_item(
-            RequestItems={
-                table_name: {
-                    "Keys": keys,
-                }
-            }
-        )
-        elapsed = (time.perf_counter() - start) * 1000
-        items = response.get("Responses", {}).get(table_name, [])
-        return elapsed, True, len(items)
+        response = await client.batch_get_item(RequestItems=request_items)
     except ClientError:
-        elapsed = (time.perf_counter() - start) * 1000
-        return elapsed, False, 0
+        return clock_ns(CLOCK_ID) - start, False, 0, 0
+    elapsed = clock_ns(CLOCK_ID) - start
+
+    items = len(response.get("Responses", {}).get(table_name, []))
+    unprocessed = response.get("UnprocessedKeys") or {}
+    retries = 0
+    while unprocessed and retries < BATCH_MAX_RETRIES:
+        retries += 1
+        await asyncio.sleep(min(0.05 * (2 ** retries), 2.0))
+        try:
+            response = await client.batch_get_item(RequestItems=unprocessed)
+        except ClientError:
+            return elapsed, False, items, retries
+        items += len(response.get("Responses", {}).get(table_name, []))
+        unprocessed = response.get("UnprocessedKeys") or {}
+
+    return elapsed, not unprocessed, items, retries
 
 
 def generate_test_emails(count: int) -> list[str]:
@@ -150,143 +174,193 @@ def generate_test_emails(count: int) -> list[str]:
     return emails
 
 
+def build_scenarios(table_name: str) -> dict[str, dict]:
+    """
+    シナリオ名 → 計測内容の定義を作成する
+
+    低レベルクライアント用のキー・条件値・RequestItems はここで事前に
+    マーシャリングしておき、計測区間では生成しない。
+    """
+    # テスト用メールアドレスとテナント
+    test_emails = [
+        "admin@tenant-a.example.com",
+        "user@tenant-a.example.com",
+        "viewer@tenant-a.example.com",
+    ]
+    test_tenants = ["tenant-a", "tenant-b"]
+
+    scenarios = {
+        "get_item_email_pk": {
+            "label": "GetItem (Email PK)",
+            "kind": "get_item",
+            "keys": [{"email": {"S": email}} for email in test_emails],
+        },
+        "query_tenant_gsi": {
+            "label": "Query (TenantId GSI)",
+            "kind": "query",
+            "values": [{":t": {"S": tenant}} for tenant in test_tenants],
+        },
+    }
+
+    for batch_size in BATCH_SIZES:
+        # DynamoDB BatchGetItem は最大 100 アイテムまで
+        effective_batch = generate_test_emails(batch_size)[:min(batch_size, 100)]
+        scenarios[f"batch_get_{batch_size}"] = {
+            "label": f"BatchGetItem (サイズ: {batch_size})",
+            "kind": "batch_get",
+            "batch_size": batch_size,
+            "request_items": {
+                table_name: {"Keys": [{"email": {"S": e}} for e in effective_batch]}
+            },
+        }
+
+    return scenarios
+
+
 def benchmark_dynamodb_throughput(
-    config: dict, iterations: int, dry_run: bool = False
+    config: dict,
+    iterations: int,
+    dry_run: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    parallel_scenarios: bool = False,
 ) -> dict:
     """DynamoDB スループットベンチマークを実行する"""
+    region = config.get("region", REGION)
+    table_name = config["tableName"]
     results = {
         "benchmark": "dynamodb-throughput",
         "iterations": iterations,
         "warmup_count": WARMUP_COUNT,
-        "region": config.get("region", REGION),
-        "table_name": config["tableName"],
+        "concurrency": concurrency,
+        "region": region,
+        "table_name": table_name,
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
         "scenarios": {},
     }
+    scenarios = build_scenarios(table_name)
 
     if dry_run:
         logger.info("[DRY-RUN] DynamoDB スループットベンチマーク（実際の API 呼び出しはスキップ）")
-        scenarios = [
-            "get_item_email_pk",
-            "query_tenant_gsi",
-            "batch_get_10",
-            "batch_get_50",
-            "batch_get_100",
-        ]
         for scenario in scenarios:
             results["scenarios"][scenario] = {
-                "stats": compute_stats([2.0 + i * 0.05 for i in range(iterations)]),
+                "stats": dry_run_stats(iterations, 2.0, 0.05),
                 "errors": 0,
                 "dry_run": True,
             }
         return results
 
-    region = config.get("region", REGION)
-    table_name = config["tableName"]
-    dynamodb = boto3.resource("dynamodb", region_name=region)
-    dynamodb_client = boto3.resource("dynamodb", region_name=region)
-    table = dynamodb.Table(table_name)
+    results["async_backend"] = ASYNC_BACKEND
+    results["parallel_scenarios"] = parallel_scenarios
+    if parallel_scenarios:
+        results["scenarios"] = run_in_processes(
+            run_scenario,
+            {
+                name: (region, table_name, spec, iterations, concurrency)
+                for name, spec in scenarios.items()
+            },
+        )
+    else:
+        results["scenarios"], results["setup_ms"] = asyncio.run(
+            _run_scenarios(region, table_name, scenarios, iterations, concurrency)
+        )
+    return results
 
-    # テスト用メールアドレスとテナント
-    test_emails = [
-        "admin@tenant-a.example.com",
-        "user@tenant-a.example.com",
-        "viewer@tenant-a.example.com",
-    ]
-    test_tenants = ["tenant-a", "tenant-b"]
 
-    total_iterations = WARMUP_COUNT + iterations
+def _collect(measurements: list) -> tuple[np.ndarray, int]:
+    """
+    測定結果からレイテンシー配列とエラー数を取り出す
 
-    # --- シナリオ 1: GetItem (Email PK) ---
-    logger.info(f"[START] GetItem (Email PK) ({total_iterations} 回)")
-    latencies = []
+    成功した呼び出しのレイテンシーを事前に確保した int64 配列へ先頭から詰めて格納し、
+    格納済みの部分だけを返す。
+    """
+    latencies = np.empty(len(measurements), dtype=np.int64)
+    idx = 0
     errors = 0
-    for i in range(total_iterations):
-        email = test_emails[i % len(test_emails)]
-        latency, success = measure_get_item(table, email)
-        if i >= WARMUP_COUNT:
-            if success:
-                latencies.append(latency)
-            else:
-                errors += 1
-
-    stats = compute_stats(latencies)
-    results["scenarios"]["get_item_email_pk"] = {"stats": stats, "errors": errors}
-    logger.info(
-        f"  [OK] 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
-        f"P95: {stats['p95']:.1f}ms, P99: {stats['p99']:.1f}ms"
+    for latency, success, *_ in measurements:
+        if success:
+            latencies[idx] = latency
+            idx += 1
+        else:
+            errors += 1
+    return latencies[:idx], errors
+
+
+def _make_call(client: Any, table_name: str, spec: dict):
+    """シナリオ定義から call(i) を作成する"""
+    kind = spec["kind"]
+    if kind == "get_item":
+        keys = spec["keys"]
+        return lambda i: measure_get_item(client, table_name, keys[i % len(keys)])
+    if kind == "query":
+        values = spec["values"]
+        return lambda i: measure_query_by_tenant(client, table_name, values[i % len(values)])
+    request_items = spec["request_items"]
+    return lambda _i: measure_batch_get(client, table_name, request_items)
+
+
+async def _measure_scenario(
+    client: Any, table_name: str, spec: dict, iterations: int, concurrency: int
+) -> dict:
+    """1 シナリオを並行リクエストで測定する"""
+    total_iterations = WARMUP_COUNT + iterations
+    logger.info(f"[START] {spec['label']} ({total_iterations} 回, 並行数: {concurrency})")
+    measurements = await run_with_warmup(
+        _make_call(client, table_name, spec), WARMUP_COUNT, iterations, concurrency
     )
-
-    # --- シナリオ 2: Query (TenantId GSI) ---
-    logger.info(f"[START] Query (TenantId GSI) ({total_iterations} 回)")
-    latencies = []
-    errors = 0
-    for i in range(total_iterations):
-        tenant = test_tenants[i % len(test_tenants)]
-        latency, success, count = measure_query_by_tenant(table, tenant)
-        if i >= WARMUP_COUNT:
-            if success:
-                latencies.append(latency)
-            else:
-                errors += 1
+    latencies, errors = _collect(measurements)
 
     stats = compute_stats(latencies)
-    results["scenarios"]["query_tenant_gsi"] = {"stats": stats, "errors": errors}
+    result = {"stats": stats, "errors": errors}
+    if spec["kind"] == "batch_get":
+        result["batch_size"] = spec["batch_size"]
+        # UnprocessedKeys の再送が発生した呼び出し数（再送分は計測に含まない）
+        result["unprocessed_retried"] = sum(1 for m in measurements if m[3])
+
     logger.info(
-        f"  [OK] 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
+        f"  [OK] {spec['label']} 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
         f"P95: {stats['p95']:.1f}ms, P99: {stats['p99']:.1f}ms"
     )
+    return result
+
+
+async def _run_scenarios(
+    region: str, table_name: str, scenarios: dict, iterations: int, concurrency: int
+) -> tuple[dict, float]:
+    """
+    全シナリオを順に測定する
+
+    Returns:
+        (シナリオ名 → 結果, クライアント初期化時間 ms)
+    """
+    async with open_warm_client(
+        "dynamodb", region, concurrency, "list_tables", Limit=1
+    ) as (client, setup_ms):
+        results = {
+            name: await _measure_scenario(client, table_name, spec, iterations, concurrency)
+            for name, spec in scenarios.items()
+        }
+    return results, setup_ms
 
-    # --- シナリオ 3-5: BatchGetItem (バッチサイズ: 10, 50, 100) ---
-    batch_sizes = [10, 50, 100]
-    for batch_size in batch_sizes:
-        scenario_name = f"batch_get_{batch_size}"
-        logger.info(f"[START] BatchGetItem (サイズ: {batch_size}) ({total_iterations} 回)")
 
-        # バッチ用のメールアドレスを生成
-        batch_emails = generate_test_emails(batch_size)
+def run_scenario(
+    region: str, table_name: str, spec: dict, iterations: int, concurrency: int
+) -> dict:
+    """
+    1 シナリオを専用のクライアントで測定する（--parallel-scenarios のワーカー）
 
-        latencies = []
-        errors = 0
+    Session とクライアントはワーカープロセス内で生成し、初期化時間は
+    シナリオの結果に setup_ms として含める。
+    """
 
-        # DynamoDB BatchGetItem は最大 100 アイテムまで
-        effective_batch = batch_emails[:min(batch_size, 100)]
-
-        for i in range(total_iterations):
-            # BatchGetItem は boto3.resource 経由で呼ぶ
-            start = time.perf_counter()
-            try:
-                response = dynamodb_client.meta.client.batch_get_item(
-                    RequestItems={
-                        table_name: {
-                            "Keys": [{"email": {"S": e}} for e in effective_batch],
-                        }
-                    }
-                )
-                elapsed = (time.perf_counter() - start) * 1000
-                success = True
-            except Exception:
-                elapsed = (time.perf_counter() - start) * 1000
-                success = False
-
-            if i >= WARMUP_COUNT:
-                if success:
-                    latencies.append(elapsed)
-                else:
-                    errors += 1
-
-        stats = compute_stats(latencies)
-        results["scenarios"][scenario_name] = {
-            "stats": stats,
-            "errors": errors,
-            "batch_size": batch_size,
-        }
-        logger.info(
-            f"  [OK] 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
-            f"P95: {stats['p95']:.1f}ms, P99: {stats['p99']:.1f}ms"
-        )
+    async def run() -> dict:
+        async with open_warm_client(
+            "dynamodb", region, concurrency, "list_tables", Limit=1
+        ) as (client, setup_ms):
+            result = await _measure_scenario(client, table_name, spec, iterations, concurrency)
+        result["setup_ms"] = setup_ms
+        return result
 
-    return results
+    return asyncio.run(run())
 
 
 def main():
@@ -310,6 +384,31 @@ def main():
         default=None,
         help="結果の出力先ファイル（デフォルト: 標準出力）",
     )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="JSON をインデント付きで出力する（デフォルト: 1 行）",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"同時に発行するリクエスト数（デフォルト: {DEFAULT_CONCURRENCY}）",
+    )
+    parser.add_argument(
+        "--parallel-scenarios",
+        action="store_true",
+        help="シナリオごとに別プロセスで並行に実行する（シナリオ間で負荷が干渉する）",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["cprofile", "pyinstrument"],
+        default=None,
+        help=(
+            "計測後にプロファイル用の追加実行を行う"
+            f"（最大 {PROFILE_ITERATIONS} 回、統計には含めない）"
+        ),
+    )
     args = parser.parse_args()
 
     logger.info("=" * 60)
@@ -317,19 +416,32 @@ def main():
     logger.info("=" * 60)
     logger.info(f"  測定回数: {args.iterations}")
     logger.info(f"  ウォームアップ: {WARMUP_COUNT}")
+    logger.info(f"  並行数: {args.concurrency}")
+    logger.info(f"  シナリオ並行実行: {args.parallel_scenarios}")
     logger.info(f"  Dry-run: {args.dry_run}")
 
-    config = load_config()
-    results = benchmark_dynamodb_throughput(config, args.iterations, args.dry_run)
-
-    output_json = json.dumps(results, indent=2, ensure_ascii=False)
+    config = load_config(("region", "tableName"))
+    results = benchmark_dynamodb_throughput(
+        config, args.iterations, args.dry_run, args.concurrency, args.parallel_scenarios
+    )
 
+    write_results(results, args.output, args.pretty)
     if args.output:
-        with open(args.output, "w") as f:
-            f.write(output_json)
         logger.info(f"[OK] 結果を保存しました: {args.output}")
-    else:
-        print(output_json)
+
+    if args.profile:
+        # 統計に使った計測とは別に、プロファイラー下で短く再実行する
+        logger.info(f"[PROFILE] {args.profile} でプロファイル用の追加実行を開始します")
+        profile_run(
+            lambda: benchmark_dynamodb_throughput(
+                config,
+                min(args.iterations, PROFILE_ITERATIONS),
+                args.dry_run,
+                args.concurrency,
+            ),
+            args.profile,
+            args.output,
+        )
 
 
 if __name__ == "__main__":
@@ -14,102 +14,74 @@ Usage:
   python3 benchmark-interceptor-lambda.py
   python3 benchmark-interceptor-lambda.py --iterations 200
   python3 benchmark-interceptor-lambda.py --dry-run
+  python3 benchmark-interceptor-lambda.py --concurrency 32
+  python3 benchmark-interceptor-lambda.py --async --concurrency 500
 
 環境変数:
   AWS_DEFAULT_REGION: AWS リージョン（デフォルト: us-east-1）
 """
 
 import argparse
-import base64
+import asyncio
+import inspect
 import json
 import logging
 import os
-import statistics
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
-    import boto3
-    from botocore.exceptions import ClientError
+    from botocore.exceptions import ClientError, WaiterError
 except ImportError:
     print("[ERROR] boto3 が必要です。pip install boto3 を実行してください。")
     sys.exit(1)
 
+try:
+    import numpy as np
+except ImportError:
+    print("[ERROR] numpy が必要です。pip install numpy を実行してください。")
+    sys.exit(1)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from _bench_common import (
+    ASYNC_BACKEND,
+    CLOCK_ID,
+    DEFAULT_PERCENTILES,
+    build_lambda_client,
+    clock_ns,
+    compute_stats,
+    create_mock_jwt,
+    dry_run_stats,
+    load_config,
+    open_warm_client,
+    parse_percentiles,
+    run_with_warmup,
+    write_results,
+)
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
 )
 logger = logging.getLogger(__name__)
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-CONFIG_FILE = os.path.join(SCRIPT_DIR, "phase14-config.json")
 REGION = os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
 
 WARMUP_COUNT = 10
 
-# テスト用メモリサイズ（MB）
-MEMORY_SIZES = [128, 256, 512]
-
-
-def load_config() -> dict:
-    """phase14-config.json を読み込む"""
-    if not os.path.exists(CONFIG_FILE):
-        logger.error(f"設定ファイルが見つかりません: {CONFIG_FILE}")
-        logger.info("Hint: phase14-config.json.example をコピーして設定してください")
-        sys.exit(1)
-
-    with open(CONFIG_FILE) as f:
-        config = json.load(f)
-
-    required_fields = ["region", "interceptorFunctionName"]
-    missing = [f for f in required_fields if f not in config]
-    if missing:
-        logger.error(f"設定ファイルに必須フィールドがありません: {missing}")
-        sys.exit(1)
-
-    return config
+# ウォームスタート測定で同時に発行する Invoke 数のデフォルト
+DEFAULT_CONCURRENCY = 16
 
+# ベンチマークで発行したバージョンを削除する際の同時実行数
+VERSION_DELETE_WORKERS = 8
 
-def compute_stats(latencies: list[float]) -> dict[str, float]:
-    """レイテンシーリストから統計値を計算する"""
-    if not latencies:
-        return {"count": 0, "mean": 0, "median": 0, "p95": 0, "p99": 0, "min": 0, "max": 0}
-
-    sorted_latencies = sorted(latencies)
-    count = len(sorted_latencies)
-    p95_idx = int(count * 0.95)
-    p99_idx = int(count * 0.99)
-
-    return {
-        "count": count,
-        "mean": round(statistics.mean(sorted_latencies), 3),
-        "median": round(statistics.median(sorted_latencies), 3),
-        "p95": round(sorted_latencies[min(p95_idx, count - 1)], 3),
-        "p99": round(sorted_latencies[min(p99_idx, count - 1)], 3),
-        "min": round(min(sorted_latencies), 3),
-        "max": round(max(sorted_latencies), 3),
-        "stdev": round(statistics.stdev(sorted_latencies), 3) if count > 1 else 0,
-    }
-
-
-def create_mock_jwt(role="user", tenant_id="tenant-a", user_id="user-1"):
-    """テスト用の JWT トークンを生成する"""
-    header = base64.urlsafe_b64encode(
-        json.dumps({"alg": "none", "typ": "JWT"}).encode()
-    ).rstrip(b"=").decode()
-
-    payload = base64.urlsafe_b64encode(
-        json.dumps({
-            "sub": user_id,
-            "role": role,
-            "tenant_id": tenant_id,
-            "client_id": "test-client-id",
-            "token_use": "access",
-        }).encode()
-    ).rstrip(b"=").decode()
-
-    signature = base64.urlsafe_b64encode(b"test-signature").rstrip(b"=").decode()
-    return f"Bearer {header}.{payload}.{signature}"
+# テスト用メモリサイズ（MB）
+MEMORY_SIZES = [128, 256, 512]
 
 
 def create_request_interceptor_event(role="admin", tool_name="financial-data"):
@@ -157,46 +129,108 @@ def create_response_interceptor_event():
     }
 
 
+def encode_payload(event: dict) -> bytes:
+    """
+    テストイベントを Invoke の Payload（JSON バイト列）に変換する
+
+    シナリオごとに 1 回だけ呼び出し、計測区間ではエンコードしない。
+    orjson が利用可能であれば orjson でシリアライズする。
+    """
+    if orjson is not None:
+        return orjson.dumps(event)
+    return json.dumps(event, separators=(",", ":")).encode()
+
+
 def invoke_lambda(
-    lambda_client, function_name: str, payload: dict
-) -> tuple[float, bool, dict]:
-    """Lambda を Invoke してレイテンシーを測定する"""
-    start = time.perf_counter()
+    lambda_client, function_name: str, payload_bytes: bytes, parse_response: bool = False
+) -> tuple[int, bool, dict]:
+    """
+    Lambda を Invoke してレイテンシーを測定する
+
+    レスポンスボディは常に読み切る（接続をコネクションプールに戻すため）が、
+    JSON としてパースするのは parse_response=True のときだけにする。
+    """
+    start = clock_ns(CLOCK_ID)
     try:
         response = lambda_client.invoke(
             FunctionName=function_name,
             InvocationType="RequestResponse",
-            Payload=json.dumps(payload).encode(),
+            Payload=payload_bytes,
         )
-        elapsed = (time.perf_counter() - start) * 1000
+        elapsed = clock_ns(CLOCK_ID) - start
 
-        response_payload = json.loads(response["Payload"].read())
-        init_duration = response.get("LogResult", "")
+        body = response["Payload"].read()
+        result = {"status_code": response["StatusCode"]}
+        if parse_response:
+            result["response"] = json.loads(body)
 
-        return elapsed, True, {
-            "status_code": response["StatusCode"],
-            "response": response_payload,
-        }
+        return elapsed, True, result
     except ClientError as e:
-        elapsed = (time.perf_counter() - start) * 1000
+        elapsed = clock_ns(CLOCK_ID) - start
         return elapsed, False, {"error": str(e)}
 
 
-def force_cold_start(lambda_client, function_name: str):
-    """環境変数を更新してコールドスタートを強制する"""
+def force_cold_start(
+    lambda_client, function_name: str, base_variables: dict[str, str]
+) -> str | None:
+    """
+    新しいバージョンを発行してコールドスタートを強制する
+
+    発行直後のバージョンには実行環境がないため、最初の Invoke は必ずコールドスタートになる。
+    publish_version は前回から設定が変わっていないと既存のバージョンを返すので、
+    関数本来の環境変数（base_variables）に BENCHMARK_TIMESTAMP を加えて更新し、
+    更新の完了を waiter で待ってから発行する。
+
+    Returns:
+        発行したバージョン（失敗した場合は None）
+    """
     try:
         lambda_client.update_function_configuration(
             FunctionName=function_name,
             Environment={
-                "Variables": {
-                    "BENCHMARK_TIMESTAMP": str(time.time()),
-                }
+                "Variables": {**base_variables, "BENCHMARK_TIMESTAMP": str(time.time())},
             },
         )
-        # 設定変更が反映されるまで少し待機
-        time.sleep(3)
-    except ClientError as e:
+        lambda_client.get_waiter("function_updated_v2").wait(FunctionName=function_name)
+        return lambda_client.publish_version(
+            FunctionName=function_name,
+            Description="benchmark cold start",
+        )["Version"]
+    except (ClientError, WaiterError) as e:
         logger.warning(f"コールドスタート強制に失敗: {e}")
+        return None
+
+
+def restore_environment(lambda_client, function_name: str, variables: dict[str, str]):
+    """force_cold_start で書き換えた $LATEST の環境変数を元に戻す"""
+    logger.info("環境変数を元の値に復元中...")
+    try:
+        lambda_client.update_function_configuration(
+            FunctionName=function_name,
+            Environment={"Variables": variables},
+        )
+        lambda_client.get_waiter("function_updated_v2").wait(FunctionName=function_name)
+    except (ClientError, WaiterError) as e:
+        logger.warning(f"環境変数の復元に失敗: {e}")
+
+
+def delete_versions(lambda_client, function_name: str, versions: list[str]):
+    """
+    ベンチマークで発行したバージョンを並行に削除する
+
+    コントロールプレーン API のスロットリングを避けるため、同時実行数は抑える。
+    """
+    if not versions:
+        return
+
+    def delete_one(version: str):
+        try:
+            lambda_client.delete_function(FunctionName=function_name, Qualifier=version)
+        except ClientError as e:
+            logger.warning(f"バージョン {version} の削除に失敗: {e}")
+
+    with ThreadPoolExecutor(max_workers=min(len(versions), VERSION_DELETE_WORKERS)) as ex:
+        list(ex.map(delete_one, versions))
 
 
 def update_memory_size(lambda_client, function_name: str, memory_mb: int):
@@ -217,14 +251,199 @@ def update_memory_size(lambda_client, function_name: str, memory_mb: int):
         time.sleep(5)
 
 
+def memory_alias_name(memory_mb: int) -> str:
+    """メモリサイズ別シナリオ用のエイリアス名を返す"""
+    return f"bench-{memory_mb}mb"
+
+
+def publish_memory_aliases(
+    lambda_client, function_name: str, original_memory: int
+) -> tuple[dict[int, str], list[str]]:
+    """
+    メモリサイズごとにバージョンを発行し、bench-<N>mb エイリアスをそのバージョンに向ける
+
+    エイリアスを直接 Invoke すれば、計測中に関数の設定を変更せずに
+    メモリサイズ別のシナリオを同時に実行できる。
+    $LATEST のメモリサイズは発行後に original_memory に戻す。
+
+    Returns:
+        (メモリサイズ → バージョン, このベンチマークで新たに発行したバージョン)
+    """
+    existing_versions = set()
+    paginator = lambda_client.get_paginator("list_versions_by_function")
+    for page in paginator.paginate(FunctionName=function_name):
+        existing_versions.update(v["Version"] for v in page.get("Versions", []))
+
+    versions = {}
+    try:
+        for memory_mb in MEMORY_SIZES:
+            update_memory_size(lambda_client, function_name, memory_mb)
+            try:
+                version = lambda_client.publish_version(
+                    FunctionName=function_name,
+                    Description=f"benchmark {memory_mb}MB",
+                )["Version"]
+                alias = memory_alias_name(memory_mb)
+                try:
+                    lambda_client.create_alias(
+                        FunctionName=function_name, Name=alias, FunctionVersion=version
+                    )
+                except ClientError as e:
+                    if e.response["Error"]["Code"] != "ResourceConflictException":
+                        raise
+                    lambda_client.update_alias(
+                        FunctionName=function_name, Name=alias, FunctionVersion=version
+                    )
+            except ClientError as e:
+                logger.warning(f"{memory_mb}MB のバージョン発行に失敗: {e}")
+                continue
+            versions[memory_mb] = version
+    finally:
+        logger.info(f"メモリサイズを元の値 ({original_memory}MB) に復元中...")
+        update_memory_size(lambda_client, function_name, original_memory)
+
+    # 設定が同じ既存バージョンが返された場合は、後片付けで削除しない
+    published = sorted(set(versions.values()) - existing_versions)
+    return versions, published
+
+
+def delete_memory_aliases(
+    lambda_client, function_name: str, versions: dict[int, str], published: list[str]
+):
+    """publish_memory_aliases で作成したエイリアスと発行したバージョンを削除する"""
+    for memory_mb in versions:
+        try:
+            lambda_client.delete_alias(
+                FunctionName=function_name, Name=memory_alias_name(memory_mb)
+            )
+        except ClientError as e:
+            logger.warning(f"エイリアス {memory_alias_name(memory_mb)} の削除に失敗: {e}")
+
+    delete_versions(lambda_client, function_name, published)
+
+
+def run_warm_invocations(
+    lambda_client, function_name: str, payload_bytes: bytes, iterations: int, concurrency: int
+) -> tuple[np.ndarray, int]:
+    """
+    ウォームアップの後、iterations 回の Invoke をスレッドプールで並行に実行する
+
+    boto3 クライアントはスレッドセーフなので全スレッドで 1 つを共有する。
+    ウォームアップは計測フェーズの前に完了させ、統計に混ざらないようにする。
+
+    Returns:
+        (成功した呼び出しのレイテンシー ns の配列, エラー数)
+    """
+
+    def _one_invoke(payload_bytes: bytes) -> tuple[int, bool]:
+        latency, success, _ = invoke_lambda(lambda_client, function_name, payload_bytes)
+        return latency, success
+
+    # 成功した呼び出しのレイテンシーを先頭から詰めて格納する
+    latencies = np.empty(iterations, dtype=np.int64)
+    idx = 0
+    errors = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(_one_invoke, [payload_bytes] * WARMUP_COUNT))
+
+        futures = [ex.submit(_one_invoke, payload_bytes) for _ in range(iterations)]
+        for future in as_completed(futures):
+            latency, success = future.result()
+            if success:
+                latencies[idx] = latency
+                idx += 1
+            else:
+                errors += 1
+
+    return latencies[:idx], errors
+
+
+async def read_body(body) -> bytes:
+    """レスポンスボディを読み切る（aioboto3 の StreamingBody は read() が awaitable）"""
+    data = body.read()
+    return await data if inspect.isawaitable(data) else data
+
+
+async def measure_warm_async(
+    client, function_name: str, payload_bytes: bytes, iterations: int, concurrency: int
+) -> tuple[np.ndarray, int]:
+    """
+    ウォームアップの後、iterations 回の Invoke を非同期クライアントで並行に実行する
+
+    asyncio.Semaphore で同時実行数を concurrency に抑え、1 スレッドで発行する。
+
+    Returns:
+        (成功した呼び出しのレイテンシー ns の配列, エラー数)
+    """
+
+    async def call(_i: int) -> tuple[int, bool]:
+        start = clock_ns(CLOCK_ID)
+        try:
+            response = await client.invoke(
+                FunctionName=function_name,
+                InvocationType="RequestResponse",
+                Payload=payload_bytes,
+            )
+        except ClientError:
+            return clock_ns(CLOCK_ID) - start, False
+        elapsed = clock_ns(CLOCK_ID) - start
+        await read_body(response["Payload"])
+        return elapsed, True
+
+    measurements = await run_with_warmup(call, WARMUP_COUNT, iterations, concurrency)
+
+    latencies = np.empty(iterations, dtype=np.int64)
+    idx = 0
+    errors = 0
+    for latency, success in measurements:
+        if success:
+            latencies[idx] = latency
+            idx += 1
+        else:
+            errors += 1
+
+    return latencies[:idx], errors
+
+
+async def run_warm_invocations_async(
+    region: str, targets: list[str], payload_bytes: bytes, iterations: int, concurrency: int
+) -> list[tuple[np.ndarray, int]]:
+    """
+    targets（関数名または修飾名）のウォームスタート測定を 1 つの非同期クライアントで同時に実行する
+
+    Returns:
+        targets と同じ順の (レイテンシー ns の配列, エラー数) のリスト
+    """
+    async with open_warm_client(
+        "lambda",
+        region,
+        concurrency * len(targets),
+        "get_function_configuration",
+        FunctionName=targets[0],
+    ) as (client, _setup_ms):
+        return await asyncio.gather(
+            *(
+                measure_warm_async(client, target, payload_bytes, iterations, concurrency)
+                for target in targets
+            )
+        )
+
+
 def benchmark_interceptor_lambda(
-    config: dict, iterations: int, dry_run: bool = False
+    config: dict,
+    iterations: int,
+    dry_run: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    percentiles: tuple[float, ...] = DEFAULT_PERCENTILES,
+    use_async: bool = False,
 ) -> dict:
     """Interceptor Lambda のベンチマークを実行する"""
     results = {
         "benchmark": "interceptor-lambda",
         "iterations": iterations,
         "warmup_count": WARMUP_COUNT,
+        "percentiles": list(percentiles),
+        "concurrency": concurrency,
         "region": config.get("region", REGION),
         "function_name": config["interceptorFunctionName"],
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
@@ -244,42 +463,61 @@ def benchmark_interceptor_lambda(
         for scenario in scenarios:
             base = 50.0 if "cold" in scenario else 5.0
             results["scenarios"][scenario] = {
-                "stats": compute_stats([base + i * 0.1 for i in range(iterations)]),
+                "stats": dry_run_stats(iterations, base, 0.1, percentiles),
                 "errors": 0,
                 "dry_run": True,
             }
         return results
 
     region = config.get("region", REGION)
-    lambda_client = boto3.client("lambda", region_name=region)
+    # 全シナリオで 1 つのクライアント（= 1 つのコネクションプール）を共有し、
+    # TLS ハンドシェイクはウォームアップ中に済ませる。
+    # メモリサイズ別シナリオは同時に実行するため、その分のコネクションを確保する
+    lambda_client = build_lambda_client(region, concurrency * len(MEMORY_SIZES))
     function_name = config["interceptorFunctionName"]
 
     total_iterations = WARMUP_COUNT + iterations
 
-    # 元のメモリサイズを記録（後でリストアする）
+    if use_async:
+        results["async_backend"] = ASYNC_BACKEND
+
+    def run_warm(targets: list[str], payload_bytes: bytes) -> list[tuple[np.ndarray, int]]:
+        """targets（関数名または修飾名）のウォームスタート測定を同時に実行する"""
+        if use_async:
+            return asyncio.run(
+                run_warm_invocations_async(region, targets, payload_bytes, iterations, concurrency)
+            )
+        with ThreadPoolExecutor(max_workers=len(targets)) as ex:
+            return list(
+                ex.map(
+                    lambda target: run_warm_invocations(
+                        lambda_client, target, payload_bytes, iterations, concurrency
+                    ),
+                    targets,
+                )
+            )
+
+    # 元のメモリサイズと環境変数を記録（後でリストアする）
     try:
         func_config = lambda_client.get_function_configuration(
             FunctionName=function_name
         )
         original_memory = func_config.get("MemorySize", 256)
+        original_variables = func_config.get("Environment", {}).get("Variables", {})
     except ClientError:
         original_memory = 256
+        # 元の環境変数が分からない場合は、上書きしてしまわないようコールドスタート測定を行わない
+        original_variables = None
 
     # --- シナリオ 1: Request Interceptor (ウォームスタート) ---
-    logger.info(f"[START] Request Interceptor ウォームスタート ({total_iterations} 回)")
-    latencies = []
-    errors = 0
-
-    for i in range(total_iterations):
-        event = create_request_interceptor_event(role="admin")
-        latency, success, resp = invoke_lambda(lambda_client, function_name, event)
-        if i >= WARMUP_COUNT:
-            if success:
-                latencies.append(latency)
-            else:
-                errors += 1
+    logger.info(
+        f"[START] Request Interceptor ウォームスタート ({total_iterations} 回, 並行数: {concurrency})"
+    )
+    [(latencies, errors)] = run_warm(
+        [function_name], encode_payload(create_request_interceptor_event(role="admin"))
+    )
 
-    stats = compute_stats(latencies)
+    stats = compute_stats(latencies, percentiles)
     results["scenarios"]["request_interceptor_warm"] = {"stats": stats, "errors": errors}
     logger.info(
         f"  [OK] 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
@@ -289,47 +527,61 @@ def benchmark_interceptor_lambda(
     # --- シナリオ 2: Request Interceptor (コールドスタート) ---
     cold_start_iterations = min(iterations, 20)  # コールドスタートは回数を抑える
     logger.info(f"[START] Request Interceptor コールドスタート ({cold_start_iterations} 回)")
-    latencies = []
+    latencies = np.empty(cold_start_iterations, dtype=np.int64)
+    idx = 0
     errors = 0
+    payload_bytes = encode_payload(create_request_interceptor_event(role="admin"))
 
-    for i in range(cold_start_iterations):
-        # コールドスタートを強制
-        force_cold_start(lambda_client, function_name)
+    cold_versions = []
+    if original_variables is None:
+        logger.warning("関数の設定を取得できないため、コールドスタート測定をスキップします")
+        cold_start_iterations = 0
 
-        event = create_request_interceptor_event(role="admin")
-        latency, success, resp = invoke_lambda(lambda_client, function_name, event)
-        if success:
-            latencies.append(latency)
-        else:
-            errors += 1
+    # 途中で例外（タイムアウトや Ctrl-C など）が起きても、発行済みのバージョンは必ず削除し、
+    # $LATEST の環境変数を元に戻す（後続のメモリサイズ別バージョンも本来の設定から発行する）
+    try:
+        for _ in range(cold_start_iterations):
+            # 新しいバージョンを発行してコールドスタートを強制
+            version = force_cold_start(lambda_client, function_name, original_variables)
+            if version is None:
+                errors += 1
+                continue
+            cold_versions.append(version)
+
+            latency, success, _ = invoke_lambda(
+                lambda_client, f"{function_name}:{version}", payload_bytes
+            )
+            if success:
+                latencies[idx] = latency
+                idx += 1
+            else:
+                errors += 1
+    finally:
+        delete_versions(lambda_client, function_name, cold_versions)
+        if cold_start_iterations:
+            restore_environment(lambda_client, function_name, original_variables)
 
-    stats = compute_stats(latencies)
+    stats = compute_stats(latencies[:idx], percentiles)
     results["scenarios"]["request_interceptor_cold"] = {
         "stats": stats,
         "errors": errors,
-        "note": "Each invocation forced a cold start via config update",
+        "note": "Each invocation targeted a freshly published version",
     }
-    if latencies:
+    if idx:
         logger.info(
             f"  [OK] 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
             f"P95: {stats['p95']:.1f}ms, P99: {stats['p99']:.1f}ms"
         )
 
     # --- シナリオ 3: Response Interceptor (ウォームスタート) ---
-    logger.info(f"[START] Response Interceptor ウォームスタート ({total_iterations} 回)")
-    latencies = []
-    errors = 0
-
-    for i in range(total_iterations):
-        event = create_response_interceptor_event()
-        latency, success, resp = invoke_lambda(lambda_client, function_name, event)
-        if i >= WARMUP_COUNT:
-            if success:
-                latencies.append(latency)
-            else:
-                errors += 1
+    logger.info(
+        f"[START] Response Interceptor ウォームスタート ({total_iterations} 回, 並行数: {concurrency})"
+    )
+    [(latencies, errors)] = run_warm(
+        [function_name], encode_payload(create_response_interceptor_event())
+    )
 
-    stats = compute_stats(latencies)
+    stats = compute_stats(latencies, percentiles)
     results["scenarios"]["response_interceptor_warm"] = {"stats": stats, "errors": errors}
     logger.info(
         f"  [OK] 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
@@ -337,39 +589,38 @@ def benchmark_interceptor_lambda(
     )
 
     # --- シナリオ 4-6: メモリサイズ別 ---
-    for memory_mb in MEMORY_SIZES:
-        scenario_name = f"memory_{memory_mb}mb"
-        logger.info(f"[START] メモリサイズ {memory_mb}MB ({total_iterations} 回)")
-
-        update_memory_size(lambda_client, function_name, memory_mb)
-
-        latencies = []
-        errors = 0
-
-        for i in range(total_iterations):
-            event = create_request_interceptor_event(role="admin")
-            latency, success, resp = invoke_lambda(lambda_client, function_name, event)
-            if i >= WARMUP_COUNT:
-                if success:
-                    latencies.append(latency)
-                else:
-                    errors += 1
-
-        stats = compute_stats(latencies)
-        results["scenarios"][scenario_name] = {
+    # 発行したバージョンのエイリアスを Invoke し、全メモリサイズを同時に測定する
+    logger.info("メモリサイズ別のバージョンとエイリアスを作成中...")
+    versions, published = publish_memory_aliases(lambda_client, function_name, original_memory)
+    payload_bytes = encode_payload(create_request_interceptor_event(role="admin"))
+
+    for memory_mb in versions:
+        logger.info(
+            f"[START] メモリサイズ {memory_mb}MB ({total_iterations} 回, 並行数: {concurrency})"
+        )
+
+    try:
+        if versions:
+            targets = [f"{function_name}:{memory_alias_name(mb)}" for mb in versions]
+            outcomes = dict(zip(versions, run_warm(targets, payload_bytes)))
+        else:
+            outcomes = {}
+    finally:
+        delete_memory_aliases(lambda_client, function_name, versions, published)
+
+    for memory_mb, (latencies, errors) in outcomes.items():
+        stats = compute_stats(latencies, percentiles)
+        results["scenarios"][f"memory_{memory_mb}mb"] = {
             "stats": stats,
             "errors": errors,
             "memory_mb": memory_mb,
+            "alias": memory_alias_name(memory_mb),
         }
         logger.info(
-            f"  [OK] 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
+            f"  [OK] {memory_mb}MB 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
             f"P95: {stats['p95']:.1f}ms, P99: {stats['p99']:.1f}ms"
         )
 
-    # メモリサイズを元に戻す
-    logger.info(f"メモリサイズを元の値 ({original_memory}MB) に復元中...")
-    update_memory_size(lambda_client, function_name, original_memory)
-
     return results
 
 
@@ -394,6 +645,32 @@ def main():
         default=None,
         help="結果の出力先ファイル（デフォルト: 標準出力）",
     )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="JSON をインデント付きで出力する（デフォルト: 1 行）",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"ウォームスタート測定で同時に発行する Invoke 数（デフォルト: {DEFAULT_CONCURRENCY}）",
+    )
+    parser.add_argument(
+        "--percentiles",
+        type=parse_percentiles,
+        default=DEFAULT_PERCENTILES,
+        help="出力するパーセンタイルのカンマ区切り（例: 50,95,99,99.9。中央値・P95・P99 は常に出力）",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help=(
+            "ウォームスタート測定を asyncio で発行する（aioboto3 があれば 1 スレッドで、"
+            "なければ boto3 + asyncio.to_thread。高い --concurrency 向け）"
+        ),
+    )
     args = parser.parse_args()
 
     logger.info("=" * 60)
@@ -401,19 +678,23 @@ def main():
     logger.info("=" * 60)
     logger.info(f"  測定回数: {args.iterations}")
     logger.info(f"  ウォームアップ: {WARMUP_COUNT}")
+    logger.info(f"  並行数: {args.concurrency}")
+    logger.info(f"  非同期発行: {args.use_async}")
     logger.info(f"  Dry-run: {args.dry_run}")
 
-    config = load_config()
-    results = benchmark_interceptor_lambda(config, args.iterations, args.dry_run)
-
-    output_json = json.dumps(results, indent=2, ensure_ascii=False)
+    config = load_config(("region", "interceptorFunctionName"))
+    results = benchmark_interceptor_lambda(
+        config,
+        args.iterations,
+        args.dry_run,
+        args.concurrency,
+        args.percentiles,
+        args.use_async,
+    )
 
+    write_results(results, args.output, args.pretty)
     if args.output:
-        with open(args.output, "w") as f:
-            f.write(output_json)
         logger.info(f"[OK] 結果を保存しました: {args.output}")
-    else:
-        print(output_json)
 
 
 if __name__ == "__main__":
@@ -3,7 +3,7 @@
 Memory API レイテンシーベンチマーク
 
 Memory API の CRUD 操作のレイテンシーを測定する。
-PutMemoryRecord, RetrieveMemoryRecords, DeleteMemoryRecord の
+BatchCreateMemoryRecords（1 件ずつ）, RetrieveMemoryRecords, DeleteMemoryRecord の
 各操作のパフォーマンスとバッチサイズの影響を計測する。
 
 前提条件:
@@ -21,13 +21,13 @@ Usage:
 """
 
 import argparse
-import json
 import logging
 import os
-import statistics
 import sys
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 try:
     import boto3
@@ -36,133 +36,205 @@ except ImportError:
     print("[ERROR] boto3 が必要です。pip install boto3 を実行してください。")
     sys.exit(1)
 
+try:
+    import numpy as np
+except ImportError:
+    print("[ERROR] numpy が必要です。pip install numpy を実行してください。")
+    sys.exit(1)
+
+from _bench_common import (
+    CLOCK_ID,
+    DEFAULT_PERCENTILES,
+    clock_ns,
+    compute_stats,
+    dry_run_stats,
+    load_config,
+    make_boto_config,
+    parse_percentiles,
+    write_results,
+)
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
 )
 logger = logging.getLogger(__name__)
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-CONFIG_FILE = os.path.join(SCRIPT_DIR, "phase14-config.json")
 REGION = os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
 
 WARMUP_COUNT = 10
 
+# Put したレコードが検索可能になるまでのポーリング間隔と上限（秒）
+INDEX_POLL_INTERVAL = 0.2
+INDEX_POLL_TIMEOUT = 10.0
+
+# クライアントのコネクションプールの大きさを決める並行数
+CLIENT_CONCURRENCY = 32
+
+# クリーンアップの DeleteMemoryRecord を同時に発行する数
+DELETE_CONCURRENCY = 32
+
+# BatchDeleteMemoryRecords の 1 回あたりの最大件数（計測対象外の残りのレコードの削除に使う）
+BATCH_DELETE_LIMIT = 100
 
-def load_config() -> dict:
-    """phase14-config.json を読み込む"""
-    if not os.path.exists(CONFIG_FILE):
-        logger.error(f"設定ファイルが見つかりません: {CONFIG_FILE}")
-        logger.info("Hint: phase14-config.json.example をコピーして設定してください")
-        sys.exit(1)
-
-    with open(CONFIG_FILE) as f:
-        config = json.load(f)
-
-    required_fields = ["region", "memoryId"]
-    missing = [f for f in required_fields if f not in config]
-    if missing:
-        logger.error(f"設定ファイルに必須フィールドがありません: {missing}")
-        sys.exit(1)
-
-    return config
-
-
-def compute_stats(latencies: list[float]) -> dict[str, float]:
-    """レイテンシーリストから統計値を計算する"""
-    if not latencies:
-        return {"count": 0, "mean": 0, "median": 0, "p95": 0, "p99": 0, "min": 0, "max": 0}
-
-    sorted_latencies = sorted(latencies)
-    count = len(sorted_latencies)
-    p95_idx = int(count * 0.95)
-    p99_idx = int(count * 0.99)
-
-    return {
-        "count": count,
-        "mean": round(statistics.mean(sorted_latencies), 3),
-        "median": round(statistics.median(sorted_latencies), 3),
-        "p95": round(sorted_latencies[min(p95_idx, count - 1)], 3),
-        "p99": round(sorted_latencies[min(p99_idx, count - 1)], 3),
-        "min": round(min(sorted_latencies), 3),
-        "max": round(max(sorted_latencies), 3),
-        "stdev": round(statistics.stdev(sorted_latencies), 3) if count > 1 else 0,
-    }
 
+def create_memory_client(config: dict, concurrency: int = CLIENT_CONCURRENCY):
+    """
+    Memory API クライアントを作成する
 
-def create_memory_client(config: dict):
-    """Memory API クライアントを作成する"""
+    全シナリオで同じクライアントを使い回し、keep-alive したコネクションを再利用する。
+    """
     return boto3.client(
-        "bedrock-agentcore-memory",
+        "bedrock-agentcore",
         region_name=config.get("region", REGION),
+        config=make_boto_config(concurrency),
     )
 
 
-def measure_put_memory_record(
-    client, memory_id: str, namespace: str, content: str, actor_id: str
-) -> tuple[float, bool]:
-    """PutMemoryRecord のレイテンシーを測定する"""
-    start = time.perf_counter()
+def put_request_template(memory_id: str, namespace: str, strategy_id: str | None) -> dict:
+    """
+    1 件分の BatchCreateMemoryRecords のリクエストテンプレートを作成する
+
+    逐次実行のループではテンプレートを 1 つだけ作り、呼び出しごとに
+    set_put_content() でレコードの内容と requestIdentifier だけを書き換えて使い回す。
+    """
+    record = {
+        "requestIdentifier": None,
+        "namespaces": [namespace],
+        "content": {"text": None},
+        "timestamp": None,
+    }
+    if strategy_id:
+        record["memoryStrategyId"] = strategy_id
+    return {"memoryId": memory_id, "records": [record]}
+
+
+def set_put_content(request: dict, text: str) -> None:
+    """テンプレートのレコードに内容・一意な requestIdentifier・現在時刻を設定する"""
+    record = request["records"][0]
+    record["requestIdentifier"] = uuid.uuid4().hex
+    record["content"]["text"] = text
+    record["timestamp"] = datetime.now(timezone.utc)
+
+
+def search_criteria(query: str, strategy_id: str | None) -> dict:
+    """RetrieveMemoryRecords の searchCriteria を作成する"""
+    criteria = {"searchQuery": query}
+    if strategy_id:
+        criteria["memoryStrategyId"] = strategy_id
+    return criteria
+
+
+def measure_put_memory_record(client, request: dict) -> tuple[int, bool, str | None]:
+    """
+    1 件分の BatchCreateMemoryRecords のレイテンシーを測定する
+
+    Returns:
+        (レイテンシー ns, 成功したかどうか, 作成されたレコードの ID)
+    """
+    start = clock_ns(CLOCK_ID)
     try:
-        client.put_memory_record(
-            memoryId=memory_id,
-            namespace=namespace,
-            actorId=actor_id,
-            content={
-                "text": content,
-            },
-        )
-        elapsed = (time.perf_counter() - start) * 1000
-        return elapsed, True
+        response = client.batch_create_memory_records(**request)
     except ClientError:
-        elapsed = (time.perf_counter() - start) * 1000
-        return elapsed, False
+        return clock_ns(CLOCK_ID) - start, False, None
+    elapsed = clock_ns(CLOCK_ID) - start
+    created = response.get("successfulRecords", [])
+    if response.get("failedRecords") or not created:
+        return elapsed, False, None
+    return elapsed, True, created[0].get("memoryRecordId")
 
 
 def measure_retrieve_memory_records(
-    client, memory_id: str, namespace: str, query: str
-) -> tuple[float, bool, int]:
+    client, memory_id: str, namespace: str, query: str, strategy_id: str | None = None
+) -> tuple[int, bool, int]:
     """RetrieveMemoryRecords のレイテンシーを測定する"""
-    start = time.perf_counter()
+    start = clock_ns(CLOCK_ID)
     try:
         response = client.retrieve_memory_records(
             memoryId=memory_id,
             namespace=namespace,
-            query=query,
+            searchCriteria=search_criteria(query, strategy_id),
         )
-        elapsed = (time.perf_counter() - start) * 1000
-        records = response.get("memoryRecords", [])
+        elapsed = clock_ns(CLOCK_ID) - start
+        records = response.get("memoryRecordSummaries", [])
         return elapsed, True, len(records)
     except ClientError:
-        elapsed = (time.perf_counter() - start) * 1000
+        elapsed = clock_ns(CLOCK_ID) - start
         return elapsed, False, 0
 
 
+def wait_for_indexing(
+    client, memory_id: str, namespace: str, query: str, strategy_id: str | None = None
+) -> tuple[float, bool]:
+    """
+    query で検索結果が返るまで RetrieveMemoryRecords をポーリングする
+
+    固定時間の待機の代わりに INDEX_POLL_INTERVAL ごとに問い合わせ、
+    INDEX_POLL_TIMEOUT を超えたら諦める。
+
+    Returns:
+        (待機した時間 ms, 検索結果が返ったかどうか)
+    """
+    start = time.perf_counter()
+    deadline = start + INDEX_POLL_TIMEOUT
+    while True:
+        _, success, count = measure_retrieve_memory_records(
+            client, memory_id, namespace, query, strategy_id
+        )
+        if success and count:
+            return (time.perf_counter() - start) * 1000, True
+        if time.perf_counter() >= deadline:
+            return (time.perf_counter() - start) * 1000, False
+        time.sleep(INDEX_POLL_INTERVAL)
+
+
 def measure_delete_memory_record(
     client, memory_id: str, record_id: str
-) -> tuple[float, bool]:
+) -> tuple[int, bool]:
     """DeleteMemoryRecord のレイテンシーを測定する"""
-    start = time.perf_counter()
+    start = clock_ns(CLOCK_ID)
     try:
         client.delete_memory_record(
             memoryId=memory_id,
             memoryRecordId=record_id,
         )
-        elapsed = (time.perf_counter() - start) * 1000
+        elapsed = clock_ns(CLOCK_ID) - start
         return elapsed, True
     except ClientError:
-        elapsed = (time.perf_counter() - start) * 1000
+        elapsed = clock_ns(CLOCK_ID) - start
         return elapsed, False
 
 
+def measure_concurrent_batch(executor, call, batch_args: list) -> tuple[int, bool]:
+    """
+    バッチ内の呼び出しをスレッドプールで同時に発行し、全件完了までのレイテンシーを測定する
+
+    Args:
+        executor: 呼び出しを発行する ThreadPoolExecutor
+        call: 引数 1 つを受け取り成否を返す関数
+        batch_args: バッチ内の各呼び出しの引数
+
+    Returns:
+        (レイテンシー ns, 全件成功したかどうか)
+    """
+    start = clock_ns(CLOCK_ID)
+    succeeded = list(executor.map(call, batch_args))
+    elapsed = clock_ns(CLOCK_ID) - start
+    return elapsed, all(succeeded)
+
+
 def benchmark_memory_api(
-    config: dict, iterations: int, dry_run: bool = False
+    config: dict,
+    iterations: int,
+    dry_run: bool = False,
+    percentiles: tuple[float, ...] = DEFAULT_PERCENTILES,
 ) -> dict:
     """Memory API のレイテンシーベンチマークを実行する"""
     results = {
         "benchmark": "memory-api",
         "iterations": iterations,
         "warmup_count": WARMUP_COUNT,
+        "percentiles": list(percentiles),
         "region": config.get("region", REGION),
         "memory_id": config["memoryId"],
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
@@ -181,52 +253,76 @@ def benchmark_memory_api(
             "put_batch_50",
             "retrieve_batch_10",
             "retrieve_batch_50",
+            "put_batch_concurrent_10",
+            "put_batch_concurrent_50",
+            "retrieve_batch_concurrent_10",
+            "retrieve_batch_concurrent_50",
         ]:
             results["scenarios"][scenario] = {
-                "stats": compute_stats([5.0 + i * 0.1 for i in range(iterations)]),
+                "stats": dry_run_stats(iterations, 5.0, 0.1, percentiles),
                 "errors": 0,
                 "dry_run": True,
             }
         return results
 
-    client = create_memory_client(config)
+    # 同時実行バッチで最大バッチサイズ分のリクエストが同時に発行される
+    client = create_memory_client(config, max(batch_sizes))
     memory_id = config["memoryId"]
+    # memoryStrategyId は任意（設定されていればレコード作成と検索の両方に指定する）
+    strategy_id = config.get("memoryStrategyId")
     namespace = f"benchmark-{uuid.uuid4().hex[:8]}"
-    actor_id = "benchmark-user"
+    # 作成に成功したレコードの ID（クリーンアップで削除する。同時実行バッチからも追記する）
+    created_ids = []
 
     total_iterations = WARMUP_COUNT + iterations
 
-    # --- シナリオ 1: PutMemoryRecord (単一) ---
-    logger.info(f"[START] PutMemoryRecord (単一) ({total_iterations} 回)")
-    latencies = []
+    # --- シナリオ 1: BatchCreateMemoryRecords (1 件) ---
+    logger.info(f"[START] BatchCreateMemoryRecords (1 件) ({total_iterations} 回)")
+    # 成功した呼び出しのレイテンシーを先頭から詰めて格納する
+    latencies = np.empty(iterations, dtype=np.int64)
+    idx = 0
     errors = 0
-    created_records = []
+    # インデックス待ちのポーリングに使う、Put に成功したレコードの内容
+    probe_content = None
+    put_request = put_request_template(memory_id, namespace, strategy_id)
 
     for i in range(total_iterations):
         content = f"Benchmark test record {i} - {uuid.uuid4().hex[:8]}"
-        latency, success = measure_put_memory_record(
-            client, memory_id, namespace, content, actor_id
-        )
+        set_put_content(put_request, content)
+        latency, success, record_id = measure_put_memory_record(client, put_request)
+        if success:
+            probe_content = content
+            created_ids.append(record_id)
         if i >= WARMUP_COUNT:
             if success:
-                latencies.append(latency)
+                latencies[idx] = latency
+                idx += 1
             else:
                 errors += 1
 
-    stats = compute_stats(latencies)
+    stats = compute_stats(latencies[:idx], percentiles)
     results["scenarios"]["put_single"] = {"stats": stats, "errors": errors}
     logger.info(
         f"  [OK] 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
         f"P95: {stats['p95']:.1f}ms, P99: {stats['p99']:.1f}ms"
     )
 
-    # 少し待ってから Retrieve を測定（レコードがインデックスされるのを待つ）
-    logger.info("  インデックス更新を待機中（5 秒）...")
-    time.sleep(5)
+    # Put したレコードが検索できるようになってから Retrieve を測定する
+    if probe_content is not None:
+        logger.info(f"  インデックス更新を待機中（最大 {INDEX_POLL_TIMEOUT:.0f} 秒）...")
+        wait_ms, indexed = wait_for_indexing(
+            client, memory_id, namespace, probe_content, strategy_id
+        )
+        results["index_wait_ms"] = round(wait_ms, 3)
+        if indexed:
+            logger.info(f"  [OK] インデックス更新を確認しました（{wait_ms / 1000:.1f} 秒）")
+        else:
+            logger.warning("  インデックス更新を確認できないまま Retrieve の測定を開始します")
 
     # --- シナリオ 2: RetrieveMemoryRecords (単一クエリ) ---
     logger.info(f"[START] RetrieveMemoryRecords (単一クエリ) ({total_iterations} 回)")
-    latencies = []
+    latencies = np.empty(iterations, dtype=np.int64)
+    idx = 0
     errors = 0
     queries = [
         "benchmark test record",
@@ -237,53 +333,53 @@ def benchmark_memory_api(
     for i in range(total_iterations):
         query = queries[i % len(queries)]
         latency, success, count = measure_retrieve_memory_records(
-            client, memory_id, namespace, query
+            client, memory_id, namespace, query, strategy_id
         )
         if i >= WARMUP_COUNT:
             if success:
-                latencies.append(latency)
+                latencies[idx] = latency
+                idx += 1
             else:
                 errors += 1
 
-    stats = compute_stats(latencies)
+    stats = compute_stats(latencies[:idx], percentiles)
     results["scenarios"]["retrieve_single"] = {"stats": stats, "errors": errors}
     logger.info(
         f"  [OK] 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
         f"P95: {stats['p95']:.1f}ms, P99: {stats['p99']:.1f}ms"
     )
 
-    # --- シナリオ 3: バッチ PutMemoryRecord ---
+    # --- シナリオ 3: バッチ BatchCreateMemoryRecords（1 件ずつ連続実行） ---
     for batch_size in batch_sizes[1:]:  # 10, 50
         scenario_name = f"put_batch_{batch_size}"
-        logger.info(f"[START] PutMemoryRecord (バッチ {batch_size} レコード) ({total_iterations} 回)")
-        latencies = []
+        logger.info(
+            f"[START] BatchCreateMemoryRecords (バッチ {batch_size} レコード) ({total_iterations} 回)"
+        )
+        latencies = np.empty(iterations, dtype=np.int64)
+        idx = 0
         errors = 0
 
         for i in range(total_iterations):
             # バッチ内の各 Put を連続実行してトータル時間を測定
-            start = time.perf_counter()
+            start = clock_ns(CLOCK_ID)
             batch_success = True
             for j in range(batch_size):
-                content = f"Batch {i} record {j} - {uuid.uuid4().hex[:8]}"
-                try:
-                    client.put_memory_record(
-                        memoryId=memory_id,
-                        namespace=namespace,
-                        actorId=actor_id,
-                        content={"text": content},
-                    )
-                except ClientError:
+                set_put_content(put_request, f"Batch {i} record {j} - {uuid.uuid4().hex[:8]}")
+                _, success, record_id = measure_put_memory_record(client, put_request)
+                if not success:
                     batch_success = False
                     break
-            elapsed = (time.perf_counter() - start) * 1000
+                created_ids.append(record_id)
+            elapsed = clock_ns(CLOCK_ID) - start
 
             if i >= WARMUP_COUNT:
                 if batch_success:
-                    latencies.append(elapsed)
+                    latencies[idx] = elapsed
+                    idx += 1
                 else:
                     errors += 1
 
-        stats = compute_stats(latencies)
+        stats = compute_stats(latencies[:idx], percentiles)
         results["scenarios"][scenario_name] = {
             "stats": stats,
             "errors": errors,
@@ -298,11 +394,12 @@ def benchmark_memory_api(
     for batch_size in batch_sizes[1:]:  # 10, 50
         scenario_name = f"retrieve_batch_{batch_size}"
         logger.info(f"[START] RetrieveMemoryRecords (バッチ {batch_size} クエリ) ({total_iterations} 回)")
-        latencies = []
+        latencies = np.empty(iterations, dtype=np.int64)
+        idx = 0
         errors = 0
 
         for i in range(total_iterations):
-            start = time.perf_counter()
+            start = clock_ns(CLOCK_ID)
             batch_success = True
             for j in range(batch_size):
                 query = f"batch {i} record {j}"
@@ -310,20 +407,21 @@ def benchmark_memory_api(
                     client.retrieve_memory_records(
                         memoryId=memory_id,
                         namespace=namespace,
-                        query=query,
+                        searchCriteria=search_criteria(query, strategy_id),
                     )
                 except ClientError:
                     batch_success = False
                     break
-            elapsed = (time.perf_counter() - start) * 1000
+            elapsed = clock_ns(CLOCK_ID) - start
 
             if i >= WARMUP_COUNT:
                 if batch_success:
-                    latencies.append(elapsed)
+                    latencies[idx] = elapsed
+                    idx += 1
                 else:
                     errors += 1
 
-        stats = compute_stats(latencies)
+        stats = compute_stats(latencies[:idx], percentiles)
         results["scenarios"][scenario_name] = {
             "stats": stats,
             "errors": errors,
@@ -334,36 +432,114 @@ def benchmark_memory_api(
             f"P95: {stats['p95']:.1f}ms, P99: {stats['p99']:.1f}ms"
         )
 
+    # --- シナリオ 5: 同時実行バッチ BatchCreateMemoryRecords / RetrieveMemoryRecords ---
+    def put_one(content: str) -> bool:
+        # 同時に発行するため、テンプレートは共有せずリクエストごとに作成する
+        request = put_request_template(memory_id, namespace, strategy_id)
+        set_put_content(request, content)
+        _, success, record_id = measure_put_memory_record(client, request)
+        if success:
+            created_ids.append(record_id)  # list.append はスレッド間で安全
+        return success
+
+    def retrieve_one(query: str) -> bool:
+        return measure_retrieve_memory_records(
+            client, memory_id, namespace, query, strategy_id
+        )[1]
+
+    # (シナリオ名の接頭辞, 1 件分の呼び出し, API 名, 単位, i 回目の j 件目の引数)
+    concurrent_batches = [
+        (
+            "put",
+            put_one,
+            "BatchCreateMemoryRecords",
+            "レコード",
+            lambda i, j: f"Concurrent batch {i} record {j} - {uuid.uuid4().hex[:8]}",
+        ),
+        (
+            "retrieve",
+            retrieve_one,
+            "RetrieveMemoryRecords",
+            "クエリ",
+            lambda i, j: f"batch {i} record {j}",
+        ),
+    ]
+
+    # スレッドプールは最大バッチサイズで 1 つだけ作成し、全シナリオで共有する
+    with ThreadPoolExecutor(max_workers=max(batch_sizes)) as ex:
+        for op, call, api_name, unit, make_arg in concurrent_batches:
+            for batch_size in batch_sizes[1:]:  # 10, 50
+                scenario_name = f"{op}_batch_concurrent_{batch_size}"
+                logger.info(
+                    f"[START] {api_name} (同時実行バッチ {batch_size} {unit}) ({total_iterations} 回)"
+                )
+                latencies = np.empty(iterations, dtype=np.int64)
+                idx = 0
+                errors = 0
+
+                for i in range(total_iterations):
+                    batch_args = [make_arg(i, j) for j in range(batch_size)]
+                    elapsed, batch_success = measure_concurrent_batch(ex, call, batch_args)
+
+                    if i >= WARMUP_COUNT:
+                        if batch_success:
+                            latencies[idx] = elapsed
+                            idx += 1
+                        else:
+                            errors += 1
+
+                stats = compute_stats(latencies[:idx], percentiles)
+                results["scenarios"][scenario_name] = {
+                    "stats": stats,
+                    "errors": errors,
+                    "batch_size": batch_size,
+                    "concurrent": True,
+                }
+                logger.info(
+                    f"  [OK] 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
+                    f"P95: {stats['p95']:.1f}ms, P99: {stats['p99']:.1f}ms"
+                )
+
     # --- クリーンアップ: DeleteMemoryRecord ---
     logger.info(f"[START] DeleteMemoryRecord (単一) ({total_iterations} 回)")
-    # まずレコードを取得
-    try:
-        response = client.retrieve_memory_records(
-            memoryId=memory_id,
-            namespace=namespace,
-            query="benchmark",
-        )
-        record_ids = [r["memoryRecordId"] for r in response.get("memoryRecords", [])]
-    except ClientError:
-        record_ids = []
+    # 作成時に記録した ID を削除対象にする（検索結果の上位件数に左右されない）
+    record_ids = [record_id for record_id in created_ids if record_id]
 
-    latencies = []
+    latencies = np.empty(iterations, dtype=np.int64)
+    idx = 0
     errors = 0
 
-    if record_ids:
-        for i in range(min(total_iterations, len(record_ids))):
-            latency, success = measure_delete_memory_record(
-                client, memory_id, record_ids[i]
+    def delete_one(record_id: str) -> tuple[int, bool]:
+        return measure_delete_memory_record(client, memory_id, record_id)
+
+    # 削除は互いに独立しているため並行に発行する（レイテンシーは 1 件ずつ測定）
+    targets = record_ids[:total_iterations]
+    with ThreadPoolExecutor(max_workers=DELETE_CONCURRENCY) as ex:
+        # ウォームアップ分を先に削除し、計測対象の削除と混ざらないようにする
+        list(ex.map(delete_one, targets[:WARMUP_COUNT]))
+        for latency, success in ex.map(delete_one, targets[WARMUP_COUNT:]):
+            if success:
+                latencies[idx] = latency
+                idx += 1
+            else:
+                errors += 1
+
+    # 計測に使わなかった残りのレコードは BatchDeleteMemoryRecords でまとめて削除する（計測対象外）
+    leftover = record_ids[len(targets):]
+    for offset in range(0, len(leftover), BATCH_DELETE_LIMIT):
+        chunk = leftover[offset:offset + BATCH_DELETE_LIMIT]
+        try:
+            client.batch_delete_memory_records(
+                memoryId=memory_id,
+                records=[{"memoryRecordId": record_id} for record_id in chunk],
             )
-            if i >= WARMUP_COUNT:
-                if success:
-                    latencies.append(latency)
-                else:
-                    errors += 1
+        except ClientError as e:
+            logger.warning(f"  残りのレコードの削除に失敗しました: {e}")
+            break
 
-    stats = compute_stats(latencies)
+    stats = compute_stats(latencies[:idx], percentiles)
     results["scenarios"]["delete_single"] = {"stats": stats, "errors": errors}
-    if latencies:
+    if idx:
         logger.info(
             f"  [OK] 平均: {stats['mean']:.1f}ms, 中央値: {stats['median']:.1f}ms, "
             f"P95: {stats['p95']:.1f}ms, P99: {stats['p99']:.1f}ms"
@@ -395,6 +571,17 @@ def main():
         default=None,
         help="結果の出力先ファイル（デフォルト: 標準出力）",
     )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="JSON をインデント付きで出力する（デフォルト: 1 行）",
+    )
+    parser.add_argument(
+        "--percentiles",
+        type=parse_percentiles,
+        default=DEFAULT_PERCENTILES,
+        help="出力するパーセンタイルのカンマ区切り（例: 50,95,99,99.9。中央値・P95・P99 は常に出力）",
+    )
     args = parser.parse_args()
 
     logger.info("=" * 60)
@@ -404,17 +591,12 @@ def main():
     logger.info(f"  ウォームアップ: {WARMUP_COUNT}")
     logger.info(f"  Dry-run: {args.dry_run}")
 
-    config = load_config()
-    results = benchmark_memory_api(config, args.iterations, args.dry_run)
-
-    output_json = json.dumps(results, indent=2, ensure_ascii=False)
+    config = load_config(("region", "memoryId"))
+    results = benchmark_memory_api(config, args.iterations, args.dry_run, args.percentiles)
 
+    write_results(results, args.output, args.pretty)
     if args.output:
-        with open(args.output, "w") as f:
-            f.write(output_json)
         logger.info(f"[OK] 結果を保存しました: {args.output}")
-    else:
-        print(output_json)
 
 
 if __name__ == "__main__":
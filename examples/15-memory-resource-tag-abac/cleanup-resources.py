@@ -13,8 +13,15 @@ import json
 import os
 import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 REGION = "us-east-1"
 CONFIG_FILE = "phase15-config.json"
 
@@ -23,59 +30,99 @@ ROLE_NAMES = [
     "memory-restag-abac-tenant-b-role",
 ]
 
+# 削除処理は互いに独立しているため並行に発行する
+DELETE_WORKERS = 4
+
+# IAM / Memory 制御プレーンクライアント共通の設定（並行削除の分のコネクションを確保する）
+CLIENT_CONFIG = Config(
+    retries={"mode": "adaptive", "max_attempts": 5},
+    max_pool_connections=16,
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=30,
+)
+
+# IAM / Memory のクライアントは 1 つの Session から作り、削除用のスレッドでも同じクライアントを共有する
+SESSION = boto3.Session(region_name=REGION)
+
 
 def load_config():
     """設定ファイルを読み込み"""
-    if not os.path.exists(CONFIG_FILE):
+    try:
+        with open(CONFIG_FILE, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
         print(f"[WARNING] Config file not found: {CONFIG_FILE}")
         return None
 
-    with open(CONFIG_FILE, "r") as f:
-        return json.load(f)
+    # orjson が利用可能ならバイト列のまま高速にパース（json.loads もバイト列を受け付ける）
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def log(message):
+    """1 行を改行込みで 1 回で書き込む（並行に実行する削除処理の出力が行の途中で混ざらないようにする）"""
+    sys.stdout.write(f"{message}\n")
 
 
 def delete_memory(control_client, memory_id, memory_name):
     """Memory リソースを削除"""
     try:
         control_client.delete_memory(memoryId=memory_id)
-        print(f"[OK] Memory deleted: {memory_name} ({memory_id})")
+        log(f"[OK] Memory deleted: {memory_name} ({memory_id})")
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         if error_code == "ResourceNotFoundException":
-            print(f"[INFO] Memory not found: {memory_name} ({memory_id})")
+            log(f"[INFO] Memory not found: {memory_name} ({memory_id})")
         else:
-            print(f"[ERROR] Failed to delete Memory {memory_name}: {error_code}")
-            print(f"  Message: {e.response['Error']['Message']}")
+            log(f"[ERROR] Failed to delete Memory {memory_name}: {error_code}")
+            log(f"  Message: {e.response['Error']['Message']}")
+
+
+def detach_role_policy(iam_client, role_name, kind, policy):
+    """Inline Policy の削除、または Managed Policy のデタッチを行う"""
+    if kind == "inline":
+        iam_client.delete_role_policy(RoleName=role_name, PolicyName=policy)
+        log(f"[OK] Inline policy deleted: {policy} from {role_name}")
+    else:
+        iam_client.detach_role_policy(RoleName=role_name, PolicyArn=policy["PolicyArn"])
+        log(f"[OK] Managed policy detached: {policy['PolicyName']} from {role_name}")
 
 
 def delete_iam_role(iam_client, role_name):
-    """IAM ロールを削除（Inline Policy を先に削除）"""
+    """IAM ロールを削除（Inline Policy の削除と Managed Policy のデタッチを先に並行で行う）"""
     try:
-        # Inline Policy を列挙して削除
-        policies = iam_client.list_role_policies(RoleName=role_name)
-        for policy_name in policies.get("PolicyNames", []):
-            iam_client.delete_role_policy(
-                RoleName=role_name, PolicyName=policy_name
+        # 一覧は 1 ページ（最大 100 件）で切れるため、ページネーターで全件を取得する
+        tasks = [
+            ("inline", name)
+            for page in iam_client.get_paginator("list_role_policies").paginate(
+                RoleName=role_name
             )
-            print(f"[OK] Inline policy deleted: {policy_name} from {role_name}")
-
-        # Managed Policy をデタッチ
-        attached = iam_client.list_attached_role_policies(RoleName=role_name)
-        for policy in attached.get("AttachedPolicies", []):
-            iam_client.detach_role_policy(
-                RoleName=role_name, PolicyArn=policy["PolicyArn"]
+            for name in page.get("PolicyNames", [])
+        ] + [
+            ("managed", policy)
+            for page in iam_client.get_paginator("list_attached_role_policies").paginate(
+                RoleName=role_name
+            )
+            for policy in page.get("AttachedPolicies", [])
+        ]
+
+        # ロールの削除はすべてのポリシーを外し終えてから行う
+        with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
+            list(
+                executor.map(
+                    lambda task: detach_role_policy(iam_client, role_name, *task), tasks
+                )
             )
-            print(f"[OK] Managed policy detached: {policy['PolicyName']}")
 
         # ロールを削除
         iam_client.delete_role(RoleName=role_name)
-        print(f"[OK] Role deleted: {role_name}")
+        log(f"[OK] Role deleted: {role_name}")
 
     except ClientError as e:
         if e.response["Error"]["Code"] == "NoSuchEntity":
-            print(f"[INFO] Role does not exist: {role_name}")
+            log(f"[INFO] Role does not exist: {role_name}")
         else:
-            print(f"[ERROR] Failed to delete role {role_name}: {e}")
+            log(f"[ERROR] Failed to delete role {role_name}: {e}")
 
 
 def main():
@@ -108,30 +155,25 @@ def main():
     # Step 1: Memory リソースの削除
     print(f"\n[STEP 1] Deleting Memory resources...")
     if config:
-        control_client = boto3.client("bedrock-agentcore-control", region_name=REGION)
-
-        # Memory A
-        mem_a = config.get("memoryA", {})
-        if mem_a.get("memoryId"):
-            delete_memory(control_client, mem_a["memoryId"], mem_a.get("memoryName", "N/A"))
-
-        # Memory B
-        mem_b = config.get("memoryB", {})
-        if mem_b.get("memoryId"):
-            delete_memory(control_client, mem_b["memoryId"], mem_b.get("memoryName", "N/A"))
-
-        # Memory (no tag) - Null Condition テスト用
-        mem_no_tag = config.get("memoryNoTag", {})
-        if mem_no_tag.get("memoryId"):
-            delete_memory(control_client, mem_no_tag["memoryId"], mem_no_tag.get("memoryName", "N/A"))
+        control_client = SESSION.client("bedrock-agentcore-control", config=CLIENT_CONFIG)
+
+        # Memory A, Memory B, Memory (no tag) - Null Condition テスト用
+        tasks = []
+        for key in ("memoryA", "memoryB", "memoryNoTag"):
+            memory = config.get(key, {})
+            if memory.get("memoryId"):
+                tasks.append((memory["memoryId"], memory.get("memoryName", "N/A")))
+
+        with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
+            list(executor.map(lambda task: delete_memory(control_client, *task), tasks))
     else:
         print("[INFO] No config file, skipping Memory deletion...")
 
     # Step 2: IAM ロールの削除
     print(f"\n[STEP 2] Deleting IAM roles...")
-    iam_client = boto3.client("iam", region_name=REGION)
-    for role_name in ROLE_NAMES:
-        delete_iam_role(iam_client, role_name)
+    iam_client = SESSION.client("iam", config=CLIENT_CONFIG)
+    with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
+        list(executor.map(lambda role_name: delete_iam_role(iam_client, role_name), ROLE_NAMES))
 
     # Step 3: 設定ファイルの削除
     print(f"\n[STEP 3] Removing config file...")
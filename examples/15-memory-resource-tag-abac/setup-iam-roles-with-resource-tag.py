@@ -12,30 +12,56 @@ Memory API 操作を許可する。
 """
 
 import boto3
+import functools
 import json
 import os
+import random
 import sys
+import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 REGION = "us-east-1"
 CONFIG_FILE = "phase15-config.json"
 
 TENANT_A_ROLE_NAME = "memory-restag-abac-tenant-a-role"
 TENANT_B_ROLE_NAME = "memory-restag-abac-tenant-b-role"
 
+# IAM クライアントの設定
+CLIENT_CONFIG = Config(
+    retries={"mode": "adaptive", "max_attempts": 5},
+    max_pool_connections=16,
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=30,
+)
+
+# boto3 Session（クライアントはここから作る）
+SESSION = boto3.Session(region_name=REGION)
+
 
 def load_config():
     """設定ファイルを読み込み"""
-    if not os.path.exists(CONFIG_FILE):
+    try:
+        with open(CONFIG_FILE, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
         print(f"[ERROR] Config file not found: {CONFIG_FILE}")
         print("  Run: python3 setup-memory-with-tags.py first")
         sys.exit(1)
 
-    with open(CONFIG_FILE, "r") as f:
-        return json.load(f)
+    # orjson が利用可能ならバイト列のまま高速にパース（json.loads もバイト列を受け付ける）
+    return orjson.loads(data) if orjson is not None else json.loads(data)
 
 
+@functools.lru_cache(maxsize=None)
 def create_trust_policy(account_id, tenant_id):
     """
     Trust Policy を作成
@@ -44,6 +70,8 @@ def create_trust_policy(account_id, tenant_id):
     sts:TagSession が必要な理由:
     - AssumeRole 時に SessionTags（tenant_id）を付与するため
     - SessionTags がないと aws:PrincipalTag/tenant_id を参照できない
+
+    (account_id, tenant_id) ごとにキャッシュした同じ dict を返すため、呼び出し側で変更しないこと。
     """
     return {
         "Version": "2012-10-17",
@@ -60,6 +88,7 @@ def create_trust_policy(account_id, tenant_id):
     }
 
 
+@functools.lru_cache(maxsize=None)
 def create_memory_resource_tag_abac_policy():
     """
     Memory ResourceTag ABAC ポリシーを作成
@@ -69,6 +98,7 @@ def create_memory_resource_tag_abac_policy():
 
     S3 ABAC（s3:ExistingObjectTag/tenant_id）と異なり、
     Memory API では aws:ResourceTag を使用する。
+    ポリシーは固定のため、初回に組み立てた dict をキャッシュして返す（変更しないこと）。
     """
     return {
         "Version": "2012-10-17",
@@ -109,12 +139,17 @@ def create_memory_resource_tag_abac_policy():
     }
 
 
-def create_iam_role(iam_client, role_name, trust_policy, abac_policy, tenant_id):
-    """IAM ロールを作成"""
+def create_iam_role(iam_client, role_name, trust_policy_document, abac_policy_document, tenant_id):
+    """
+    IAM ロールを作成
+
+    trust_policy_document / abac_policy_document は JSON 文字列で受け取り、
+    作成・更新のどちらの経路でもそのまま渡す。
+    """
     try:
         response = iam_client.create_role(
             RoleName=role_name,
-            AssumeRolePolicyDocument=json.dumps(trust_policy),
+            AssumeRolePolicyDocument=trust_policy_document,
             Description=f"Memory ResourceTag ABAC Role for {tenant_id}",
             Tags=[
                 {"Key": "project", "Value": "memory-resource-tag-abac"},
@@ -129,9 +164,9 @@ def create_iam_role(iam_client, role_name, trust_policy, abac_policy, tenant_id)
         iam_client.put_role_policy(
             RoleName=role_name,
             PolicyName="MemoryResourceTagABACPolicy",
-            PolicyDocument=json.dumps(abac_policy),
+            PolicyDocument=abac_policy_document,
         )
-        print(f"[OK] Inline policy attached: MemoryResourceTagABACPolicy")
+        print(f"[OK] Inline policy attached: MemoryResourceTagABACPolicy ({role_name})")
 
         return {"roleName": role_name, "roleArn": role_arn, "tenantId": tenant_id}
 
@@ -144,27 +179,67 @@ def create_iam_role(iam_client, role_name, trust_policy, abac_policy, tenant_id)
             # Trust Policy を更新
             iam_client.update_assume_role_policy(
                 RoleName=role_name,
-                PolicyDocument=json.dumps(trust_policy),
+                PolicyDocument=trust_policy_document,
             )
-            print(f"[OK] Trust policy updated")
+            print(f"[OK] Trust policy updated ({role_name})")
 
             # Inline Policy を更新
             iam_client.put_role_policy(
                 RoleName=role_name,
                 PolicyName="MemoryResourceTagABACPolicy",
-                PolicyDocument=json.dumps(abac_policy),
+                PolicyDocument=abac_policy_document,
             )
-            print(f"[OK] Inline policy updated: MemoryResourceTagABACPolicy")
+            print(f"[OK] Inline policy updated: MemoryResourceTagABACPolicy ({role_name})")
 
             return {"roleName": role_name, "roleArn": role_arn, "tenantId": tenant_id}
         else:
             raise
 
 
+def wait_for_role_ready(sts_client, role_arn, tenant_id, timeout=30, initial_interval=0.5, max_interval=5):
+    """
+    IAM ロールを AssumeRole できるようになるまで待機
+
+    IAM の変更が伝播するまでの時間は通常数秒だが 10 秒を超えることもあるため、
+    固定時間待つのではなく、テストと同じ条件（ExternalId と tenant_id の SessionTags）で
+    AssumeRole を試し、成功した時点で戻る。間隔は initial_interval 秒から倍々に伸ばす
+    （上限 max_interval 秒、±20% のジッター付き）。
+
+    返り値: timeout 秒以内に AssumeRole に成功したかどうか
+    """
+    start = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            sts_client.assume_role(
+                RoleArn=role_arn,
+                RoleSessionName=f"restag-abac-probe-{tenant_id}",
+                ExternalId=tenant_id,
+                Tags=[{"Key": "tenant_id", "Value": tenant_id}],
+                DurationSeconds=900,
+            )
+            print(f"[OK] Role is ready: {role_arn} ({time.monotonic() - start:.1f}s)")
+            return True
+        except ClientError as e:
+            error = e
+
+        interval = min(max_interval, initial_interval * 2 ** attempt) * random.uniform(0.8, 1.2)
+        attempt += 1
+        if time.monotonic() - start + interval >= timeout:
+            print(f"[WARNING] Role not assumable within {timeout}s: {role_arn}")
+            print(f"  Last error: {error.response['Error']['Code']}")
+            return False
+        time.sleep(interval)
+
+
 def save_config(config):
     """設定を JSON ファイルに保存"""
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=2)
+    if orjson is not None:
+        with open(CONFIG_FILE, "wb") as f:
+            f.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+    else:
+        with open(CONFIG_FILE, "w") as f:
+            json.dump(config, f, indent=2)
     print(f"\n[OK] Configuration updated: {os.path.abspath(CONFIG_FILE)}")
 
 
@@ -191,29 +266,35 @@ def main():
         print(f"  Tenant A Role: {TENANT_A_ROLE_NAME}")
         print(f"  Tenant B Role: {TENANT_B_ROLE_NAME}")
         print("\n[INFO] ABAC Policy (ResourceTag):")
-        policy = create_memory_resource_tag_abac_policy()
-        print(json.dumps(policy, indent=2))
+        json.dump(create_memory_resource_tag_abac_policy(), sys.stdout, indent=2)
+        sys.stdout.write("\n")
         return
 
-    iam_client = boto3.client("iam", region_name=REGION)
+    iam_client = SESSION.client("iam", config=CLIENT_CONFIG)
     abac_policy = create_memory_resource_tag_abac_policy()
 
     print("\n[INFO] ABAC Policy:")
-    print(json.dumps(abac_policy, indent=2))
-
-    # Step 1: Tenant A ロール作成
-    print("\n[STEP 1] Creating Tenant A IAM Role...")
-    trust_policy_a = create_trust_policy(account_id, "tenant-a")
-    role_a_info = create_iam_role(
-        iam_client, TENANT_A_ROLE_NAME, trust_policy_a, abac_policy, "tenant-a"
-    )
-
-    # Step 2: Tenant B ロール作成
-    print("\n[STEP 2] Creating Tenant B IAM Role...")
-    trust_policy_b = create_trust_policy(account_id, "tenant-b")
-    role_b_info = create_iam_role(
-        iam_client, TENANT_B_ROLE_NAME, trust_policy_b, abac_policy, "tenant-b"
-    )
+    json.dump(abac_policy, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+    # ABAC ポリシーは両テナント共通なので、シリアライズは 1 回だけ行う
+    abac_policy_json = json.dumps(abac_policy)
+
+    # Step 1-2: Tenant A / Tenant B ロール作成
+    # Trust Policy は IAM 呼び出しの前にまとめて組み立て、2 つのロールは並行に作成する
+    print("\n[STEP 1-2] Creating Tenant A/B IAM Roles in parallel...")
+    tasks = [
+        (TENANT_A_ROLE_NAME, json.dumps(create_trust_policy(account_id, "tenant-a")), "tenant-a"),
+        (TENANT_B_ROLE_NAME, json.dumps(create_trust_policy(account_id, "tenant-b")), "tenant-b"),
+    ]
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = [
+            executor.submit(
+                create_iam_role, iam_client, role_name, trust_policy_json, abac_policy_json, tenant_id
+            )
+            for role_name, trust_policy_json, tenant_id in tasks
+        ]
+        role_a_info, role_b_info = (future.result() for future in futures)
 
     # Config 保存
     config["roles"] = {
@@ -222,12 +303,26 @@ def main():
     }
     save_config(config)
 
+    # Step 3: IAM の伝播待ち（AssumeRole が成功するまで確認する）
+    print("\n[STEP 3] Waiting for IAM roles to become assumable...")
+    sts_client = SESSION.client("sts", config=CLIENT_CONFIG)
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        ready = all(
+            executor.map(
+                lambda info: wait_for_role_ready(sts_client, info["roleArn"], info["tenantId"]),
+                (role_a_info, role_b_info),
+            )
+        )
+
     print("\n" + "=" * 60)
     print("[OK] IAM roles setup complete!")
     print("=" * 60)
     print("\nNext steps:")
-    print("  1. Wait ~10 seconds for IAM policy propagation")
-    print("  2. Run: python3 test-resource-tag-abac.py")
+    if ready:
+        print("  1. Run: python3 test-resource-tag-abac.py")
+    else:
+        print("  1. Wait a few more seconds for IAM policy propagation")
+        print("  2. Run: python3 test-resource-tag-abac.py")
 
 
 if __name__ == "__main__":
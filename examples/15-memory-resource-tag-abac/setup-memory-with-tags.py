@@ -7,18 +7,28 @@ Tenant A と Tenant B 用の Memory を作成し、
 
 検証内容:
 - Memory 作成時にタグを付与
-- ListTagsForResource でタグの付与を確認
+- ListTagsForResource でタグの付与を確認（--verify 指定時）
 - aws:ResourceTag/tenant_id Condition Key の前提条件を構築
 """
 
 import boto3
+import functools
 import json
 import os
+import random
 import sys
+import threading
 import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 REGION = "us-east-1"
 CONFIG_FILE = "phase15-config.json"
 
@@ -26,20 +36,44 @@ MEMORY_NAME_A = "resource_tag_abac_tenant_a"
 MEMORY_NAME_B = "resource_tag_abac_tenant_b"
 MEMORY_NAME_NO_TAG = "resource_tag_abac_no_tag"
 
+# STS / Memory 制御プレーンクライアント共通の設定
+# （keep-alive を有効にし、GetMemory のポーリングでも同じ接続を使い回す）
+CLIENT_CONFIG = Config(
+    retries={"mode": "adaptive", "max_attempts": 5},
+    max_pool_connections=16,
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=30,
+)
+
+# 全クライアントを 1 つの Session から作り、認証情報の解決とサービスモデルの読み込みを共有する
+# （Session.client() はスレッドセーフではないため、クライアントの生成はメインスレッドで行う）
+SESSION = boto3.Session(region_name=REGION)
+
+# 既存 Memory の名前確認で並行に発行する GetMemory の数
+FIND_MEMORY_WORKERS = 8
+
+# list_memories の結果（Memory A / B / no-tag の検索で共有する）
+_memory_list_cache = {}
+_memory_list_lock = threading.Lock()
 
+
+@functools.lru_cache(maxsize=1)
 def get_account_id():
-    """AWS アカウント ID を取得"""
-    sts = boto3.client("sts", region_name=REGION)
+    """AWS アカウント ID を取得（同一プロセス内では STS を 1 回だけ呼び出す）"""
+    sts = SESSION.client("sts", config=CLIENT_CONFIG)
     return sts.get_caller_identity()["Account"]
 
 
-def create_memory_with_tags(control_client, memory_name, tenant_id):
+def create_memory_with_tags(control_client, memory_name, tenant_id, verify=False):
     """
     Memory を作成し、リソースタグを付与する。
 
     Bedrock AgentCore の CreateMemory API がタグパラメータを
     サポートしている場合は直接付与し、サポートしていない場合は
     TagResource API を使用する。
+    verify=True の場合は ListTagsForResource で付与結果を確認する
+    （TagResource が成功した時点でタグは付与済みのため、既定では確認しない）。
     """
     print(f"\n[INFO] Creating Memory: {memory_name} (tenant_id={tenant_id})")
 
@@ -102,8 +136,9 @@ def create_memory_with_tags(control_client, memory_name, tenant_id):
     tag_memory(control_client, memory_arn, tenant_id)
 
     # タグの確認
-    print(f"[INFO] Verifying tags...")
-    verify_tags(control_client, memory_arn, tenant_id)
+    if verify:
+        print(f"[INFO] Verifying tags...")
+        verify_tags(control_client, memory_arn, tenant_id)
 
     return {
         "memoryId": memory_id,
@@ -115,32 +150,75 @@ def create_memory_with_tags(control_client, memory_name, tenant_id):
     }
 
 
+def list_memory_summaries(control_client):
+    """list_memories の結果を返す（プロセス内で 1 回だけ呼び出す）"""
+    with _memory_list_lock:
+        if "memories" not in _memory_list_cache:
+            response = control_client.list_memories()
+            _memory_list_cache["memories"] = response.get("memories", [])
+        return _memory_list_cache["memories"]
+
+
 def find_existing_memory(control_client, memory_name):
-    """既存の Memory を名前で検索"""
+    """
+    既存の Memory を名前で検索
+
+    一覧に name が含まれていればそのまま照合し、含まれていなければ
+    GetMemory を並行に発行して、名前が一致した時点で残りを打ち切る。
+    """
     try:
-        response = control_client.list_memories()
-        for mem in response.get("memories", []):
-            details = control_client.get_memory(memoryId=mem["id"])
-            memory = details["memory"]
-            if memory.get("name") == memory_name:
-                return {
-                    "memoryId": memory["id"],
-                    "memoryArn": memory["arn"],
-                }
+        summaries = list_memory_summaries(control_client)
+        for mem in summaries:
+            if mem.get("name") == memory_name:
+                return {"memoryId": mem["id"], "memoryArn": mem["arn"]}
+
+        # Memory ID は "<name>-<suffix>" の形式なので、前方一致するものを先に確認する
+        candidates = sorted(
+            (mem for mem in summaries if "name" not in mem),
+            key=lambda mem: not mem["id"].startswith(f"{memory_name}-"),
+        )
+        if not candidates:
+            return None
+
+        with ThreadPoolExecutor(max_workers=FIND_MEMORY_WORKERS) as executor:
+            futures = [
+                executor.submit(control_client.get_memory, memoryId=mem["id"])
+                for mem in candidates
+            ]
+            for future in as_completed(futures):
+                memory = future.result()["memory"]
+                if memory.get("name") == memory_name:
+                    for pending in futures:
+                        pending.cancel()
+                    return {
+                        "memoryId": memory["id"],
+                        "memoryArn": memory["arn"],
+                    }
     except ClientError as e:
         print(f"[WARNING] Failed to list memories: {e}")
     return None
 
 
-def wait_for_memory_active(control_client, memory_id, max_wait=120, interval=5):
-    """Memory が ACTIVE になるまで待機"""
-    elapsed = 0
-    while elapsed < max_wait:
+def wait_for_memory_active(control_client, memory_id, max_wait=120, initial_interval=1, max_interval=10):
+    """
+    Memory が ACTIVE になるまで待機
+
+    ポーリング間隔は initial_interval 秒から倍々に伸ばし（上限 max_interval 秒、±20% のジッター付き）、
+    すぐに ACTIVE になる場合は早く抜け、時間がかかる場合は GetMemory の呼び出し回数を抑える。
+    """
+    start = time.monotonic()
+    attempt = 0
+    last_status = None
+    while True:
+        elapsed = time.monotonic() - start
         try:
             response = control_client.get_memory(memoryId=memory_id)
             memory = response["memory"]
             status = memory.get("status", "UNKNOWN")
-            print(f"  Status: {status} ({elapsed}s elapsed)")
+            # 進捗は状態が変わったときと 3 回に 1 回だけ出力する
+            if status != last_status or attempt % 3 == 0:
+                print(f"  Status: {status} ({elapsed:.0f}s elapsed, {memory_id})")
+            last_status = status
 
             if status == "ACTIVE":
                 return memory
@@ -152,8 +230,11 @@ def wait_for_memory_active(control_client, memory_id, max_wait=120, interval=5):
         except ClientError as e:
             print(f"  [WARNING] GetMemory failed: {e}")
 
+        interval = min(max_interval, initial_interval * 2 ** attempt) * random.uniform(0.8, 1.2)
+        attempt += 1
+        if elapsed + interval >= max_wait:
+            break
         time.sleep(interval)
-        elapsed += interval
 
     print(f"[ERROR] Memory did not become ACTIVE within {max_wait}s")
     return None
@@ -290,8 +371,12 @@ def create_memory_without_tags(control_client, memory_name):
 
 def save_config(config):
     """設定を JSON ファイルに保存"""
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=2)
+    if orjson is not None:
+        with open(CONFIG_FILE, "wb") as f:
+            f.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+    else:
+        with open(CONFIG_FILE, "w") as f:
+            json.dump(config, f, indent=2)
     print(f"\n[OK] Configuration saved: {os.path.abspath(CONFIG_FILE)}")
 
 
@@ -300,6 +385,11 @@ def main():
         description="Memory ResourceTag ABAC: Memory 作成 + タグ付与スクリプト"
     )
     parser.add_argument("--dry-run", action="store_true", help="実行せずに確認のみ")
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="タグ付与後に ListTagsForResource でタグを確認する",
+    )
     args = parser.parse_args()
 
     print("=" * 60)
@@ -316,46 +406,46 @@ def main():
         print(f"  Memory B: {MEMORY_NAME_B} (tenant_id=tenant-b)")
         return
 
-    control_client = boto3.client("bedrock-agentcore-control", region_name=REGION)
-
     config = {
         "accountId": account_id,
         "region": REGION,
     }
 
-    # Step 1: Tenant A の Memory 作成
-    print("\n[STEP 1] Creating Tenant A Memory with tags...")
-    try:
-        memory_a = create_memory_with_tags(control_client, MEMORY_NAME_A, "tenant-a")
-        config["memoryA"] = memory_a
-    except Exception as e:
-        print(f"[ERROR] Failed to create Tenant A Memory: {e}")
-        print("[NOTE] If TagResource is not supported, see README.md for alternatives.")
+    # Step 1-3: Tenant A / Tenant B / タグなし（Null Condition テスト用）の Memory を並行に作成する
+    # （ACTIVE になるまでの待機が重なるため、所要時間はほぼ 1 つ分になる）
+    print("\n[STEP 1-3] Creating Tenant A/B Memory with tags and Memory without tags in parallel...")
+    tasks = {
+        "memoryA": (create_memory_with_tags, (MEMORY_NAME_A, "tenant-a", args.verify), "Tenant A"),
+        "memoryB": (create_memory_with_tags, (MEMORY_NAME_B, "tenant-b", args.verify), "Tenant B"),
+        "memoryNoTag": (create_memory_without_tags, (MEMORY_NAME_NO_TAG,), "no-tag"),
+    }
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        # クライアントはスレッドごとに専用のものを用意する
+        futures = {
+            key: executor.submit(
+                create,
+                SESSION.client("bedrock-agentcore-control", config=CLIENT_CONFIG),
+                *create_args,
+            )
+            for key, (create, create_args, _) in tasks.items()
+        }
+
+    failed = False
+    for key, future in futures.items():
+        label = tasks[key][2]
+        try:
+            config[key] = future.result()
+        except Exception as e:
+            print(f"[ERROR] Failed to create {label} Memory: {e}")
+            if key != "memoryNoTag":
+                print("[NOTE] If TagResource is not supported, see README.md for alternatives.")
+            failed = True
+
+    if failed:
         # Config を部分的に保存して再実行可能にする
         save_config(config)
         sys.exit(1)
 
-    # Step 2: Tenant B の Memory 作成
-    print("\n[STEP 2] Creating Tenant B Memory with tags...")
-    try:
-        memory_b = create_memory_with_tags(control_client, MEMORY_NAME_B, "tenant-b")
-        config["memoryB"] = memory_b
-    except Exception as e:
-        print(f"[ERROR] Failed to create Tenant B Memory: {e}")
-        print("[NOTE] If TagResource is not supported, see README.md for alternatives.")
-        save_config(config)
-        sys.exit(1)
-
-    # Step 3: タグなし Memory の作成（Null Condition テスト用）
-    print("\n[STEP 3] Creating Memory without tags (Null Condition test)...")
-    try:
-        memory_no_tag = create_memory_without_tags(control_client, MEMORY_NAME_NO_TAG)
-        config["memoryNoTag"] = memory_no_tag
-    except Exception as e:
-        print(f"[ERROR] Failed to create no-tag Memory: {e}")
-        save_config(config)
-        sys.exit(1)
-
     # Config 保存
     save_config(config)
 
@@ -17,447 +17,699 @@ Test 5: ResourceTag なしの Memory へのアクセス拒否（Null Condition 
 """
 
 import boto3
+import functools
+import io
+import itertools
 import json
 import os
+import random
+import re
 import sys
+import threading
 import time
 import uuid
-from datetime import datetime
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 REGION = "us-east-1"
 CONFIG_FILE = "phase15-config.json"
+REQUIRED_CONFIG_FIELDS = frozenset({"memoryA", "memoryB", "roles"})
 RESULT_FILE = "VERIFICATION_RESULT.md"
 
-
+# STS / Memory Data Plane クライアント共通の設定
+# （並行に実行するテストケースがクライアントを共有するため、プールを大きめに取る）
+CLIENT_CONFIG = Config(
+    retries={"mode": "adaptive", "max_attempts": 6},
+    max_pool_connections=20,
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=30,
+    user_agent_extra="restag-abac-test",
+)
+
+# RetrieveMemoryRecords 用の設定。スロットリング時のリトライは with_retry だけで行うため、
+# botocore 側のリトライは無効にする（両方でリトライすると試行回数が掛け算で増える）
+RETRIEVE_CLIENT_CONFIG = CLIENT_CONFIG.merge(Config(
+    retries={"mode": "standard", "total_max_attempts": 1},
+))
+
+# 一時的な認証情報の有効期限がこの時間を切ったら AssumeRole をやり直す
+CREDENTIAL_REFRESH_MARGIN = timedelta(seconds=60)
+
+# (role_arn, external_id, tenant_id) → (認証情報の有効期限, (Put 用クライアント, Retrieve 用クライアント))
+_client_cache = {}
+_client_create_lock = threading.Lock()
+
+# RetrieveMemoryRecords でリトライするエラーコードと、プロセス全体で許容するスロットリング回数。
+# 回数を超えたら残りのテストでは API を呼ばずに失敗として扱う（リトライの連鎖でテストが長引くのを防ぐ）
+THROTTLING_CODES = frozenset({
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+})
+THROTTLE_BUDGET = 8
+_throttle_count = 0
+_throttle_lock = threading.Lock()
+
+# テスト実行ごとの ID と連番（RoleSessionName / requestIdentifier を (実行 ID, テナント, 連番) で一意にする）
+_RUN_ID = uuid.uuid4().hex[:8]
+_SEQ = itertools.count()
+
+# --tests / --tenants で選択できる値とデフォルト（全テスト・全テナント）
+ALL_TESTS = (1, 2, 3, 4, 5)
+ALL_TENANTS = ("a", "b")
+TENANT_NAMES = {"a": "Tenant A", "b": "Tenant B"}
+TENANT_ROLE_KEYS = {"a": "tenantA", "b": "tenantB"}
+
+
+@functools.lru_cache(maxsize=1)
 def load_config():
-    """設定ファイルを読み込み"""
-    if not os.path.exists(CONFIG_FILE):
+    """設定ファイルを読み込み（1 回だけパースし、以降は同じ dict を返す。呼び出し側で変更しないこと）"""
+    try:
+        with open(CONFIG_FILE, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
         print(f"[ERROR] Config file not found: {CONFIG_FILE}")
         print("  Run: python3 setup-memory-with-tags.py && python3 setup-iam-roles-with-resource-tag.py first")
         sys.exit(1)
 
-    with open(CONFIG_FILE, "r") as f:
-        config = json.load(f)
+    # orjson があればバイト列のままパースする（なければ標準の json.loads で読む）
+    config = orjson.loads(data) if orjson is not None else json.loads(data)
 
     # 必須フィールドの検証
-    required = ["memoryA", "memoryB", "roles"]
-    for field in required:
-        if field not in config:
-            print(f"[ERROR] Missing required field in config: {field}")
-            sys.exit(1)
+    missing = REQUIRED_CONFIG_FIELDS - config.keys()
+    if missing:
+        print(f"[ERROR] Missing required field(s) in config: {', '.join(sorted(missing))}")
+        sys.exit(1)
 
     return config
 
 
+@functools.lru_cache(maxsize=1)
+def get_sts_client():
+    """STS クライアントを取得する（全 AssumeRole で共有）"""
+    return boto3.client("sts", region_name=REGION, config=CLIENT_CONFIG)
+
+
 def assume_role_with_tags(role_arn, external_id, tenant_id):
     """
     STS AssumeRole を実行し、SessionTags で tenant_id を付与する。
 
-    返り値は tenant_id タグ付きの一時的な認証情報を持つ
-    bedrock-agentcore クライアント。
+    返り値は tenant_id タグ付きの一時的な認証情報を持つ bedrock-agentcore クライアントの組
+    (client, retrieve_client)。retrieve_client は botocore のリトライを無効にしたもの。
+    同じ (role_arn, external_id, tenant_id) では認証情報の有効期限が
+    CREDENTIAL_REFRESH_MARGIN を切るまで同じクライアントを返す。
     """
-    sts = boto3.client("sts", region_name=REGION)
-    response = sts.assume_role(
+    key = (role_arn, external_id, tenant_id)
+    cached = _client_cache.get(key)
+    if cached and cached[0] - datetime.now(timezone.utc) > CREDENTIAL_REFRESH_MARGIN:
+        return cached[1]
+
+    response = get_sts_client().assume_role(
         RoleArn=role_arn,
-        RoleSessionName=f"restag-abac-test-{tenant_id}-{uuid.uuid4().hex[:8]}",
+        RoleSessionName=f"restag-abac-test-{tenant_id}-{_RUN_ID}",
         ExternalId=external_id,
         Tags=[{"Key": "tenant_id", "Value": tenant_id}],
     )
     credentials = response["Credentials"]
 
-    # Data Plane クライアント (Memory Record 操作用)
-    client = boto3.client(
-        "bedrock-agentcore",
-        region_name=REGION,
-        aws_access_key_id=credentials["AccessKeyId"],
-        aws_secret_access_key=credentials["SecretAccessKey"],
-        aws_session_token=credentials["SessionToken"],
-    )
-    return client
+    # Data Plane クライアント (Memory Record 操作用)。
+    # AssumeRole はテナントごとに並行に呼ばれるが、boto3 のデフォルトセッションでの
+    # クライアント生成はスレッドセーフではないため、生成だけはロックで直列化する
+    with _client_create_lock:
+        clients = tuple(
+            boto3.client(
+                "bedrock-agentcore",
+                region_name=REGION,
+                aws_access_key_id=credentials["AccessKeyId"],
+                aws_secret_access_key=credentials["SecretAccessKey"],
+                aws_session_token=credentials["SessionToken"],
+                config=config,
+            )
+            for config in (CLIENT_CONFIG, RETRIEVE_CLIENT_CONFIG)
+        )
+    _client_cache[key] = (credentials["Expiration"], clients)
+    return clients
 
 
-def test_put_memory_record(client, memory_id, strategy_id, tenant_id, namespace):
+def test_put_memory_records(client, memory_id, strategy_id, tenant_id, namespace,
+                            timestamp, count=1):
     """
     PutMemoryRecord (BatchCreateMemoryRecords) を実行する。
 
-    返り値: (success: bool, detail: str)
+    count 件（最大 100 件）のレコードを 1 回の BatchCreateMemoryRecords でまとめて作成する。
+    timestamp はテストケースごとに 1 回だけ取得したものを使う。
+
+    botocore のリトライを使い切ってもスロットリングされた場合や、ClientError 以外の
+    例外で失敗した場合は、拒否されたかどうか判定できないため success を None にする。
+
+    返り値: (success: bool | None, detail: str, created_ids: list[str])
     """
-    request_id = str(uuid.uuid4())
-    timestamp = datetime.utcnow().isoformat() + "Z"
+    text = f"Test record for ResourceTag ABAC by {tenant_id}. Timestamp: {timestamp.isoformat()}"
+    records = [
+        {
+            "requestIdentifier": f"{_RUN_ID}-{tenant_id}-{next(_SEQ)}",
+            "namespaces": [namespace],
+            "content": {"text": text},
+            "timestamp": timestamp,
+            "memoryStrategyId": strategy_id,
+        }
+        for _ in range(count)
+    ]
 
     try:
-        client.batch_create_memory_records(
+        response = client.batch_create_memory_records(
             memoryId=memory_id,
-            memoryRecords=[
-                {
-                    "content": {
-                        "text": f"Test record for ResourceTag ABAC by {tenant_id}. Timestamp: {timestamp}"
-                    },
-                    "namespaces": [namespace],
-                    "memoryStrategyId": strategy_id,
-                }
-            ],
+            records=records,
         )
-        return True, "BatchCreateMemoryRecords succeeded"
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         error_msg = e.response["Error"]["Message"]
-        return False, f"{error_code}: {error_msg}"
+        if error_code in THROTTLING_CODES:
+            return None, f"{error_code}: {error_msg}", []
+        return False, f"{error_code}: {error_msg}", []
     except Exception as e:
-        return False, f"Unexpected error: {str(e)}"
+        # ParamValidationError や接続エラーなど、IAM の判定に届いていない失敗は判定不能とする
+        return None, f"Unexpected error: {str(e)}", []
+
+    created_ids = [
+        r["memoryRecordId"]
+        for r in response.get("successfulRecords", [])
+        if "memoryRecordId" in r
+    ]
+    failed = response.get("failedRecords", [])
+    if failed:
+        first = failed[0]
+        return (
+            False,
+            f"{first.get('errorCode', 'Failed')}: {first.get('errorMessage', '')} "
+            f"({len(failed)}/{count} records failed)",
+            created_ids,
+        )
+    return True, f"BatchCreateMemoryRecords succeeded, {count} record(s)", created_ids
+
+
+class ThrottleCircuitOpen(Exception):
+    """スロットリングが THROTTLE_BUDGET 回を超え、以降の呼び出しを打ち切ったことを示す"""
+
+
+def _retry_after_seconds(error):
+    """ClientError のレスポンスに Retry-After ヘッダーがあれば秒数を返す"""
+    headers = error.response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+    try:
+        return float(headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+def with_retry(fn, *, max_attempts=4, base=0.2, cap=5.0):
+    """
+    fn() をスロットリング系のエラーに限ってリトライする。
+
+    待ち時間は decorrelated jitter（直前の待ち時間の 3 倍までの一様乱数、上限 cap 秒）で、
+    Retry-After ヘッダーがあればそれより短くはしない（cap を超えていてもそのまま待つ）。スロットリングの回数はプロセス全体で
+    数え、THROTTLE_BUDGET を超えたら以降は API を呼ばずに ThrottleCircuitOpen を送出する。
+    """
+    global _throttle_count
+    delay = base
+    for attempt in range(1, max_attempts + 1):
+        if _throttle_count >= THROTTLE_BUDGET:
+            raise ThrottleCircuitOpen(
+                f"{_throttle_count} throttled calls in this run, not calling the API"
+            )
+        try:
+            return fn()
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in THROTTLING_CODES:
+                raise
+            with _throttle_lock:
+                _throttle_count += 1
+            if attempt == max_attempts:
+                raise
+            delay = min(cap, random.uniform(base, delay * 3))
+            retry_after = _retry_after_seconds(e)
+            # Retry-After はサーバーの指定なので cap では切り詰めない
+            time.sleep(delay if retry_after is None else max(delay, retry_after))
 
 
 def test_retrieve_memory_records(client, memory_id, strategy_id, namespace, query):
     """
     RetrieveMemoryRecords を実行する。
 
-    返り値: (success: bool, detail: str)
+    client には botocore のリトライを無効にしたクライアントを渡し、スロットリングされた
+    場合は with_retry で待ってから再試行する。リトライを使い切った場合、サーキットが
+    開いている場合、ClientError 以外の例外で失敗した場合は、拒否されたかどうか
+    判定できないため success を None にする。
+
+    返り値: (success: bool | None, detail: str)
     """
     try:
-        response = client.retrieve_memory_records(
+        response = with_retry(lambda: client.retrieve_memory_records(
             memoryId=memory_id,
-            memoryStrategyId=strategy_id,
             namespace=namespace,
-            query={
-                "text": query,
+            searchCriteria={
+                "searchQuery": query,
+                "memoryStrategyId": strategy_id,
             },
-        )
-        records = response.get("memoryRecords", [])
+        ))
+        records = response.get("memoryRecordSummaries", [])
         return True, f"RetrieveMemoryRecords succeeded, {len(records)} records found"
+    except ThrottleCircuitOpen as e:
+        return None, f"Not called (throttle circuit open): {e}"
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         error_msg = e.response["Error"]["Message"]
+        if error_code in THROTTLING_CODES:
+            return None, f"{error_code}: {error_msg} (retries exhausted)"
         return False, f"{error_code}: {error_msg}"
     except Exception as e:
-        return False, f"Unexpected error: {str(e)}"
+        # リクエストがサービスに届いていない可能性があるため、拒否とはみなさない
+        return None, f"Unexpected error: {str(e)}"
 
 
-def run_test_case(test_num, description, client, memory_id, strategy_id,
-                  tenant_id, namespace, expect_success):
+def run_test_case(test_num, description, client, retrieve_client, memory_id, strategy_id,
+                  tenant_id, namespace, expect_success, early_exit_on_denied=False):
     """
     1 つのテストケースを実行する。
 
-    PutMemoryRecord と RetrieveMemoryRecords の両方をテストし、
-    期待結果と照合する。
-    """
-    print(f"\n{'=' * 60}")
-    print(f"[TEST {test_num}] {description}")
-    print(f"{'=' * 60}")
-    print(f"  Tenant: {tenant_id}")
-    print(f"  Memory ID: {memory_id}")
-    print(f"  Strategy ID: {strategy_id}")
-    print(f"  Namespace: {namespace}")
-    print(f"  Expected: {'SUCCESS' if expect_success else 'DENIED'}")
+    PutMemoryRecord と RetrieveMemoryRecords は互いに独立しているため並行にテストし、
+    期待結果と照合する。出力はテストケースごとにまとめて 1 回で書き出す
+    （並行に実行している他のテストケースの出力と混ざらないようにする）。
 
-    results = []
+    early_exit_on_denied が True で拒否を期待するテストでは Put を先に実行し、
+    AccessDenied で拒否されたことを確認できたら Retrieve は呼ばずに SKIP とする。
+    スロットリングやローカルのエラーで結果が得られなかった操作は、期待結果にかかわらず FAIL とする
+    （呼び出せなかった API を拒否の証拠として扱わない）。
+    """
+    lines = [
+        f"\n{'=' * 60}",
+        f"[TEST {test_num}] {description}",
+        f"{'=' * 60}",
+        f"  Tenant: {tenant_id}",
+        f"  Memory ID: {memory_id}",
+        f"  Strategy ID: {strategy_id}",
+        f"  Namespace: {namespace}",
+        f"  Expected: {'SUCCESS' if expect_success else 'DENIED'}",
+    ]
 
-    # Test: BatchCreateMemoryRecords
-    print(f"\n  [Sub-test] BatchCreateMemoryRecords...")
-    success, detail = test_put_memory_record(
-        client, memory_id, strategy_id, tenant_id, namespace
-    )
-    if success == expect_success:
-        status = "PASS"
-    else:
-        status = "FAIL"
-    print(f"  [{status}] {detail}")
-    results.append({
-        "operation": "BatchCreateMemoryRecords",
-        "success": success,
-        "expected_success": expect_success,
-        "status": status,
-        "detail": detail,
-    })
-
-    # Test: RetrieveMemoryRecords
-    print(f"\n  [Sub-test] RetrieveMemoryRecords...")
-    success, detail = test_retrieve_memory_records(
-        client, memory_id, strategy_id, namespace, f"test query from {tenant_id}"
-    )
-    if success == expect_success:
-        status = "PASS"
+    put_args = (client, memory_id, strategy_id, tenant_id, namespace, datetime.now(timezone.utc))
+    retrieve_args = (retrieve_client, memory_id, strategy_id, namespace, f"test query from {tenant_id}")
+    if early_exit_on_denied and not expect_success:
+        put_outcome = test_put_memory_records(*put_args)[:2]
+        if put_outcome[0] is False and "AccessDenied" in put_outcome[1]:
+            retrieve_outcome = None
+        else:
+            retrieve_outcome = test_retrieve_memory_records(*retrieve_args)
     else:
-        status = "FAIL"
-    print(f"  [{status}] {detail}")
-    results.append({
-        "operation": "RetrieveMemoryRecords",
-        "success": success,
-        "expected_success": expect_success,
-        "status": status,
-        "detail": detail,
-    })
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            put_future = executor.submit(test_put_memory_records, *put_args)
+            retrieve_future = executor.submit(test_retrieve_memory_records, *retrieve_args)
+        put_outcome = put_future.result()[:2]
+        retrieve_outcome = retrieve_future.result()
 
+    results = []
+    for operation, outcome in (
+        ("BatchCreateMemoryRecords", put_outcome),
+        ("RetrieveMemoryRecords", retrieve_outcome),
+    ):
+        if outcome is None:
+            success = None
+            status = "SKIP"
+            detail = "short-circuited after confirmed denial on BatchCreateMemoryRecords"
+        else:
+            success, detail = outcome
+            if success is None:
+                status = "FAIL"
+            else:
+                status = "PASS" if success == expect_success else "FAIL"
+        lines.append(f"\n  [Sub-test] {operation}...")
+        lines.append(f"  [{status}] {detail}")
+        results.append({
+            "operation": operation,
+            "success": success,
+            "expected_success": expect_success,
+            "status": status,
+            "detail": detail,
+        })
+
+    sys.stdout.write("\n".join(lines) + "\n")
     return results
 
 
-def run_all_tests(config):
-    """5 つのテストケースを実行"""
+def run_all_tests(config, tests=ALL_TESTS, tenants=ALL_TENANTS):
+    """指定されたテストケースを実行
+
+    tests / tenants で絞り込んだ結果、どのテストにも使われないテナントの
+    AssumeRole は行わない。
+    """
     memory_a = config["memoryA"]
     memory_b = config["memoryB"]
     memory_no_tag = config.get("memoryNoTag")
-    role_a = config["roles"]["tenantA"]
-    role_b = config["roles"]["tenantB"]
-
-    all_results = []
-
-    # AssumeRole: Tenant A
-    print("\n[INFO] AssumeRole for Tenant A...")
-    try:
-        client_a = assume_role_with_tags(
-            role_a["roleArn"], "tenant-a", "tenant-a"
-        )
-        print(f"[OK] Tenant A session established (PrincipalTag/tenant_id=tenant-a)")
-    except ClientError as e:
-        print(f"[ERROR] AssumeRole failed for Tenant A: {e}")
-        return []
-
-    # AssumeRole: Tenant B
-    print("\n[INFO] AssumeRole for Tenant B...")
-    try:
-        client_b = assume_role_with_tags(
-            role_b["roleArn"], "tenant-b", "tenant-b"
-        )
-        print(f"[OK] Tenant B session established (PrincipalTag/tenant_id=tenant-b)")
-    except ClientError as e:
-        print(f"[ERROR] AssumeRole failed for Tenant B: {e}")
-        return []
 
-    # Test 1: Tenant A -> Memory A (expect SUCCESS)
-    results_1 = run_test_case(
-        test_num=1,
-        description="Tenant A accessing own Memory (expect SUCCESS)",
-        client=client_a,
-        memory_id=memory_a["memoryId"],
-        strategy_id=memory_a["strategyId"],
-        tenant_id="tenant-a",
-        namespace="/tenant-a/test/",
-        expect_success=True,
-    )
-    all_results.append(("Test 1: Tenant A -> Memory A (own)", results_1))
-
-    # Test 2: Tenant B -> Memory B (expect SUCCESS)
-    results_2 = run_test_case(
-        test_num=2,
-        description="Tenant B accessing own Memory (expect SUCCESS)",
-        client=client_b,
-        memory_id=memory_b["memoryId"],
-        strategy_id=memory_b["strategyId"],
-        tenant_id="tenant-b",
-        namespace="/tenant-b/test/",
-        expect_success=True,
-    )
-    all_results.append(("Test 2: Tenant B -> Memory B (own)", results_2))
-
-    # Test 3: Tenant A -> Memory B (expect DENIED)
-    results_3 = run_test_case(
-        test_num=3,
-        description="Tenant A accessing Tenant B Memory (expect DENIED, ResourceTag mismatch)",
-        client=client_a,
-        memory_id=memory_b["memoryId"],
-        strategy_id=memory_b["strategyId"],
-        tenant_id="tenant-a",
-        namespace="/tenant-a/cross-test/",
-        expect_success=False,
-    )
-    all_results.append(("Test 3: Tenant A -> Memory B (cross-tenant)", results_3))
-
-    # Test 4: Tenant B -> Memory A (expect DENIED)
-    results_4 = run_test_case(
-        test_num=4,
-        description="Tenant B accessing Tenant A Memory (expect DENIED, ResourceTag mismatch)",
-        client=client_b,
-        memory_id=memory_a["memoryId"],
-        strategy_id=memory_a["strategyId"],
-        tenant_id="tenant-b",
-        namespace="/tenant-b/cross-test/",
-        expect_success=False,
-    )
-    all_results.append(("Test 4: Tenant B -> Memory A (cross-tenant)", results_4))
+    # (ラベル, 実行するテナント, run_test_case の引数) の組。client は AssumeRole 後に埋める
+    specs = [
+        # Test 1: Tenant A -> Memory A (expect SUCCESS)
+        ("Test 1: Tenant A -> Memory A (own)", "a", dict(
+            test_num=1,
+            description="Tenant A accessing own Memory (expect SUCCESS)",
+            memory_id=memory_a["memoryId"],
+            strategy_id=memory_a["strategyId"],
+            tenant_id="tenant-a",
+            namespace="/tenant-a/test/",
+            expect_success=True,
+        )),
+        # Test 2: Tenant B -> Memory B (expect SUCCESS)
+        ("Test 2: Tenant B -> Memory B (own)", "b", dict(
+            test_num=2,
+            description="Tenant B accessing own Memory (expect SUCCESS)",
+            memory_id=memory_b["memoryId"],
+            strategy_id=memory_b["strategyId"],
+            tenant_id="tenant-b",
+            namespace="/tenant-b/test/",
+            expect_success=True,
+        )),
+        # Test 3: Tenant A -> Memory B (expect DENIED)
+        ("Test 3: Tenant A -> Memory B (cross-tenant)", "a", dict(
+            test_num=3,
+            description="Tenant A accessing Tenant B Memory (expect DENIED, ResourceTag mismatch)",
+            memory_id=memory_b["memoryId"],
+            strategy_id=memory_b["strategyId"],
+            tenant_id="tenant-a",
+            namespace="/tenant-a/cross-test/",
+            expect_success=False,
+            early_exit_on_denied=True,
+        )),
+        # Test 4: Tenant B -> Memory A (expect DENIED)
+        ("Test 4: Tenant B -> Memory A (cross-tenant)", "b", dict(
+            test_num=4,
+            description="Tenant B accessing Tenant A Memory (expect DENIED, ResourceTag mismatch)",
+            memory_id=memory_a["memoryId"],
+            strategy_id=memory_a["strategyId"],
+            tenant_id="tenant-b",
+            namespace="/tenant-b/cross-test/",
+            expect_success=False,
+            early_exit_on_denied=True,
+        )),
+    ]
 
     # Test 5: Tenant A -> Memory without tags (expect DENIED, Null Condition)
-    if memory_no_tag and memory_no_tag.get("memoryId"):
-        results_5 = run_test_case(
+    if 5 in tests and memory_no_tag and memory_no_tag.get("memoryId"):
+        specs.append(("Test 5: Tenant A -> No-tag Memory (Null Condition)", "a", dict(
             test_num=5,
             description="Tenant A accessing untagged Memory (expect DENIED, Null Condition)",
-            client=client_a,
             memory_id=memory_no_tag["memoryId"],
             strategy_id=memory_no_tag["strategyId"],
             tenant_id="tenant-a",
             namespace="/tenant-a/null-test/",
             expect_success=False,
-        )
-        all_results.append(("Test 5: Tenant A -> No-tag Memory (Null Condition)", results_5))
-    else:
+            early_exit_on_denied=True,
+        )))
+    elif 5 in tests:
         print("\n[SKIP] Test 5: memoryNoTag not found in config, skipping Null Condition test")
 
+    specs = [
+        spec for spec in specs
+        if spec[2]["test_num"] in tests and spec[1] in tenants
+    ]
+    if not specs:
+        print("\n[ERROR] No test cases match --tests / --tenants")
+        return []
+
+    # 選ばれたテストが使うテナントだけ AssumeRole する（STS が実行時間の大半を占めるため）
+    # 各テナントの AssumeRole は独立しているので並行に発行する。
+    # 共有 STS クライアントは先にメインスレッドで生成しておく
+    needed = sorted({tenant for _, tenant, _ in specs})
+    print(f"\n[INFO] AssumeRole for {', '.join(TENANT_NAMES[t] for t in needed)}...")
+    get_sts_client()
+    with ThreadPoolExecutor(max_workers=len(needed)) as executor:
+        futures = {
+            tenant: executor.submit(
+                assume_role_with_tags,
+                config["roles"][TENANT_ROLE_KEYS[tenant]]["roleArn"],
+                f"tenant-{tenant}",
+                f"tenant-{tenant}",
+            )
+            for tenant in needed
+        }
+
+    clients = {}
+    for tenant, future in futures.items():
+        name = TENANT_NAMES[tenant]
+        try:
+            clients[tenant] = future.result()
+            print(f"[OK] {name} session established (PrincipalTag/tenant_id=tenant-{tenant})")
+        except ClientError as e:
+            print(f"[ERROR] AssumeRole failed for {name}: {e}")
+    if len(clients) < len(needed):
+        return []
+
+    cases = [
+        (label, dict(kwargs, client=clients[tenant][0], retrieve_client=clients[tenant][1]))
+        for label, tenant, kwargs in specs
+    ]
+
+    # テストケースは互いに独立しているため並行に実行し、結果はテスト番号順に並べる
+    with ThreadPoolExecutor(max_workers=len(cases)) as executor:
+        futures = [
+            (label, executor.submit(run_test_case, **kwargs)) for label, kwargs in cases
+        ]
+    all_results = [(label, future.result()) for label, future in futures]
+
     return all_results
 
 
+# ResourceTag 条件キーが Memory API で未サポートなことを示すエラーメッセージ（BLOCKED 判定用、
+# サービスから返った ClientError / failedRecords のメッセージにだけ適用する）
+_BLOCKED_RE = re.compile(r"not supported|unknown|not authorized", re.IGNORECASE)
+
+
 def print_summary(all_results):
-    """テスト結果のサマリを表示"""
-    print("\n" + "=" * 60)
-    print("Test Results Summary")
-    print("=" * 60)
+    """テスト結果のサマリを表示（出力はまとめて 1 回で書き出す）"""
+    buf = io.StringIO()
+    w = buf.write
+    w("\n" + "=" * 60 + "\nTest Results Summary\n" + "=" * 60 + "\n")
 
     total_pass = 0
     total_fail = 0
+    total_skip = 0
     blocked = False
 
     for test_name, results in all_results:
-        print(f"\n  {test_name}:")
+        w(f"\n  {test_name}:\n")
         for r in results:
             status = r["status"]
             if status == "PASS":
                 total_pass += 1
+            elif status == "SKIP":
+                total_skip += 1
             else:
                 total_fail += 1
-            print(f"    [{status}] {r['operation']}: {r['detail']}")
+            w(f"    [{status}] {r['operation']}: {r['detail']}\n")
 
-            # BLOCKED 判定: AccessDeniedException 以外のエラーで失敗した場合
-            if r["status"] == "FAIL" and r["expected_success"]:
-                if "not supported" in r["detail"].lower() or \
-                   "unknown" in r["detail"].lower() or \
-                   "not authorized" in r["detail"].lower():
-                    blocked = True
+            # BLOCKED 判定: AccessDeniedException 以外のエラーで失敗した場合（判定済みなら検索しない）。
+            # サービスが応答したエラー（success が False）だけを対象にし、botocore の
+            # パラメーター検証エラーなど判定不能（None）の結果からは BLOCKED と結論しない
+            if (not blocked and r["status"] == "FAIL" and r["expected_success"]
+                    and r["success"] is False):
+                blocked = _BLOCKED_RE.search(r["detail"]) is not None
 
-    total = total_pass + total_fail
-    print(f"\n{'=' * 60}")
-    print(f"Total: {total} | Passed: {total_pass} | Failed: {total_fail}")
+    total = total_pass + total_fail + total_skip
+    w(f"\n{'=' * 60}\n")
+    w(f"Total: {total} | Passed: {total_pass} | Failed: {total_fail}")
+    w(f" | Skipped: {total_skip}\n" if total_skip else "\n")
 
     if blocked:
-        print(f"\n[BLOCKED] aws:ResourceTag/tenant_id may not be supported for Memory API.")
-        print(f"  See VERIFICATION_RESULT.md for details and alternatives.")
-        return "BLOCKED"
+        w("\n[BLOCKED] aws:ResourceTag/tenant_id may not be supported for Memory API.\n")
+        w("  See VERIFICATION_RESULT.md for details and alternatives.\n")
+        overall_status = "BLOCKED"
     elif total_fail == 0:
-        print(f"\n[OK] All tests passed! Memory ResourceTag ABAC is working correctly.")
-        return "PASS"
+        w("\n[OK] All tests passed! Memory ResourceTag ABAC is working correctly.\n")
+        overall_status = "PASS"
     else:
-        print(f"\n[FAIL] {total_fail} test(s) failed. See details above.")
-        return "FAIL"
+        w(f"\n[FAIL] {total_fail} test(s) failed. See details above.\n")
+        overall_status = "FAIL"
+
+    sys.stdout.write(buf.getvalue())
+    sys.stdout.flush()
+    return overall_status
+
+
+# VERIFICATION_RESULT.md の先頭部分のテンプレート（結果表のヘッダーまで）
+_REPORT_HEADER = """\
+# Memory ResourceTag ABAC 検証結果
+
+**検証日時**: {timestamp}
+**全体ステータス**: [{overall_status}]
+
+## 検証した Condition Key
+
+```
+aws:ResourceTag/tenant_id == ${{aws:PrincipalTag/tenant_id}}
+```
+
+## テスト結果
+
+| Test | 説明 | 操作 | 期待結果 | 実際の結果 | ステータス |
+|------|------|------|---------|-----------|----------|
+""".format
+
+# VERIFICATION_RESULT.md の固定部分
+_REPORT_BLOCKED_SECTION = """\
+## BLOCKED: 代替案
+
+`aws:ResourceTag/tenant_id` が Memory API で動作しない場合の代替策:
+
+### 代替案 1: bedrock-agentcore:namespace Condition Key
+
+Example 02 で検証済みの `bedrock-agentcore:namespace` を使用する。
+namespace パスにテナント ID を埋め込むことで、テナント分離を実現。
+
+```json
+{
+  "Effect": "Allow",
+  "Action": ["bedrock-agentcore:BatchCreateMemoryRecords"],
+  "Resource": "arn:aws:bedrock-agentcore:*:*:memory/*",
+  "Condition": {
+    "StringLike": {
+      "bedrock-agentcore:namespace": "/${aws:PrincipalTag/tenant_id}/*"
+    }
+  }
+}
+```
+
+### 代替案 2: テナント別 Memory リソース + リソースベースポリシー
+
+テナントごとに個別の Memory リソースを作成し、
+IAM ポリシーの Resource 句で Memory ARN を直接指定する。
+
+```json
+{
+  "Effect": "Allow",
+  "Action": ["bedrock-agentcore:BatchCreateMemoryRecords"],
+  "Resource": "arn:aws:bedrock-agentcore:us-east-1:123456789012:memory/mem-tenant-a-xxx"
+}
+```
+
+### 代替案 3: namespace + ResourceTag の組み合わせ
+
+namespace Condition Key を主制御として使用し、
+将来 ResourceTag がサポートされた際に多層防御として追加する。
+
+"""
+
+_REPORT_PASS_SECTION = """\
+## 結論
+
+`aws:ResourceTag/tenant_id` は Memory API で正常に動作します。
+S3 の `s3:ExistingObjectTag/tenant_id` と同様のパターンで、
+Memory リソースのテナント分離を IAM レベルで実現できます。
+
+### S3 ABAC との比較
+
+| 項目 | S3 ABAC (Example 11) | Memory ResourceTag ABAC (Example 15) |
+|------|---------------------|--------------------------------------|
+| Condition Key | `s3:ExistingObjectTag/tenant_id` | `aws:ResourceTag/tenant_id` |
+| タグ対象 | S3 オブジェクト | Memory リソース |
+| タグ付与方法 | PutObjectTagging | TagResource |
+| 粒度 | オブジェクトレベル | リソース（Memory）レベル |
+
+"""
+
+_REPORT_RELATED_SECTION = """\
+## 関連する Example
+
+- **Example 02**: IAM ABAC (namespace Condition Key)
+- **Example 11**: S3 ABAC (s3:ExistingObjectTag/tenant_id)
+- **Example 05**: End-to-End (STS SessionTags)
+"""
+
+# 結果表の行と詳細ログの行のテンプレート（r の operation / status / detail をそのまま埋め込む）
+_REPORT_ROW = "| {test_name} | {operation} | {operation} | {expected} | {actual} | {status} |\n".format
+_REPORT_DETAIL = "- **{operation}**: [{status}] {detail}\n".format
+_EXPECTED_LABELS = {True: "成功", False: "拒否"}
+_ACTUAL_LABELS = {True: "成功", False: "拒否/エラー", None: "判定不能"}
+_SKIPPED_LABEL = "スキップ"
+# 全体ステータスごとに詳細ログの後へ追加するセクション（FAIL では追加しない）
+_REPORT_STATUS_SECTIONS = {
+    "BLOCKED": _REPORT_BLOCKED_SECTION,
+    "PASS": _REPORT_PASS_SECTION,
+}
 
 
 def write_verification_result(all_results, overall_status):
-    """検証結果を VERIFICATION_RESULT.md に出力"""
+    """検証結果を VERIFICATION_RESULT.md に出力（組み立てながら順にファイルへ書き込む）"""
     timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
 
-    lines = [
-        "# Memory ResourceTag ABAC 検証結果",
-        "",
-        f"**検証日時**: {timestamp}",
-        f"**全体ステータス**: [{overall_status}]",
-        "",
-        "## 検証した Condition Key",
-        "",
-        "```",
-        "aws:ResourceTag/tenant_id == ${aws:PrincipalTag/tenant_id}",
-        "```",
-        "",
-        "## テスト結果",
-        "",
-        "| Test | 説明 | 操作 | 期待結果 | 実際の結果 | ステータス |",
-        "|------|------|------|---------|-----------|----------|",
-    ]
+    with open(RESULT_FILE, "w", buffering=1 << 16) as f:
+        w = f.write
+        w(_REPORT_HEADER(timestamp=timestamp, overall_status=overall_status))
+
+        # 表と詳細ログを all_results の 1 回の走査で組み立てる
+        # （表はそのまま書き込み、表の後に出力する詳細ログだけを溜めておく）
+        details = []
+        for test_name, results in all_results:
+            details.append(f"### {test_name}\n\n")
+            for r in results:
+                w(_REPORT_ROW(
+                    test_name=test_name,
+                    expected=_EXPECTED_LABELS[r["expected_success"]],
+                    actual=(
+                        _SKIPPED_LABEL if r["status"] == "SKIP" else _ACTUAL_LABELS[r["success"]]
+                    ),
+                    **r,
+                ))
+                details.append(_REPORT_DETAIL(**r))
+            details.append("\n")
+
+        w("\n## 詳細ログ\n\n")
+        w("".join(details))
+
+        w(_REPORT_STATUS_SECTIONS.get(overall_status, ""))
+        w(_REPORT_RELATED_SECTION)
 
-    for test_name, results in all_results:
-        for r in results:
-            expected = "成功" if r["expected_success"] else "拒否"
-            actual = "成功" if r["success"] else "拒否/エラー"
-            lines.append(
-                f"| {test_name} | {r['operation']} | {r['operation']} | {expected} | {actual} | {r['status']} |"
-            )
+    print(f"\n[OK] Verification result saved: {os.path.abspath(RESULT_FILE)}")
 
-    lines.extend([
-        "",
-        "## 詳細ログ",
-        "",
-    ])
 
-    for test_name, results in all_results:
-        lines.append(f"### {test_name}")
-        lines.append("")
-        for r in results:
-            lines.append(f"- **{r['operation']}**: [{r['status']}] {r['detail']}")
-        lines.append("")
-
-    if overall_status == "BLOCKED":
-        lines.extend([
-            "## BLOCKED: 代替案",
-            "",
-            "`aws:ResourceTag/tenant_id` が Memory API で動作しない場合の代替策:",
-            "",
-            "### 代替案 1: bedrock-agentcore:namespace Condition Key",
-            "",
-            "Example 02 で検証済みの `bedrock-agentcore:namespace` を使用する。",
-            "namespace パスにテナント ID を埋め込むことで、テナント分離を実現。",
-            "",
-            "```json",
-            '{',
-            '  "Effect": "Allow",',
-            '  "Action": ["bedrock-agentcore:BatchCreateMemoryRecords"],',
-            '  "Resource": "arn:aws:bedrock-agentcore:*:*:memory/*",',
-            '  "Condition": {',
-            '    "StringLike": {',
-            '      "bedrock-agentcore:namespace": "/${aws:PrincipalTag/tenant_id}/*"',
-            '    }',
-            '  }',
-            '}',
-            "```",
-            "",
-            "### 代替案 2: テナント別 Memory リソース + リソースベースポリシー",
-            "",
-            "テナントごとに個別の Memory リソースを作成し、",
-            "IAM ポリシーの Resource 句で Memory ARN を直接指定する。",
-            "",
-            "```json",
-            '{',
-            '  "Effect": "Allow",',
-            '  "Action": ["bedrock-agentcore:BatchCreateMemoryRecords"],',
-            '  "Resource": "arn:aws:bedrock-agentcore:us-east-1:123456789012:memory/mem-tenant-a-xxx"',
-            '}',
-            "```",
-            "",
-            "### 代替案 3: namespace + ResourceTag の組み合わせ",
-            "",
-            "namespace Condition Key を主制御として使用し、",
-            "将来 ResourceTag がサポートされた際に多層防御として追加する。",
-            "",
-        ])
+def parse_selection(choices, convert=str):
+    """カンマ区切りの引数を choices の要素のタプルに変換する argparse の type 関数を返す"""
 
-    if overall_status == "PASS":
-        lines.extend([
-            "## 結論",
-            "",
-            "`aws:ResourceTag/tenant_id` は Memory API で正常に動作します。",
-            "S3 の `s3:ExistingObjectTag/tenant_id` と同様のパターンで、",
-            "Memory リソースのテナント分離を IAM レベルで実現できます。",
-            "",
-            "### S3 ABAC との比較",
-            "",
-            "| 項目 | S3 ABAC (Example 11) | Memory ResourceTag ABAC (Example 15) |",
-            "|------|---------------------|--------------------------------------|",
-            "| Condition Key | `s3:ExistingObjectTag/tenant_id` | `aws:ResourceTag/tenant_id` |",
-            "| タグ対象 | S3 オブジェクト | Memory リソース |",
-            "| タグ付与方法 | PutObjectTagging | TagResource |",
-            "| 粒度 | オブジェクトレベル | リソース（Memory）レベル |",
-            "",
-        ])
-
-    lines.extend([
-        "## 関連する Example",
-        "",
-        "- **Example 02**: IAM ABAC (namespace Condition Key)",
-        "- **Example 11**: S3 ABAC (s3:ExistingObjectTag/tenant_id)",
-        "- **Example 05**: End-to-End (STS SessionTags)",
-    ])
-
-    with open(RESULT_FILE, "w") as f:
-        f.write("\n".join(lines) + "\n")
+    def parse(value):
+        try:
+            selected = {convert(item.strip()) for item in value.split(",") if item.strip()}
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid value: {value}")
+        unknown = selected - set(choices)
+        if unknown or not selected:
+            raise argparse.ArgumentTypeError(
+                f"choose from {','.join(map(str, choices))}: {value}"
+            )
+        return tuple(sorted(selected))
 
-    print(f"\n[OK] Verification result saved: {os.path.abspath(RESULT_FILE)}")
+    return parse
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Memory ResourceTag ABAC 統合テストスクリプト"
+    )
+    parser.add_argument(
+        "--tests", type=parse_selection(ALL_TESTS, int), default=ALL_TESTS,
+        help="実行するテスト番号（カンマ区切り、デフォルト: 1,2,3,4,5）",
+    )
+    parser.add_argument(
+        "--tenants", type=parse_selection(ALL_TENANTS), default=ALL_TENANTS,
+        help="実行するテナント（カンマ区切り、デフォルト: a,b）。対象外テナントのテストと AssumeRole は行わない",
+    )
+    args = parser.parse_args()
+
     print("=" * 60)
     print("Memory ResourceTag ABAC Integration Tests")
     print("=" * 60)
@@ -472,7 +724,7 @@ def main():
     print(f"[INFO] Role A: {config['roles']['tenantA']['roleName']}")
     print(f"[INFO] Role B: {config['roles']['tenantB']['roleName']}")
 
-    all_results = run_all_tests(config)
+    all_results = run_all_tests(config, tests=args.tests, tenants=args.tenants)
 
     if not all_results:
         print("\n[ERROR] No test results. Check AssumeRole configuration.")